@@ -1,50 +1,196 @@
-from django.contrib import admin
-from .models import Table, Category, Dish, Event, Reservation, ContactMessage
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from rest_framework.exceptions import ValidationError
+from . import customers, lifecycle, menu_import, search, webhooks
+from .models import Customer, WebhookDelivery, WebhookEndpoint, Location, Table, Category, Dish, Event, EventBooking, EventOccurrenceOverride, Reservation, ContactMessage
+
+class FullTextSearchMixin:
+    """
+    Answers the changelist search box from the FTS5 index (api/search.py) instead of
+    icontains scans, falling back to search_fields on other database backends.
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(request, queryset, search_term)
+        hits = search.search(search_term, kind=self.search_kind, limit=1000)
+        return queryset.filter(pk__in=[pk for _, pk in hits]), False
+
+class CustomerSearchMixin:
+    """
+    Adds to the search_fields results of an email or a phone number the rows of the guest it
+    identifies, by an exact lookup on the indexed Customer columns (normalised, see
+    api/customers.py): "+225 07 07..." finds the rows typed "0707...".
+    """
+    customer_path = 'customer__'
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        lookup = customers.search_filter(search_term.strip())
+        if lookup is None:
+            return results, may_have_duplicates
+        # Les recherches partielles ("awa@", "@gmail.com") restent servies par search_fields
+        exact = queryset.filter(**{self.customer_path + field: value for field, value in lookup.items()})
+        return results | exact, may_have_duplicates
+
+class MenuImportForm(forms.Form):
+    location = forms.ModelChoiceField(queryset=Location.objects.filter(is_active=True), label="Restaurant")
+    file = forms.FileField(label="Fichier CSV ou JSON")
+    replace = forms.BooleanField(required=False, label="Rendre indisponibles les plats absents du fichier")
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
 
 @admin.register(Table)
 class TableAdmin(admin.ModelAdmin):
-    list_display = ('name', 'capacity', 'location', 'is_active')
-    list_filter = ('is_active', 'location')
+    list_display = ('name', 'restaurant', 'capacity', 'location', 'is_active')
+    list_filter = ('restaurant', 'is_active', 'location')
     search_fields = ('name', 'location')
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'order', 'description')
+    list_display = ('name', 'restaurant', 'order', 'description')
+    list_filter = ('restaurant',)
     list_editable = ('order',)
     search_fields = ('name',)
 
 @admin.register(Dish)
-class DishAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'is_available', 'is_featured', 'updated_at')
-    list_filter = ('category', 'is_available', 'is_featured')
+class DishAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.DISH
+    list_display = ('name', 'restaurant', 'category', 'price', 'is_available', 'is_featured', 'updated_at')
+    list_filter = ('restaurant', 'category', 'is_available', 'is_featured')
     search_fields = ('name', 'description')
     list_editable = ('price', 'is_available', 'is_featured')
     autocomplete_fields = ['category'] # Assuming CategoryAdmin has search_fields defined
+    change_list_template = 'admin/api/dish/change_list.html' # Lien "Importer la carte"
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_menu_view), name='api_dish_import'),
+        ] + super().get_urls()
+
+    def import_menu_view(self, request):
+        """
+        Bulk import of categories and dishes (api/menu_import.py), in one transaction.
+        """
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            raise PermissionDenied
+        form = MenuImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                data = menu_import.parse(upload.read(), menu_import.format_for(upload.name, upload.content_type))
+                summary = menu_import.import_menu(form.cleaned_data['location'], data, replace=form.cleaned_data['replace'])
+            except ValidationError as e:
+                form.add_error('file', f"Import refusé, aucune modification : {e.detail}")
+            else:
+                self.message_user(request, (
+                    "Catégories : {categories[created]} créée(s), {categories[updated]} modifiée(s). "
+                    "Plats : {dishes[created]} créé(s), {dishes[updated]} modifié(s), {dishes[disabled]} rendu(s) indisponible(s)."
+                ).format(**summary), messages.SUCCESS)
+                return redirect('admin:api_dish_changelist')
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta, 'form': form, 'title': "Importer la carte"}
+        return TemplateResponse(request, 'admin/api/dish/import_menu.html', context)
+
+class EventOccurrenceOverrideInline(admin.TabularInline):
+    model = EventOccurrenceOverride
+    extra = 0
+    fields = ('original_date', 'is_cancelled', 'event_date', 'event_time', 'title', 'description')
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'event_date', 'event_time', 'is_published', 'booking_required', 'capacity')
-    list_filter = ('is_published', 'booking_required', 'event_date')
+class EventAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = search.EVENT
+    list_display = ('title', 'event_date', 'event_time', 'recurrence', 'is_published', 'booking_required', 'capacity', 'seats_remaining')
+    list_filter = ('restaurant', 'is_published', 'booking_required', 'event_date')
     search_fields = ('title', 'description')
     list_editable = ('is_published', 'booking_required')
+    readonly_fields = ('seats_remaining', 'recurrence_end')
+    inlines = [EventOccurrenceOverrideInline] # Occurrences annulées ou modifiées d'une série
+
+@admin.register(EventBooking)
+class EventBookingAdmin(admin.ModelAdmin):
+    list_display = ('customer_name', 'event', 'number_of_seats', 'status', 'created_at')
+    list_filter = ('status', 'event')
+    search_fields = ('customer_name', 'customer_email', 'reference')
+    readonly_fields = ('reference', 'event', 'idempotency_key', 'number_of_seats', 'status', 'created_at', 'updated_at')
+    actions = ['cancel_bookings']
+
+    @admin.action(description="Annuler les réservations sélectionnées (libère les places)")
+    def cancel_bookings(self, request, queryset):
+        cancelled = sum(1 for booking in queryset if booking.cancel())
+        self.message_user(request, f"{cancelled} réservation(s) annulée(s).")
+
+@admin.register(Customer)
+class CustomerAdmin(CustomerSearchMixin, admin.ModelAdmin):
+    list_display = ('name', 'email', 'phone', 'is_vip', 'created_at')
+    list_filter = ('is_vip',)
+    search_fields = ('name',)
+    readonly_fields = ('reservation_summary', 'created_at', 'updated_at')
+    customer_path = ''
+
+    @admin.display(description="Réservations")
+    def reservation_summary(self, obj):
+        counts = customers.reservation_counts(obj)
+        labels = dict(Reservation.ReservationStatus.choices)
+        return ", ".join(f"{labels.get(status, status)} : {count}" for status, count in sorted(counts.items())) or "-"
 
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
-    list_display = ('customer_name', 'reservation_date', 'reservation_time', 'number_of_guests', 'status', 'table', 'updated_at')
-    list_filter = ('status', 'reservation_date', 'table')
+class ReservationAdmin(CustomerSearchMixin, admin.ModelAdmin):
+    # Réservations de la base 'default' : celles des restaurants ayant leur propre base
+    # (LOCATION_DATABASES) se gèrent par l'API ?location=
+    list_display = ('customer_name', 'restaurant', 'reservation_date', 'reservation_time', 'number_of_guests', 'status', 'table', 'updated_at')
+    list_filter = ('restaurant', 'status', 'reservation_date', 'table')
     search_fields = ('customer_name', 'customer_email', 'customer_phone')
     list_editable = ('status',)
     autocomplete_fields = ['table'] # Assuming TableAdmin has search_fields defined
     date_hierarchy = 'reservation_date'
+    readonly_fields = ('reminder_sent_at',)
+    actions = ['advance_reservations']
+
+    @admin.action(description="Appliquer les transitions échues (absence, expiration, terminée)")
+    def advance_reservations(self, request, queryset):
+        counts = lifecycle.advance(queryset)
+        summary = ", ".join(f"{name} : {count}" for name, count in counts.items())
+        self.message_user(request, f"{sum(counts.values())} réservation(s) mise(s) à jour ({summary}).")
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
-    list_display = ('subject', 'name', 'email', 'created_at', 'is_read')
+class ContactMessageAdmin(CustomerSearchMixin, admin.ModelAdmin):
+    list_display = ('subject', 'name', 'email', 'created_at', 'hit_count', 'is_read')
     list_filter = ('is_read', 'created_at')
     search_fields = ('name', 'email', 'subject', 'message')
     list_editable = ('is_read',)
-    readonly_fields = ('name', 'email', 'subject', 'message', 'created_at')
+    readonly_fields = ('name', 'email', 'subject', 'message', 'created_at', 'hit_count', 'last_received_at')
 
     def has_add_permission(self, request):
         # Prevent adding contact messages from the admin
         return False
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'url', 'restaurant', 'is_active', 'created_at')
+    list_filter = ('is_active', 'restaurant')
+    search_fields = ('name', 'url')
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    # Filtre « Dead » : les lettres mortes, à renvoyer par l'action ci-dessous
+    list_display = ('event', 'endpoint', 'status', 'attempts', 'next_attempt_at', 'created_at', 'last_error')
+    list_filter = ('status', 'event', 'endpoint')
+    readonly_fields = ('endpoint', 'event_id', 'event', 'payload', 'status', 'attempts', 'next_attempt_at', 'last_error', 'created_at', 'delivered_at')
+    actions = ['requeue_deliveries']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Renvoyer les événements sélectionnés")
+    def requeue_deliveries(self, request, queryset):
+        self.message_user(request, f"{webhooks.requeue(queryset)} événement(s) remis en file.")
@@ -0,0 +1,199 @@
+"""
+Minification and precompression of the frontend assets (see api/frontend.py).
+
+The minifiers are deliberately conservative: comments and indentation go, strings, template
+literals and regular expressions are kept verbatim, and JavaScript keeps its line breaks so
+automatic semicolon insertion behaves as in the source.
+
+Every built file gets ``.gz`` (and ``.br`` when the optional ``brotli`` package is
+installed) siblings, served by views.frontend_asset() or directly by the web server
+(nginx: ``gzip_static on; brotli_static on;``). Hashed names never change content, so they
+are served as immutable.
+"""
+import gzip
+import mimetypes
+import re
+from pathlib import Path
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError: # Facultatif : sans brotli, seules les variantes .gz sont produites
+    brotli = None
+
+MIN_COMPRESS_SIZE = 256
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+CSS_TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/|\s+', re.DOTALL)
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+JS_TOKEN_RE = re.compile(r'[\w$]+|\+\+|--|\S')
+# Mots-clés suivis d'une expression : 'return /a  b/' ouvre une expression régulière
+REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else', 'yield', 'await'}
+# Après la condition de ces mots-clés, ')' est suivi d'une instruction : 'if (a) /x/.test(s)'
+CONDITION_KEYWORDS = {'if', 'while', 'for', 'with'}
+
+
+def minify_css(text):
+    def token(match):
+        if match.group(1):
+            return match.group(1)
+        return ' ' if match.group(0)[:2] != '/*' else ''
+
+    parts = []
+    # Les chaînes sont conservées telles quelles, la ponctuation n'est resserrée qu'en dehors
+    for index, part in enumerate(re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', CSS_TOKEN_RE.sub(token, text))):
+        parts.append(part if index % 2 else CSS_PUNCTUATION_RE.sub(r'\1', part).replace(';}', '}'))
+    return ''.join(parts).strip()
+
+
+def minify_js(text):
+    """
+    A '/' opens a regular expression unless the previous token ends an expression (an
+    identifier or property, a literal, ')', ']', a postfix '++' or '--'), as in the JavaScript
+    grammar; the tokens are followed just enough to tell.
+    """
+    out = []
+    i, length = 0, len(text)
+    state = {'expression_end': False, 'word': '', 'after_dot': False, 'parens': []}
+
+    def follow(chunk):
+        for token in JS_TOKEN_RE.findall(chunk):
+            word = is_word(token[0])
+            if token == '(':
+                state['parens'].append(state['word'] in CONDITION_KEYWORDS)
+                expression_end = False
+            elif token == ')':
+                expression_end = not (state['parens'].pop() if state['parens'] else False)
+            elif word:
+                expression_end = state['after_dot'] or token not in REGEX_KEYWORDS
+            else:
+                expression_end = token in (']', '++', '--')
+            state.update(
+                expression_end=expression_end, after_dot=token == '.',
+                word=token if word and not state['after_dot'] else '',
+            )
+
+    def literal():
+        state.update(expression_end=True, word='', after_dot=False)
+
+    def needs_space(before, after):
+        # Un espace ne sépare que deux mots, ou deux opérateurs qui fusionneraient (a + +b)
+        return (is_word(before) and is_word(after)) or (before in '+-' and after in '+-')
+
+    def copy_string(start, quote):
+        j = start + 1
+        while j < length and text[j] != quote:
+            if text[j] == '\\':
+                j += 1
+            elif quote == '`' and text.startswith('${', j):
+                depth, j = 1, j + 2
+                while j < length and depth:
+                    depth += {'{': 1, '}': -1}.get(text[j], 0)
+                    j += 1
+                continue
+            j += 1
+        return j + 1
+
+    while i < length:
+        char = text[i]
+        if char in '\'"`':
+            end = copy_string(i, char)
+            out.append(text[i:end])
+            literal()
+            i = end
+        elif text.startswith('//', i):
+            i = text.find('\n', i)
+            i = length if i < 0 else i
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = length if end < 0 else end + 2
+            out.append(' ')
+        elif char == '/' and not state['expression_end']:
+            j, in_class = i + 1, False
+            while j < length and (in_class or text[j] != '/') and text[j] != '\n':
+                if text[j] == '\\':
+                    j += 1
+                elif text[j] in '[]':
+                    in_class = text[j] == '['
+                j += 1
+            out.append(text[i:j + 1])
+            literal()
+            i = j + 1
+        elif char.isspace():
+            j = i
+            while j < length and text[j].isspace():
+                j += 1
+            previous = out[-1][-1] if out and out[-1] else '\n'
+            if '\n' in text[i:j]:
+                out.append('\n')
+            elif j < length and needs_space(previous, text[j]):
+                out.append(' ')
+            i = j
+        else:
+            j = i
+            while j < length and not text[j].isspace() and text[j] not in '\'"`/':
+                j += 1
+            out.append(text[i:max(j, i + 1)])
+            follow(out[-1])
+            i = max(j, i + 1)
+
+    lines = (line.strip() for line in ''.join(out).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def is_word(char):
+    return char.isalnum() or char in '_$'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def minify(relative_path, content):
+    minifier = MINIFIERS.get(Path(relative_path).suffix)
+    return minifier(content.decode()).encode() if minifier else content
+
+
+def compressed_variants(content):
+    """
+    Returns {suffix: compressed content} for the encodings that make the file smaller.
+    """
+    if len(content) < MIN_COMPRESS_SIZE:
+        return {}
+    variants = {'.gz': gzip.compress(content, 9, mtime=0)} # mtime=0 : sortie reproductible
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return {suffix: data for suffix, data in variants.items() if len(data) < len(content)}
+
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def find_asset(root, relative_path, accept_encoding=''):
+    """
+    Returns (path, content_encoding) of the best variant of root/relative_path for the
+    client's Accept-Encoding, or None when the file does not exist.
+    """
+    try:
+        path = Path(safe_join(root, relative_path))
+    except SuspiciousFileOperation: # En dehors de root
+        return None
+    if not path.is_file():
+        return None
+    accepted = {value.split(';')[0].strip() for value in accept_encoding.split(',')}
+    for encoding, suffix in ENCODINGS:
+        variant = path.with_name(path.name + suffix)
+        if encoding in accepted and variant.is_file():
+            return variant, encoding
+    return path, None
+
+
+def content_type(relative_path):
+    return mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+
+
+def cache_control(relative_path):
+    return IMMUTABLE if HASHED_NAME_RE.search(relative_path) else REVALIDATE
@@ -0,0 +1,94 @@
+"""
+Token authentication with the resolved token and user kept in the cache.
+
+DRF's TokenAuthentication loads the Token and its User on every request; the kitchen display
+and POS integrations call the admin endpoints several times per second with the same token.
+CachedTokenAuthentication stores the pair in TOKEN_AUTH_CACHE['ALIAS'] (shared by every
+process) for TOKEN_AUTH_CACHE['TIMEOUT'] seconds, under a hash of the token rather than the
+token itself. Only the fields authorisation needs are cached (USER_FIELDS, never the password
+hash); the other user fields are deferred and loaded if a view reads them.
+
+Entries are dropped when their token is saved or deleted, and when its user is saved (e.g.
+deactivated) or deleted (api/signals.py). Bulk updates (QuerySet.update) send no signal: such
+changes apply once the entry expires. Lookups are counted in the cache_requests_total metric
+(cache="tokens").
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from . import metrics
+
+CACHE_KEY = 'token-auth:{}'
+METRIC = 'tokens'
+USER_FIELDS = ('username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def cache_setting(name, default=None):
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, default)
+
+
+def token_cache():
+    return caches[cache_setting('ALIAS', 'default')]
+
+
+def cache_key(key):
+    return CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget(*keys):
+    token_cache().delete_many([cache_key(key) for key in keys])
+
+
+def forget_user(user):
+    forget(*Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication answering from the cache: an authenticated request with a known token
+    makes no database query for authentication.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        entry = cache.get(cache_key(key))
+        metrics.record_cache(METRIC, entry is not None)
+        if entry is None:
+            try:
+                token = self.get_model().objects.select_related('user').get(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            entry = cache_entry(token)
+            cache.set(cache_key(key), entry, cache_setting('TIMEOUT', 300))
+
+        user, token = from_entry(key, entry)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, token
+
+
+def cache_entry(token):
+    user = token.user
+    return {'user': {'pk': user.pk, **{field: getattr(user, field) for field in USER_FIELDS}}, 'created': token.created}
+
+
+def from_entry(key, entry):
+    """
+    Rebuilds the (user, token) pair of a cache entry; the fields not cached are deferred.
+    """
+    User = get_user_model()
+    cached = dict(entry['user'], **{User._meta.pk.attname: entry['user']['pk']})
+    # from_db() attend les valeurs dans l'ordre des champs du modèle
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in cached]
+    user = User.from_db(router.db_for_read(User), fields, [cached[field] for field in fields])
+    token = Token.from_db(router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user.pk, entry['created']])
+    token.user = user
+    return user, token
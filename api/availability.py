@@ -0,0 +1,112 @@
+"""
+Règles de disponibilité des tables, partagées par l'API, le flux SSE et les outils de planification.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+
+from . import locations
+from .models import Table, TableSlot, Reservation
+
+# Durée d'une réservation (supposée identique pour toutes)
+RESERVATION_DURATION = timedelta(hours=2)
+
+# Seules les réservations 'confirmed' ou 'pending' bloquent une table
+BLOCKING_STATUSES = [Reservation.ReservationStatus.CONFIRMED, Reservation.ReservationStatus.PENDING]
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_minutes_delta(delta):
+    return int(delta.total_seconds() // 60)
+
+
+def slot_minutes():
+    return getattr(settings, 'RESERVATION_SLOT_MINUTES', 30)
+
+
+def service_slots():
+    """
+    Returns the bookable start times of a service night, as ``time`` objects,
+    from settings.RESERVATION_SERVICE_HOURS every settings.RESERVATION_SLOT_MINUTES.
+    """
+    opening, last_seating = getattr(settings, 'RESERVATION_SERVICE_HOURS', ('12:00', '22:00'))
+    step = slot_minutes()
+    start = to_minutes(datetime.strptime(opening, "%H:%M").time())
+    end = to_minutes(datetime.strptime(last_seating, "%H:%M").time())
+    return [time(minute // 60, minute % 60) for minute in range(start, end + 1, step)]
+
+
+def covered_times(start_time):
+    """
+    Returns the slot start times overlapped by a booking starting at ``start_time``: the
+    RESERVATION_SLOT_MINUTES grid counted from midnight, up to the end of the booking (cut at
+    midnight). Two bookings of a table overlap exactly when they cover a common slot.
+    """
+    step = slot_minutes()
+    start = to_minutes(start_time)
+    end = min(start + to_minutes_delta(RESERVATION_DURATION), MINUTES_PER_DAY)
+    return [time(minute // 60, minute % 60) for minute in range(start - start % step, end, step)]
+
+
+def held_times_by_table(location, reservation_date):
+    """
+    Returns {table_id: {slot time, ...}} for the slots held at a location on a date (see
+    api/inventory.py), in one query on the partial index table_slot_held_idx.
+    """
+    slots = TableSlot.objects.using(locations.database_for(location)).filter(
+        restaurant=location, slot_date=reservation_date, reservation__isnull=False
+    )
+    held = {}
+    for table_id, slot_time in slots.values_list('table_id', 'slot_time'):
+        held.setdefault(table_id, set()).add(slot_time)
+    return held
+
+
+def active_tables(location):
+    return Table.objects.filter(restaurant=location, is_active=True)
+
+
+def available_tables(reservation_date, reservation_time, num_guests, location=None):
+    """
+    Returns the active tables of ``location`` (default: settings.DEFAULT_LOCATION) seating
+    ``num_guests`` that are free for a booking starting at ``reservation_date`` ``reservation_time``.
+    """
+    location = location or locations.default_location()
+    potential_tables = active_tables(location).filter(capacity__gte=num_guests)
+    needed = set(covered_times(reservation_time))
+    unavailable_table_ids = {
+        table_id for table_id, held in held_times_by_table(location, reservation_date).items() if held & needed
+    }
+    return potential_tables.exclude(id__in=unavailable_table_ids)
+
+
+def slot_availability(reservation_date, location=None):
+    """
+    Returns {'HH:MM': [capacity of each free table, ...]} for every service slot of a date at a location.
+    Two queries whatever the number of slots, so one snapshot can be shared by every listener.
+    """
+    location = location or locations.default_location()
+    tables = list(active_tables(location).values_list('id', 'capacity'))
+    held = held_times_by_table(location, reservation_date)
+    snapshot = {}
+    for slot in service_slots():
+        needed = set(covered_times(slot))
+        snapshot[slot.strftime("%H:%M")] = sorted(
+            capacity for table_id, capacity in tables if not held.get(table_id, set()) & needed
+        )
+    return snapshot
+
+
+def count_for_party(snapshot, num_guests):
+    """
+    Reduces a slot snapshot to {'HH:MM': number of free tables seating ``num_guests``}.
+    """
+    return {
+        slot: sum(1 for capacity in capacities if capacity >= num_guests)
+        for slot, capacities in snapshot.items()
+    }
@@ -0,0 +1,209 @@
+"""
+Bulk reservation creation for group and corporate bookings (POST /api/reservations/bulk/,
+admins only): up to 500 parties in one request.
+
+The batch is validated in one pass: every row, then availability against the location's
+active tables and the slots held on each date (one query per date), the rows of the batch
+included, so two parties never get the same table. Rows without a table get the smallest free
+one seating them (``assign_tables``). In ``atomic`` mode any invalid row rejects the whole
+batch; in ``partial`` mode the valid rows are created and the others reported by index.
+
+The rows are then inserted with bulk_create in one transaction, on the location's database,
+and their slots claimed with the same conditional UPDATE as Reservation.save() (see
+api/inventory.py): a table taken meanwhile by another request rolls everything back (atomic)
+or drops that row (partial). bulk_create sends no post_save, so the availability stream,
+webhooks and guest records are handled here: the webhook events are written to the outbox with
+the rows (api/webhooks.py), and once committed the batch's confirmations, with a single summary
+for the restaurant, are sent over one mail connection. A mail or stream failure after the
+commit is logged; the batch is already saved, so the response does not fail because of it.
+"""
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import customers, inventory, locations, metrics, webhooks
+from .availability import active_tables, covered_times, held_times_by_table
+from .models import Reservation, TableUnavailable
+from .serializers import BulkReservationRowSerializer
+from .streams import broadcaster
+
+ATOMIC = 'atomic'
+PARTIAL = 'partial'
+
+
+def confirmation_email(reservation):
+    """
+    Returns (subject, body) of the email telling a guest their request was received.
+    """
+    subject = f"Confirmation de votre réservation chez New Treichville (ID: {reservation.id})"
+    body = (
+        f"Bonjour {reservation.customer_name},\n\n"
+        f"Votre demande de réservation pour le {reservation.reservation_date.strftime('%d/%m/%Y')} "
+        f"à {reservation.reservation_time.strftime('%H:%M')} pour {reservation.number_of_guests} personne(s) "
+        f"a bien été reçue et est en attente de confirmation.\n\n"
+        f"Détails de la demande :\n"
+        f"Nom: {reservation.customer_name}\n"
+        f"Email: {reservation.customer_email}\n"
+        f"Téléphone: {reservation.customer_phone}\n"
+        f"Demandes spéciales: {reservation.special_requests or 'Aucune'}\n\n"
+        f"Nous vous contacterons bientôt pour confirmer définitivement votre table.\n\n"
+        f"Cordialement,\nL'équipe New Treichville"
+    )
+    return subject, body
+
+
+def validated_rows(rows, errors):
+    cleaned = {}
+    for index, row in enumerate(rows):
+        serializer = BulkReservationRowSerializer(data=row)
+        if serializer.is_valid():
+            cleaned[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+    return cleaned
+
+
+def allocate(location, rows, assign_tables, errors):
+    """
+    Checks each row's table, or picks one, against the slots held on its date and those of the
+    rows before it. Returns {index: table or None}.
+    """
+    tables = {table.pk: table for table in active_tables(location)}
+    # Plus petite table suffisante d'abord, pour garder les grandes aux grands groupes
+    by_size = sorted(tables.values(), key=lambda table: (table.capacity, table.pk))
+    held = {}
+    allocated = {}
+    for index, row in rows.items():
+        day = row['reservation_date']
+        if day not in held:
+            held[day] = held_times_by_table(location, day)
+        day_held = held[day]
+        needed = set(covered_times(row['reservation_time']))
+        table_id = row.get('table')
+        if table_id is not None:
+            table = tables.get(table_id)
+            if table is None:
+                errors[index] = {'table': [f"No active table {table_id} at this location."]}
+                continue
+            if table.capacity < row['number_of_guests']:
+                errors[index] = {'table': [f"Table {table.name} seats {table.capacity}."]}
+                continue
+            if day_held.get(table.pk, set()) & needed:
+                errors[index] = {'table': ["This table is already booked at that time."]}
+                continue
+        elif assign_tables:
+            table = next(
+                (table for table in by_size
+                 if table.capacity >= row['number_of_guests'] and not day_held.get(table.pk, set()) & needed),
+                None,
+            )
+            if table is None:
+                errors[index] = {'table': [f"No table available for {row['number_of_guests']} guest(s) at this time."]}
+                continue
+        else:
+            table = None
+        if table is not None:
+            day_held.setdefault(table.pk, set()).update(needed)
+        allocated[index] = table
+    return allocated
+
+
+def create_reservations(location, rows, mode=ATOMIC, assign_tables=True):
+    """
+    Validates and creates the parties of ``rows`` (reservation dicts, as for POST
+    /api/reservations/). Returns ({index: Reservation}, {index: errors}). Raises
+    ValidationError in atomic mode, without writing anything, if a row is invalid or
+    unavailable, and TableUnavailable if a table was taken meanwhile.
+    """
+    errors = {}
+    cleaned = validated_rows(rows, errors)
+    allocated = allocate(location, cleaned, assign_tables, errors)
+    if errors and mode == ATOMIC:
+        raise ValidationError({'reservations': errors})
+
+    guests = customers.customers_for(
+        (row['customer_name'], row['customer_email'], row['customer_phone']) for row in cleaned.values()
+    )
+    reservations = {}
+    for index, table in allocated.items():
+        row = dict(cleaned[index], table=table)
+        reservations[index] = Reservation(
+            restaurant=location, customer=guests.get(customers.normalize_email(row['customer_email'])), **row
+        )
+
+    using = locations.database_for(location)
+    with transaction.atomic(using=using):
+        while reservations:
+            try:
+                with transaction.atomic(using=using):
+                    insert(location, reservations.values(), using)
+                break
+            except TableUnavailable as e:
+                # Table prise entre la vérification et l'insertion par une autre requête
+                if mode == ATOMIC:
+                    raise
+                index = next(index for index, reservation in reservations.items() if reservation is e.args[0])
+                errors[index] = {'table': ["This table was booked meanwhile."]}
+                del reservations[index]
+                for reservation in reservations.values(): # Insertion annulée : à refaire sans cette ligne
+                    reservation.pk = None
+                    reservation._state.adding = True
+        if reservations:
+            created = list(reservations.values())
+            webhooks.enqueue_in_transaction(
+                webhooks.Event.RESERVATION_CREATED, location.pk, lambda: webhooks.reservation_data(created), using
+            )
+            transaction.on_commit(lambda: after_commit(location, created), using=using)
+    return reservations, errors
+
+
+def insert(location, reservations, using):
+    reservations = Reservation.objects.using(using).bulk_create(reservations)
+    wanted = [inventory.wanted_slots(reservation) for reservation in reservations]
+    inventory.create_slots(location.pk, set().union(*wanted), using) # Créneaux absents, pris ci-dessous
+    for reservation, slots in zip(reservations, wanted):
+        inventory.claim(reservation, slots, using)
+
+
+def after_commit(location, reservations):
+    # Ce que les signaux post_save feraient pour chaque ligne, une fois pour le lot ; le lot est
+    # déjà validé : une erreur ici est journalisée, pas renvoyée au client
+    try:
+        for day in {reservation.reservation_date for reservation in reservations}:
+            broadcaster.notify(location.pk, day)
+        send_confirmations(reservations)
+    except Exception as e:
+        print(f"Erreur après l'enregistrement de réservations groupées: {e}")
+
+
+def send_confirmations(reservations):
+    """
+    Sends every guest's confirmation and one summary to the restaurant over one connection.
+    Returns the number of messages sent; a failure is logged and does not undo the batch.
+    """
+    messages = []
+    for reservation in reservations:
+        subject, body = confirmation_email(reservation)
+        messages.append(EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [reservation.customer_email]))
+    lines = "\n".join(
+        f"- {reservation.customer_name} : {reservation.number_of_guests} pers., "
+        f"{reservation.reservation_date.strftime('%d/%m/%Y')} {reservation.reservation_time.strftime('%H:%M')}, "
+        f"table {reservation.table or 'non assignée'} (ID {reservation.id})"
+        for reservation in reservations
+    )
+    messages.append(EmailMessage(
+        f"{len(reservations)} nouvelle(s) réservation(s) de groupe",
+        f"Réservations créées en lot :\n\n{lines}\n\nVeuillez les vérifier dans l'interface d'administration.",
+        settings.DEFAULT_FROM_EMAIL,
+        [settings.ADMIN_EMAIL],
+    ))
+    with metrics.timer('email_send_duration_seconds', kind='reservation-bulk'):
+        try:
+            with get_connection() as connection:
+                return connection.send_messages(messages)
+        except Exception as e:
+            metrics.inc('email_send_failures_total', kind='reservation-bulk')
+            print(f"Erreur lors de l'envoi des confirmations de réservations groupées: {e}")
+            return 0
@@ -0,0 +1,150 @@
+"""
+Guests (Customer) shared by reservations and contact messages.
+
+A guest is identified by their normalised email (lowercased, unique); the phone number is kept
+in E.164 form (+22507...) and indexed. Reservation.save() and ContactMessage.save() link each
+row to its guest, creating it on first contact, so a guest's history, no-show count or VIP flag
+is an indexed lookup on Reservation (customer, status) rather than an icontains scan of the
+free-text columns. Numbers are parsed with the optional ``phonenumbers`` package when it is
+installed, otherwise with CUSTOMERS['DEFAULT_COUNTRY_CODE'] for national numbers.
+
+Customers live in the default database, like locations and tables; reservations of a location
+with its own database (LOCATION_DATABASES) reference them without a foreign key constraint.
+"""
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count
+
+from . import locations
+
+try:
+    import phonenumbers
+except ImportError: # Facultatif : sans phonenumbers, normalisation simple ci-dessous
+    phonenumbers = None
+
+PHONE_DIGITS_RE = re.compile(r'\D')
+E164_MAX_DIGITS = 15
+MIN_PHONE_DIGITS = 8
+
+
+def customers_setting(name, default=None):
+    return getattr(settings, 'CUSTOMERS', {}).get(name, default)
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    """
+    Returns the number in E.164 form, or '' when it cannot be read as a phone number.
+    """
+    phone = (phone or '').strip()
+    if not phone:
+        return ''
+    country_code = str(customers_setting('DEFAULT_COUNTRY_CODE', '225'))
+    if phonenumbers is not None:
+        try:
+            region = phonenumbers.region_code_for_country_code(int(country_code))
+            number = phonenumbers.parse(phone, region)
+        except (ValueError, phonenumbers.NumberParseException):
+            return ''
+        return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164) if phonenumbers.is_possible_number(number) else ''
+    digits = PHONE_DIGITS_RE.sub('', phone)
+    if digits.startswith('00') and not phone.startswith('+'):
+        digits = digits[2:]
+    elif not phone.startswith('+'):
+        # Numéro national : en Côte d'Ivoire le 0 initial fait partie du numéro (+225 07...)
+        if customers_setting('STRIP_TRUNK_PREFIX', False):
+            digits = digits.lstrip('0')
+        digits = country_code + digits
+    if not MIN_PHONE_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return ''
+    return f'+{digits}'
+
+
+def customer_for(name, email, phone=''):
+    """
+    Returns the guest with this email, creating it if needed. Details sent by the public forms
+    never overwrite the stored ones: only a blank name or phone is filled in. Returns None
+    without a usable email.
+    """
+    from .models import Customer
+    email = normalize_email(email)
+    if not email:
+        return None
+    phone = normalize_phone(phone)
+    customers = Customer.objects.using(DEFAULT_DB_ALIAS)
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            customer, created = customers.get_or_create(email=email, defaults={'name': name, 'phone': phone})
+    except IntegrityError: # Créé entre-temps par une requête concurrente
+        customer, created = customers.get(email=email), False
+    if not created:
+        # N'importe qui peut réserver avec cette adresse : on complète, on ne remplace pas
+        changes = {field: value for field, value in (('name', name), ('phone', phone)) if value and not getattr(customer, field)}
+        for field, value in changes.items():
+            if customers.filter(pk=customer.pk, **{field: ''}).update(**{field: value}):
+                setattr(customer, field, value)
+    return customer
+
+
+def customers_for(contacts):
+    """
+    Bulk variant of customer_for() for (name, email, phone) tuples: returns {normalised email:
+    Customer}, creating the missing guests in one query. Existing guests keep their details.
+    """
+    from .models import Customer
+    latest = {}
+    for name, email, phone in contacts:
+        email = normalize_email(email)
+        if email:
+            latest[email] = (name, normalize_phone(phone))
+    customers = Customer.objects.using(DEFAULT_DB_ALIAS)
+    found = {customer.email: customer for customer in customers.filter(email__in=latest)}
+    missing = [Customer(email=email, name=name, phone=phone) for email, (name, phone) in latest.items() if email not in found]
+    if missing:
+        customers.bulk_create(missing, ignore_conflicts=True) # Créés entre-temps : relus ci-dessous
+        found.update((customer.email, customer) for customer in customers.filter(email__in=[customer.email for customer in missing]))
+    return found
+
+
+def reservation_counts(customer):
+    """
+    Returns {status: count} of the guest's reservations in every reservation database, one
+    query per database on the index reservation_customer_idx.
+    """
+    from .models import Reservation
+    counts = {}
+    for using in locations.reservation_databases():
+        rows = Reservation.objects.using(using).filter(customer_id=customer.pk).values('status').annotate(count=Count('id')).order_by()
+        for row in rows:
+            counts[row['status']] = counts.get(row['status'], 0) + row['count']
+    return counts
+
+
+def history(customer, limit=50):
+    """
+    Returns the guest's latest reservations, across every reservation database.
+    """
+    from .models import Reservation
+    reservations = []
+    for using in locations.reservation_databases():
+        reservations.extend(Reservation.objects.using(using).filter(customer_id=customer.pk)[:limit])
+    reservations.sort(key=lambda reservation: (reservation.reservation_date, reservation.reservation_time), reverse=True)
+    return reservations[:limit]
+
+
+def search_filter(search_term):
+    """
+    Returns the {field: value} lookup of a search term that is an email or a phone number, or
+    None for any other term.
+    """
+    if '@' in search_term:
+        return {'email': normalize_email(search_term)}
+    if len(PHONE_DIGITS_RE.sub('', search_term)) >= MIN_PHONE_DIGITS and not re.search(r'[^\d\s+().-]', search_term):
+        phone = normalize_phone(search_term)
+        return {'phone': phone} if phone else None
+    return None
@@ -0,0 +1,198 @@
+"""
+Static build of the public pages (manage.py build_frontend).
+
+The catalog pages are rendered with the current Category/Dish/Event data, both as HTML
+(between the ``<!-- catalog:start -->`` and ``<!-- catalog:end -->`` markers of the source
+page) and as a ``catalogData`` JSON island for main.js, so visitors see the menu without an
+API round trip. CSS/JS are minified and written under content-hashed names, and the pages
+rewritten to point at them (below FRONTEND_BUILD['ASSET_URL'] when set, e.g. STATIC_URL for
+assets gathered by collectstatic through BuildFinder). Every output file gets precompressed
+siblings (api/assets.py).
+
+Builds are incremental: a manifest records the fingerprint of every output file, and
+files whose content did not change are left untouched (same mtime, same ETag). With FRONTEND_BUILD['AUTO_BUILD'],
+catalog changes schedule a rebuild (see api/signals.py).
+"""
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.utils import get_files
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import json_script
+
+from . import assets, locations, recurrence
+from .models import Category, Dish, Event
+from .serializers import CategorySerializer, DishSerializer, occurrence_data
+
+MANIFEST_NAME = '.build-manifest.json'
+STATIC_PREFIX = 'static/'
+ASSETS = ['static/css/style.css', 'static/js/main.js']
+CATALOG_BLOCK_RE = re.compile(r'<!-- catalog:start.*?-->.*?<!-- catalog:end -->', re.DOTALL)
+
+# Page -> (template of the catalog block, datasets it embeds)
+CATALOG_PAGES = {
+    'index.html': ('api/frontend/index_catalog.html', ['featured_dishes', 'events']),
+    'menu.html': ('api/frontend/menu_catalog.html', ['categories', 'dishes']),
+    'events.html': ('api/frontend/events_catalog.html', ['events']),
+}
+
+
+def build_setting(name, default=None):
+    defaults = {
+        'SOURCE_DIR': Path(settings.BASE_DIR) / 'frontend',
+        'OUTPUT_DIR': Path(settings.BASE_DIR) / 'frontend' / 'dist',
+    }
+    return getattr(settings, 'FRONTEND_BUILD', {}).get(name, defaults.get(name, default))
+
+
+def fingerprint(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode())
+    return digest.hexdigest()[:12]
+
+
+def catalog_datasets(location=None):
+    """
+    Returns the catalog of a location (default: settings.DEFAULT_LOCATION) as the API would
+    serve it, one query per dataset.
+    """
+    location = location or locations.default_location()
+    dishes = Dish.objects.filter(restaurant=location, is_available=True).order_by('category__order', 'category__name', 'name')
+    today = timezone.localdate()
+    events = recurrence.in_window(Event.objects.filter(restaurant=location, is_published=True), today).prefetch_related(
+        recurrence.overrides_prefetch(today)
+    )
+    dish_data = DishSerializer(dishes, many=True).data
+    return {
+        'categories': CategorySerializer(Category.objects.filter(restaurant=location), many=True).data,
+        'dishes': dish_data,
+        'featured_dishes': [dish for dish in dish_data if dish['is_featured']],
+        'events': occurrence_data(recurrence.expand(events, today)),
+    }
+
+
+def hashed_asset_name(relative_path, content):
+    path = Path(relative_path)
+    return str(path.with_name(f"{path.stem}.{fingerprint(content)}{path.suffix}"))
+
+
+def build(source_dir=None, output_dir=None, force=False):
+    """
+    Builds the site into output_dir. Returns the list of files written.
+    """
+    source_dir = Path(source_dir or build_setting('SOURCE_DIR'))
+    output_dir = Path(output_dir or build_setting('OUTPUT_DIR'))
+    manifest_path = output_dir / MANIFEST_NAME
+    previous = {} if force or not manifest_path.exists() else json.loads(manifest_path.read_text())
+    manifest, written = {}, []
+
+    def write(relative_path, content, key):
+        content = content if isinstance(content, bytes) else content.encode()
+        variants = assets.compressed_variants(content)
+        manifest[relative_path] = key
+        for suffix in variants:
+            manifest[relative_path + suffix] = key
+        target = output_dir / relative_path
+        if previous.get(relative_path) == key and target.exists():
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        for suffix, compressed in variants.items():
+            target.with_name(target.name + suffix).write_bytes(compressed)
+        written.append(relative_path)
+
+    asset_names = {}
+    asset_url = build_setting('ASSET_URL')
+    for asset in ASSETS:
+        content = assets.minify(asset, (source_dir / asset).read_bytes())
+        asset_names[asset] = hashed_asset_name(asset, content)
+        write(asset_names[asset], content, asset_names[asset])
+
+    datasets = catalog_datasets()
+    for page in sorted(source_dir.glob('*.html')):
+        html = page.read_text()
+        for asset, hashed in asset_names.items():
+            url = asset_url + hashed.removeprefix(STATIC_PREFIX) if asset_url else hashed
+            html = html.replace(f'"{asset}"', f'"{url}"')
+        if page.name in CATALOG_PAGES:
+            template, names = CATALOG_PAGES[page.name]
+            data = {name: datasets[name] for name in names}
+            block = render_to_string(template, data) + json_script(data, 'catalogData')
+            html = CATALOG_BLOCK_RE.sub(lambda match: block, html)
+        write(page.name, html, fingerprint(html))
+
+    # Anciennes versions des assets : plus référencées par aucune page
+    for relative_path in set(previous) - set(manifest):
+        (output_dir / relative_path).unlink(missing_ok=True)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return written
+
+
+_pending_build = None
+_pending_lock = threading.Lock()
+
+
+def schedule_build(delay=None):
+    """
+    Rebuilds in a background thread after ``delay`` seconds; calls made meanwhile are
+    coalesced, so an admin editing ten dishes triggers one build.
+    """
+    global _pending_build
+    if delay is None:
+        delay = build_setting('AUTO_BUILD_DELAY', 2)
+    with _pending_lock:
+        if _pending_build is not None:
+            return
+        _pending_build = threading.Timer(delay, _run_scheduled_build)
+        _pending_build.daemon = True
+        _pending_build.start()
+
+
+def _run_scheduled_build():
+    global _pending_build
+    with _pending_lock:
+        _pending_build = None
+    try:
+        build()
+    except Exception as e:
+        print(f"Erreur lors de la génération du site statique: {e}")
+    finally:
+        close_old_connections()
+
+
+def static_dir():
+    return Path(build_setting('OUTPUT_DIR')) / STATIC_PREFIX
+
+
+class BuildFinder(BaseFinder):
+    """
+    Staticfiles finder for the built assets (OUTPUT_DIR/static), so that collectstatic copies
+    them, precompressed siblings included, to STATIC_ROOT. Run build_frontend first.
+    """
+
+    def check(self, **kwargs):
+        return [] # Le dossier n'existe qu'après le premier build
+
+    def find(self, path, find_all=False, **kwargs):
+        target = static_dir() / path
+        if target.is_file():
+            return [str(target)] if find_all else str(target)
+        return [] if find_all else None
+
+    def list(self, ignore_patterns):
+        if not static_dir().is_dir():
+            return
+        storage = FileSystemStorage(location=static_dir())
+        for path in get_files(storage, ignore_patterns):
+            yield path, storage
@@ -0,0 +1,124 @@
+"""
+iCalendar (RFC 5545) feed of the published events of a location, served on /api/events.ics.
+
+The feed is generated as a stream of chunks from a server-side cursor, so memory does not
+grow with the number of events. Recurring events are expanded over the feed's window (see
+api/recurrence.py), one VEVENT per occurrence with its overrides applied. The generated text
+is kept in the shared cache under the version of the location's 'event' response cache tag
+(see api/response_cache.py), the request's host (it appears in the UIDs) and the current
+date: it is rebuilt only after an Event change, or once a day for the date window. The same
+version is sent as the ETag, so calendar apps polling the feed mostly get 304s.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from . import recurrence, response_cache
+from .models import Event
+
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+CACHE_KEY = 'events-ics:{}'
+CACHE_TIMEOUT = 24 * 3600 # La clé change chaque jour de toute façon
+# Les événements n'ont pas d'heure de fin : durée affichée dans les agendas
+EVENT_DURATION = timedelta(hours=3)
+PAST_DAYS = 30 # Les événements récents restent visibles dans les agendas abonnés
+CHUNK_SIZE = 200
+
+
+def escape_text(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """
+    Splits a content line into 75-octet lines, as RFC 5545 requires (continuations start with a space).
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1 # Ne pas couper un caractère UTF-8
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def utc_stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_component(occurrence, domain):
+    event = occurrence.event
+    start = timezone.make_aware(datetime.combine(occurrence.date, occurrence.time))
+    # Une occurrence garde son identifiant (date d'origine) quand elle est déplacée
+    uid = f'event-{event.pk}-{occurrence.original_date:%Y%m%d}' if event.recurrence else f'event-{event.pk}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{domain}',
+        f'DTSTAMP:{utc_stamp(event.updated_at)}',
+        f'DTSTART:{utc_stamp(start)}',
+        f'DTEND:{utc_stamp(start + EVENT_DURATION)}',
+        f'SUMMARY:{escape_text(occurrence.title)}',
+        f'DESCRIPTION:{escape_text(occurrence.description)}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def feed_window():
+    return timezone.localdate() - timedelta(days=PAST_DAYS)
+
+
+def feed_events(location):
+    since = feed_window()
+    events = Event.objects.filter(restaurant=location, is_published=True)
+    return recurrence.in_window(events, since).order_by('event_date', 'event_time').only(
+        'title', 'description', 'event_date', 'event_time', 'recurrence', 'recurrence_end', 'updated_at'
+    ).prefetch_related(recurrence.overrides_prefetch(since))
+
+
+def calendar_chunks(location, domain):
+    yield fold('BEGIN:VCALENDAR') + fold('VERSION:2.0') + fold(f'PRODID:-//{domain}//Evenements//FR')
+    yield fold('CALSCALE:GREGORIAN') + fold(f'X-WR-CALNAME:{escape_text(location.name)}')
+    since = feed_window()
+    batch = []
+    for event in feed_events(location).iterator(chunk_size=CHUNK_SIZE):
+        batch.extend(event_component(occurrence, domain) for occurrence in recurrence.occurrences(event, since))
+        if len(batch) >= CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    yield ''.join(batch) + fold('END:VCALENDAR')
+
+
+def feed_version(location, domain):
+    """
+    Returns the version of a location's feed as served on ``domain`` (changes with every Event
+    change there and every day), or None when the response cache is disabled. The domain is
+    part of it because the UIDs and PRODID of the cached text are built from it.
+    """
+    if not response_cache.is_enabled():
+        return None
+    version, = response_cache.tag_versions([response_cache.location_tag('event', location.pk)])
+    return f"{location.pk}-{domain}-{version}-{timezone.localdate().isoformat()}"
+
+
+def cached_feed(version):
+    return response_cache.shared_cache().get(CACHE_KEY.format(version))
+
+
+def caching_chunks(location, domain, version):
+    """
+    Streams the feed and stores it in the cache once fully generated.
+    """
+    chunks = []
+    for chunk in calendar_chunks(location, domain):
+        chunks.append(chunk)
+        yield chunk
+    if version is not None:
+        response_cache.shared_cache().set(CACHE_KEY.format(version), ''.join(chunks), CACHE_TIMEOUT)
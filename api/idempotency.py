@@ -0,0 +1,121 @@
+"""
+Idempotency-Key support for create actions.
+
+The first request with a given key claims it by inserting an IdempotencyKey row (the unique
+(scope, key) constraint serialises concurrent requests), runs normally and stores its
+response. Retries with the same key get the stored response back without running the
+serializer, the database writes or the emails again. A retry that arrives while the first
+request is still running waits for it briefly, then gets 409 with Retry-After.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_setting(name, default):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, default)
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(f"{request.method} {request.get_full_path()}\n{payload}".encode()).hexdigest()
+
+
+def replay(record):
+    response = Response(record.response_body, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotentCreateMixin:
+    """
+    Makes a viewset's create action honour the Idempotency-Key header.
+    """
+    idempotency_scope = None
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters long."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = self.idempotency_scope or f"{self.basename}-create"
+        fingerprint = request_fingerprint(request)
+        record, early_response = self.claim_idempotency_key(scope, key, fingerprint)
+        if early_response is not None:
+            return early_response
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            record.delete() # La requête pourra être rejouée
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code, response_body=response.data
+            )
+        return response
+
+    def claim_idempotency_key(self, scope, key, fingerprint):
+        """
+        Returns (record, None) when this request owns the key, else (None, response to send).
+        """
+        deadline = time.monotonic() + idempotency_setting('WAIT_SECONDS', 5)
+        while True:
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        scope=scope, key=key, request_fingerprint=fingerprint,
+                        expires_at=now + timedelta(seconds=idempotency_setting('TTL_SECONDS', 86400)),
+                    )
+                return record, None
+            except IntegrityError:
+                pass
+
+            existing = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if existing is None:
+                continue # Supprimée entre-temps : retenter
+            abandoned = existing.status_code is None and (
+                existing.created_at < now - timedelta(seconds=idempotency_setting('LOCK_TIMEOUT_SECONDS', 60))
+            )
+            if existing.expires_at <= now or abandoned:
+                # Conditionnel : une seule requête concurrente reprend la clé
+                IdempotencyKey.objects.filter(pk=existing.pk, status_code=existing.status_code).delete()
+                continue
+            if existing.request_fingerprint != fingerprint:
+                return None, Response(
+                    {"error": f"This {HEADER} was already used with a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if existing.status_code is not None:
+                metrics.inc('idempotent_replays_total', scope=scope)
+                return None, replay(existing)
+            if time.monotonic() >= deadline:
+                response = Response(
+                    {"error": "A request with this Idempotency-Key is still being processed."},
+                    status=status.HTTP_409_CONFLICT
+                )
+                response['Retry-After'] = '1'
+                return None, response
+            time.sleep(idempotency_setting('POLL_SECONDS', 0.1))
@@ -0,0 +1,118 @@
+"""
+Table slot inventory: one TableSlot row per table and per RESERVATION_SLOT_MINUTES step of a
+day, generated ahead of time (manage.py generate_table_slots), or created on first use.
+
+A reservation with a table and a blocking status holds every slot overlapping
+[start, start + RESERVATION_DURATION). Reservation.save() claims them, in its own
+transaction, with a single conditional ``UPDATE ... SET reservation = <id> WHERE
+reservation IS NULL``. The claim must match every needed slot, otherwise the whole save is
+rolled back (TableUnavailable). Each slot exists once (unique table/date/time), so two
+concurrent bookings of a table can never both hold it: double booking is impossible without
+a global lock. Releasing is an UPDATE back to NULL; deleting a reservation releases its slots
+through the SET_NULL foreign key.
+
+Availability (api/availability.py) reads the held slots of a date through the partial index
+table_slot_held_idx.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db import DEFAULT_DB_ALIAS
+
+from . import locations
+from .availability import BLOCKING_STATUSES, covered_times, service_slots
+from .models import Table, TableSlot, TableUnavailable
+
+# Champs de Reservation qui déterminent les créneaux tenus
+SLOT_FIELDS = {'table', 'table_id', 'reservation_date', 'reservation_time', 'status'}
+
+
+def day_times():
+    """
+    Slot times of a service day: from the first seating to the end of a booking at the last one.
+    """
+    times = set()
+    for slot in service_slots():
+        times.update(covered_times(slot))
+    return sorted(times)
+
+
+def wanted_slots(reservation):
+    if reservation.table_id is None or reservation.status not in BLOCKING_STATUSES:
+        return set()
+    reservation_time = reservation.reservation_time
+    if isinstance(reservation_time, str):
+        reservation_time = datetime.strptime(reservation_time[:5], "%H:%M").time()
+    reservation_date = reservation.reservation_date
+    if isinstance(reservation_date, str):
+        reservation_date = date.fromisoformat(reservation_date)
+    return {(reservation.table_id, reservation_date, slot_time) for slot_time in covered_times(reservation_time)}
+
+
+def create_slots(restaurant_id, slots, using):
+    TableSlot.objects.using(using).bulk_create(
+        [TableSlot(restaurant_id=restaurant_id, table_id=table_id, slot_date=day, slot_time=slot_time) for table_id, day, slot_time in slots],
+        ignore_conflicts=True, # Créés entre-temps par une autre requête
+    )
+
+
+def ensure_slots(location, day, tables=None):
+    """
+    Creates the missing slots of a day for the location's active tables.
+    """
+    tables = list(tables if tables is not None else Table.objects.filter(restaurant=location, is_active=True))
+    slots = {(table.pk, day, slot_time) for table in tables for slot_time in day_times()}
+    create_slots(location.pk, slots, locations.database_for(location))
+
+
+def claim(reservation, slots, using):
+    if not slots:
+        return
+    table_id, day = next(iter(slots))[:2]
+    times = [slot_time for _, _, slot_time in slots]
+    candidates = TableSlot.objects.using(using).filter(table_id=table_id, slot_date=day, slot_time__in=times)
+    claimed = candidates.filter(reservation__isnull=True).update(reservation=reservation)
+    if claimed < len(slots) and candidates.count() < len(slots):
+        # Créneaux pas encore générés (date lointaine, table ajoutée, horaire hors service)
+        create_slots(reservation.restaurant_id, slots, using)
+        claimed += candidates.filter(reservation__isnull=True).update(reservation=reservation)
+    if claimed < len(slots):
+        raise TableUnavailable(reservation)
+
+
+def sync_reservation(reservation, using=DEFAULT_DB_ALIAS):
+    """
+    Makes the reservation hold exactly the slots its table, date, time and status call for.
+    Must run in the transaction that saves the reservation.
+    """
+    held = TableSlot.objects.using(using).filter(reservation=reservation)
+    wanted = wanted_slots(reservation)
+    if set(held.values_list('table_id', 'slot_date', 'slot_time')) == wanted:
+        return
+    held.update(reservation=None)
+    claim(reservation, wanted, using)
+
+
+def is_taken(reservation, using=DEFAULT_DB_ALIAS):
+    """
+    Returns True if another reservation holds one of the reservation's slots.
+    """
+    wanted = wanted_slots(reservation)
+    if not wanted:
+        return False
+    table_id, day = next(iter(wanted))[:2]
+    others = TableSlot.objects.using(using).filter(
+        table_id=table_id, slot_date=day, slot_time__in=[slot_time for _, _, slot_time in wanted], reservation__isnull=False
+    )
+    if reservation.pk is not None:
+        others = others.exclude(reservation_id=reservation.pk)
+    return others.exists()
+
+
+def generate(location, start, days):
+    """
+    Creates the slots of ``days`` days from ``start`` for the location. Returns the number of days.
+    """
+    tables = list(Table.objects.filter(restaurant=location, is_active=True))
+    for offset in range(days):
+        ensure_slots(location, start + timedelta(days=offset), tables)
+    return days
@@ -0,0 +1,120 @@
+"""
+Time-based reservation status transitions (manage.py advance_reservations, run every few
+minutes, and the "advance" action of the Reservation admin).
+
+- no-show: a pending reservation whose start is more than NO_SHOW_GRACE_MINUTES past;
+- expired: a pending reservation created more than PENDING_HOLD_HOURS ago and not started yet;
+- completed: a confirmed reservation with a table whose booking (RESERVATION_DURATION) is over.
+
+Each transition is a set-based ``UPDATE ... WHERE status = <source>`` in primary key batches,
+read through the index reservation_status_idx: a row changed meanwhile by a host keeps
+the host's status. QuerySet.update() bypasses Reservation.save(), so the table slots of the
+reservations that stopped blocking are released, and their webhook events written to the
+outbox (api/webhooks.py), in the same transaction.
+Each transition then sends one reservations_transitioned signal per database with every row
+it changed, instead of one post_save per row.
+"""
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import locations, webhooks
+from .availability import RESERVATION_DURATION
+from .models import Reservation, TableSlot
+
+Status = Reservation.ReservationStatus
+
+# Envoyé après validation : transition, source, target, reservations [(id, restaurant_id, date)], using
+reservations_transitioned = Signal()
+
+Transition = namedtuple('Transition', ['name', 'source', 'target', 'due'])
+
+
+def lifecycle_setting(name, default=None):
+    return getattr(settings, 'RESERVATION_LIFECYCLE', {}).get(name, default)
+
+
+def started_before(moment):
+    """
+    Reservations starting at or before ``moment`` (local time: dates and times are stored naive).
+    """
+    moment = timezone.localtime(moment)
+    return Q(reservation_date__lt=moment.date()) | Q(reservation_date=moment.date(), reservation_time__lte=moment.time())
+
+
+def no_show_due(now):
+    return started_before(now - timedelta(minutes=lifecycle_setting('NO_SHOW_GRACE_MINUTES', 30)))
+
+
+def expiry_due(now):
+    hold_deadline = now - timedelta(hours=lifecycle_setting('PENDING_HOLD_HOURS', 24))
+    return Q(created_at__lte=hold_deadline) & ~started_before(now)
+
+
+def completion_due(now):
+    return Q(table__isnull=False) & started_before(now - RESERVATION_DURATION)
+
+
+# Dans cet ordre : une réservation en attente déjà passée est absente, pas expirée
+TRANSITIONS = [
+    Transition('no-show', Status.PENDING, Status.NO_SHOW, no_show_due),
+    Transition('expire', Status.PENDING, Status.EXPIRED, expiry_due),
+    Transition('complete', Status.CONFIRMED, Status.COMPLETED, completion_due),
+]
+
+
+def apply_transition(transition, queryset, now, batch_size):
+    """
+    Applies one transition to the due rows of ``queryset`` (one database). Returns the
+    changed rows as (id, restaurant_id, reservation_date) tuples.
+    """
+    using = queryset.db
+    due = queryset.filter(status=transition.source).filter(transition.due(now)).order_by('id')
+    changed = []
+    last_id = 0
+    while True:
+        batch = list(due.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not batch:
+            return changed
+        last_id = batch[-1]
+        with transaction.atomic(using=using):
+            Reservation.objects.using(using).filter(id__in=batch, status=transition.source).update(
+                status=transition.target, updated_at=now
+            )
+            # Relecture : seules les lignes encore dans l'état source ont été modifiées
+            updated = Reservation.objects.using(using).filter(id__in=batch, status=transition.target, updated_at=now)
+            rows = list(updated.values_list('id', 'restaurant_id', 'reservation_date'))
+            TableSlot.objects.using(using).filter(reservation_id__in=[row[0] for row in rows]).update(reservation=None)
+            # Événements webhook écrits avec la transition (bulk : pas de post_save)
+            webhooks.enqueue_reservations(webhooks.Event.RESERVATION_UPDATED, [row[0] for row in rows], using)
+        changed.extend(rows)
+
+
+def advance(queryset=None, now=None, batch_size=500):
+    """
+    Applies every due transition, to ``queryset`` (a Reservation queryset, e.g. an admin
+    selection) or to the reservations of every database. Returns {transition name: count}.
+    """
+    now = now or timezone.now()
+    querysets = [queryset] if queryset is not None else [
+        Reservation.objects.using(using).all() for using in locations.reservation_databases()
+    ]
+    counts = Counter()
+    for base in querysets:
+        for transition in TRANSITIONS:
+            changed = apply_transition(transition, base, now, batch_size)
+            counts[transition.name] += len(changed)
+            if changed:
+                transaction.on_commit(
+                    lambda transition=transition, changed=changed, using=base.db: reservations_transitioned.send(
+                        sender=Reservation, transition=transition.name, source=transition.source,
+                        target=transition.target, reservations=changed, using=using,
+                    ),
+                    using=base.db,
+                )
+    return {transition.name: counts[transition.name] for transition in TRANSITIONS}
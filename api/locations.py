@@ -0,0 +1,154 @@
+"""
+Restaurant locations.
+
+Every public endpoint is scoped to one location, chosen with the ``?location=<slug>`` query
+parameter (settings.DEFAULT_LOCATION when absent). Locations change rarely, so they are kept in
+a per-process map refreshed every CACHE_SECONDS (and right away in the process that edits
+one): resolving the parameter costs no query.
+
+Reservations can be partitioned by location: with LOCATION_DATABASES = {slug: alias}, the
+reservations of that location are stored in the ``alias`` database (its own SQLite file), so
+one site's booking traffic does not contend for another site's write lock. Routing is done by
+LocationRouter for writes; reads go through ``reservations(location)``, which picks the
+database explicitly. Everything else stays in the default database.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import NotFound
+
+from .models import DEFAULT_LOCATION_NAME, Location, Reservation, TableSlot
+
+PARAM = 'location'
+CACHE_SECONDS = 60
+
+_lock = threading.Lock()
+_state = {'loaded_at': None, 'by_slug': {}, 'by_id': {}}
+
+
+class UnknownLocation(Exception):
+    """Raised when a location slug does not match any active location."""
+
+
+def default_slug():
+    return getattr(settings, 'DEFAULT_LOCATION', 'main')
+
+
+def clear_cache():
+    with _lock:
+        _state['loaded_at'] = None
+
+
+def _loaded():
+    with _lock:
+        if _state['loaded_at'] is None or time.monotonic() - _state['loaded_at'] > CACHE_SECONDS:
+            locations = list(Location.objects.using(DEFAULT_DB_ALIAS).all())
+            _state['by_slug'] = {location.slug: location for location in locations}
+            _state['by_id'] = {location.pk: location for location in locations}
+            _state['loaded_at'] = time.monotonic()
+        return _state
+
+
+def by_slug(slug):
+    location = _loaded()['by_slug'].get(slug)
+    if location is None or not location.is_active:
+        raise UnknownLocation(slug)
+    return location
+
+
+def by_id(pk):
+    location = _loaded()['by_id'].get(pk)
+    if location is None:
+        clear_cache() # Créée par un autre processus depuis le dernier chargement
+        location = _loaded()['by_id'].get(pk)
+    return location
+
+
+def default_location():
+    try:
+        return by_slug(default_slug())
+    except UnknownLocation:
+        location, _ = Location.objects.get_or_create(slug=default_slug(), defaults={'name': DEFAULT_LOCATION_NAME})
+        clear_cache()
+        return location
+
+
+def from_request(request):
+    """
+    Returns the location named by the request's ``location`` query parameter, or the default one.
+    """
+    slug = request.GET.get(PARAM)
+    return by_slug(slug) if slug else default_location()
+
+
+def database_for(location):
+    return getattr(settings, 'LOCATION_DATABASES', {}).get(location.slug, DEFAULT_DB_ALIAS)
+
+
+def reservation_databases():
+    """
+    Returns every database holding reservations.
+    """
+    return sorted({DEFAULT_DB_ALIAS, *getattr(settings, 'LOCATION_DATABASES', {}).values()})
+
+
+def reservations(location):
+    return Reservation.objects.using(database_for(location)).filter(restaurant=location)
+
+
+# Stockés avec les réservations de leur restaurant
+PARTITIONED_MODELS = (Reservation, TableSlot)
+
+
+class LocationRouter:
+    """
+    Sends each reservation, and its table slots (api/inventory.py), to its location's database
+    (LOCATION_DATABASES). Other objects reached from a reservation (its location, its table)
+    stay in the default database.
+    """
+
+    def route(self, model, hints):
+        instance = hints.get('instance')
+        if model in PARTITIONED_MODELS:
+            if isinstance(instance, PARTITIONED_MODELS) and instance.restaurant_id is not None:
+                location = by_id(instance.restaurant_id)
+                return database_for(location) if location is not None else None
+            return None
+        if isinstance(instance, PARTITIONED_MODELS):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if isinstance(obj1, PARTITIONED_MODELS) or isinstance(obj2, PARTITIONED_MODELS):
+            return True
+        return None
+
+
+class LocationScopedMixin:
+    """
+    Scopes a view to the request's location: querysets are filtered on ``restaurant`` and the
+    response cache tags (see api/response_cache.py) are per location.
+    """
+
+    @property
+    def location(self):
+        if not hasattr(self, '_location'):
+            try:
+                self._location = from_request(self.request)
+            except UnknownLocation as e:
+                raise NotFound(f"Unknown location: {e}")
+        return self._location
+
+    def get_queryset(self):
+        return super().get_queryset().filter(restaurant=self.location)
+
+    def get_cache_tags(self):
+        return [f"{tag}:{self.location.pk}" for tag in self.cache_tags]
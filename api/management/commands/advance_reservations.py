@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api import lifecycle
+
+
+class Command(BaseCommand):
+    help = "Applies the time-based reservation transitions: no-show, expiry of pending holds, completion (run every few minutes; safe to rerun)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Reservations updated per transaction.")
+
+    def handle(self, *args, **options):
+        counts = lifecycle.advance(batch_size=options['batch_size'])
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts.values())} reservation(s) updated."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api import frontend
+
+
+class Command(BaseCommand):
+    help = "Renders the public pages with the current menu and events embedded, into FRONTEND_BUILD['OUTPUT_DIR']."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Output directory (defaults to FRONTEND_BUILD['OUTPUT_DIR']).")
+        parser.add_argument('--force', action='store_true', help="Rewrite every file, even unchanged ones.")
+
+    def handle(self, *args, **options):
+        written = frontend.build(output_dir=options['output'], force=options['force'])
+        for path in written:
+            self.stdout.write(f"  {path}")
+        self.stdout.write(self.style.SUCCESS(f"{len(written)} file(s) written."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import response_cache
+
+
+class Command(BaseCommand):
+    help = "Prints the hit ratio of each response cache tier (needs METRICS['DIR'] to see other processes)."
+
+    def handle(self, *args, **options):
+        ratios = response_cache.hit_ratios()
+        if not ratios:
+            self.stdout.write("No response cache lookups recorded.")
+            return
+        for tier, (hits, misses, ratio) in sorted(ratios.items()):
+            self.stdout.write(f"{tier}: {hits} hit(s), {misses} miss(es), hit ratio {ratio:.1%}")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import webhooks
+
+
+class Command(BaseCommand):
+    help = "Delivers the queued webhook events (runs continuously; --once for a single pass, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Deliver the due events once and exit.")
+
+    def handle(self, *args, **options):
+        pool = webhooks.ConnectionPool() # Connexions gardées ouvertes d'un passage à l'autre
+        try:
+            while True:
+                counts = webhooks.deliver_due(pool)
+                if options['once'] or any(counts.values()):
+                    self.stdout.write(
+                        f"{counts['delivered']} delivered, {counts['failed']} to retry, {counts['dead']} dead letter(s)."
+                    )
+                if options['once']:
+                    return
+                time.sleep(webhooks.webhook_setting('POLL_SECONDS', 2))
+        finally:
+            pool.close()
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import inventory
+from api.models import Location
+
+
+class Command(BaseCommand):
+    help = "Creates the table slots (api/inventory.py) of the coming days for every active location (run daily)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=60, help="Number of days to generate, from --start (default: 60).")
+        parser.add_argument('--start', help="First day, YYYY-MM-DD (default: today).")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--start must be a YYYY-MM-DD date.")
+        for location in Location.objects.filter(is_active=True):
+            inventory.generate(location, start, options['days'])
+            self.stdout.write(f"  {location.slug}: {options['days']} day(s) from {start}")
+        self.stdout.write(self.style.SUCCESS("Table slots generated."))
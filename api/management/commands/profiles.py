@@ -0,0 +1,49 @@
+import json
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import profiling
+
+
+class Command(BaseCommand):
+    help = "Lists and exports request profiles recorded by ProfilingMiddleware."
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest='subcommand', required=True)
+        subcommands.add_parser('list', help="List stored profiles, newest first.")
+        export = subcommands.add_parser('export', help="Export a profile as collapsed stacks (flamegraph input).")
+        export.add_argument('profile_id', help="Profile id (or a unique prefix), as shown by 'list'.")
+        export.add_argument('--output', '-o', help="Write to this file instead of stdout.")
+        export.add_argument('--sql', action='store_true', help="Export the recorded SQL statements as JSON instead.")
+        subcommands.add_parser('token', help="Print a signed X-Profile header value.")
+
+    def handle(self, *args, **options):
+        getattr(self, f"handle_{options['subcommand']}")(options)
+
+    def handle_list(self, options):
+        for path in profiling.list_dumps():
+            dump = json.loads(path.read_text())
+            started = datetime.fromtimestamp(dump['started_at'], tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self.stdout.write(
+                f"{dump['id']}  {started}  {dump['duration'] * 1000:8.1f} ms  "
+                f"{dump['sql_count']:4d} SQL ({dump['sql_duration'] * 1000:.1f} ms)  "
+                f"{dump['status']} {dump['method']} {dump['path']}"
+            )
+
+    def handle_export(self, options):
+        dump = profiling.load_dump(options['profile_id'])
+        if dump is None:
+            raise CommandError(f"No profile matches '{options['profile_id']}'.")
+        if options['sql']:
+            content = json.dumps(dump['sql'], indent=2) + '\n'
+        else:
+            content = profiling.collapsed_stacks(dump)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(content)
+        else:
+            self.stdout.write(content, ending='')
+
+    def handle_token(self, options):
+        self.stdout.write(profiling.make_token())
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import sync
+from api.models import CatalogTombstone
+
+
+class Command(BaseCommand):
+    help = "Deletes catalog tombstones older than CATALOG_SYNC['TOMBSTONE_DAYS'] (run periodically, e.g. daily)."
+
+    def handle(self, *args, **options):
+        limit = timezone.now() - timedelta(days=sync.sync_setting('TOMBSTONE_DAYS', 30))
+        deleted, _ = CatalogTombstone.objects.filter(deleted_at__lt=limit).delete()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} catalog tombstone(s) deleted."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import search
+from api.models import Dish, Event
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of dishes and events."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search requires the SQLite database backend (FTS5).")
+        search.rebuild(Dish.objects.all(), Event.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {Dish.objects.count()} dishes and {Event.objects.count()} events."
+        ))
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import reminders
+
+
+class Command(BaseCommand):
+    help = "Emails a reminder to the guests of tomorrow's confirmed reservations (run daily; safe to rerun)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Reservation date, YYYY-MM-DD (defaults to tomorrow).")
+        parser.add_argument('--batch-size', type=int, default=200, help="Reservations read and marked per batch.")
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], "%Y-%m-%d").date()
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {e}")
+        else:
+            day = timezone.localdate() + timedelta(days=1)
+
+        try:
+            sent, failed = reminders.send_reminders(day, batch_size=options['batch_size'])
+        except reminders.RemindersAlreadyRunning:
+            raise CommandError("Another send_reminders run is in progress.")
+        self.stdout.write(self.style.SUCCESS(f"{sent} reminder(s) sent for {day:%d/%m/%Y}."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} reminder(s) failed; they will be retried by the next run."))
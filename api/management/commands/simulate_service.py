@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import locations
+from api.models import Table
+
+
+def parse_tables(value):
+    """
+    Parses 'CAPACITY:COUNT,...' (e.g. '2:6,4:8,6:2') into a list of table capacities.
+    """
+    capacities = []
+    try:
+        for part in value.split(','):
+            capacity, count = part.split(':')
+            if int(capacity) < 1 or int(count) < 0:
+                raise ValueError
+            capacities += [int(capacity)] * int(count)
+    except ValueError:
+        raise CommandError(f"Invalid table configuration '{value}', expected CAPACITY:COUNT,... (e.g. 2:6,4:8).")
+    if not capacities:
+        raise CommandError(f"Table configuration '{value}' has no tables.")
+    return capacities
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates service nights against the historical reservation demand and reports seated covers, "
+        "declined and walked parties and seat utilisation per table configuration and overbooking factor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nights', type=int, default=10000, help="Number of simulated nights (default 10000).")
+        parser.add_argument(
+            '--tables', action='append', default=[],
+            help="Table configuration CAPACITY:COUNT,... (repeatable). Defaults to the active tables."
+        )
+        parser.add_argument(
+            '--overbook', type=float, nargs='+', default=[0.0],
+            help="Overbooking factors to compare, e.g. 0 0.1 0.2 (default 0)."
+        )
+        parser.add_argument('--arrivals', type=float, help="Mean booking requests per night (Poisson), instead of history.")
+        parser.add_argument('--no-show-rate', type=float, help="No-show probability, instead of history.")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible runs.")
+        parser.add_argument('--location', help="Location slug (defaults to settings.DEFAULT_LOCATION).")
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+            from api.simulation import DemandProfile, simulate
+        except ImportError:
+            raise CommandError("simulate_service requires NumPy (pip install numpy).")
+
+        try:
+            location = locations.by_slug(options['location']) if options['location'] else locations.default_location()
+        except locations.UnknownLocation:
+            raise CommandError(f"Unknown location '{options['location']}'.")
+
+        configurations = {value: parse_tables(value) for value in options['tables']}
+        if not configurations:
+            capacities = list(Table.objects.filter(restaurant=location, is_active=True).values_list('capacity', flat=True))
+            if not capacities:
+                raise CommandError("No active tables: pass a configuration with --tables.")
+            configurations['current'] = capacities
+
+        demand = DemandProfile.from_history(location)
+        if options['arrivals'] is not None:
+            demand.nightly_arrivals = options['arrivals']
+        if options['no_show_rate'] is not None:
+            demand.no_show_rate = options['no_show_rate']
+
+        # Même demande tirée pour toutes les configurations : les écarts viennent des configurations seules
+        rng = np.random.default_rng(options['seed'])
+        samples = demand.sample(rng, options['nights'])
+
+        self.stdout.write(
+            f"{options['nights']} nights, no-show rate {demand.no_show_rate:.1%}, "
+            f"{samples[0].mean():.1f} booking requests per night on average\n"
+        )
+        self.stdout.write(
+            f"{'configuration':<24} {'overbook':>8} {'covers':>8} {'parties':>8} "
+            f"{'declined':>9} {'walked':>7} {'no-shows':>9} {'utilisation':>12}"
+        )
+        start = time.perf_counter()
+        for name, capacities in configurations.items():
+            for overbooking in options['overbook']:
+                result = simulate(capacities, demand, overbooking=overbooking, samples=samples)
+                self.stdout.write(
+                    f"{name:<24} {overbooking:>8.0%} {result['seated_covers']:>8.1f} {result['seated_parties']:>8.1f} "
+                    f"{result['declined']:>9.2f} {result['walked']:>7.2f} {result['no_shows']:>9.2f} "
+                    f"{result['utilisation']:>12.1%}"
+                )
+        self.stdout.write(f"\nSimulated in {time.perf_counter() - start:.2f}s (figures are per-night means).")
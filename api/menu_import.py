@@ -0,0 +1,205 @@
+"""
+Bulk menu import: categories and dishes of one location from a CSV or JSON file.
+
+JSON: {"categories": [{"name", "description", "order"}, ...],
+       "dishes": [{"name", "category", "description", "price", "is_available", "is_featured"}, ...]}
+CSV: one dish per row with the dish columns above; the category_order and category_description
+columns, when present, update the row's category.
+
+Categories are matched by name, dishes by name within the location; fields missing from a row
+keep their current value. The whole file is validated before anything is written, then applied
+with bulk_create/bulk_update in one transaction. Bulk queries send no model signals, so the
+search index, the response cache, the pre-rendered pages and the webhooks (availability flips)
+are refreshed once at the end.
+With ``replace``, the location's dishes absent from the file are made unavailable (a full menu
+swap); nothing is deleted.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import frontend, response_cache, search, webhooks
+from .models import Category, Dish
+from .serializers import MenuCategoryRowSerializer, MenuDishRowSerializer
+
+CSV = 'csv'
+JSON = 'json'
+CATEGORY_FIELDS = ('description', 'order')
+DISH_FIELDS = ('description', 'price', 'category_id', 'is_available', 'is_featured')
+CSV_CATEGORY_COLUMNS = {'category_description': 'description', 'category_order': 'order'}
+
+
+def format_for(filename, content_type=''):
+    if filename.lower().endswith('.csv') or 'csv' in content_type:
+        return CSV
+    if filename.lower().endswith('.json') or 'json' in content_type:
+        return JSON
+    raise ValidationError({'file': ["Expected a .csv or .json file."]})
+
+
+def parse(content, file_format):
+    """
+    Returns {'categories': [...], 'dishes': [...]} from the file's content (str or bytes).
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValidationError({'file': ["The file must be UTF-8 encoded."]})
+    if file_format == CSV:
+        return parse_csv(content)
+    try:
+        data = json.loads(content)
+    except ValueError as e:
+        raise ValidationError({'file': [f"Invalid JSON: {e}"]})
+    if not isinstance(data, dict):
+        raise ValidationError({'file': ["Expected an object with 'categories' and 'dishes' lists."]})
+    return data
+
+
+def parse_csv(content):
+    categories = {}
+    dishes = []
+    for row in csv.DictReader(io.StringIO(content)):
+        # Cellules vides ignorées : le champ garde sa valeur actuelle
+        row = {key.strip(): value.strip() for key, value in row.items() if key and isinstance(value, str) and value.strip()}
+        category = {CSV_CATEGORY_COLUMNS[key]: row.pop(key) for key in list(row) if key in CSV_CATEGORY_COLUMNS}
+        if row.get('category'):
+            categories.setdefault(row['category'], {'name': row['category']}).update(category)
+        dishes.append(row)
+    return {'categories': list(categories.values()), 'dishes': dishes}
+
+
+def validated_rows(serializer_class, rows, errors, label):
+    if not isinstance(rows, list):
+        errors[label] = ["Expected a list."]
+        return []
+    cleaned = []
+    row_errors = {}
+    seen = set()
+    for index, row in enumerate(rows):
+        serializer = serializer_class(data=row)
+        if not serializer.is_valid():
+            row_errors[index] = serializer.errors
+        elif serializer.validated_data['name'] in seen:
+            row_errors[index] = {'name': ["Appears more than once in the file."]}
+        else:
+            seen.add(serializer.validated_data['name'])
+            cleaned.append(serializer.validated_data)
+    if row_errors:
+        errors[label] = row_errors
+    return cleaned
+
+
+def check_dishes(rows, existing_dishes, category_names, errors):
+    row_errors = {}
+    for index, row in enumerate(rows):
+        matches = existing_dishes.get(row['name'], [])
+        if len(matches) > 1:
+            row_errors[index] = {'name': ["Several dishes have this name; rename them in the admin first."]}
+        elif 'category' in row and row['category'] not in category_names:
+            row_errors[index] = {'category': [f"Unknown category {row['category']!r}."]}
+        elif not matches:
+            missing = [field for field in ('category', 'price') if field not in row]
+            if missing:
+                row_errors[index] = {field: ["Required for a new dish."] for field in missing}
+    if row_errors:
+        errors['dishes'] = row_errors
+
+
+def apply_fields(obj, row, fields):
+    changed = False
+    for field in fields:
+        if field in row and getattr(obj, field) != row[field]:
+            setattr(obj, field, row[field])
+            changed = True
+    return changed
+
+
+def import_menu(location, data, replace=False):
+    """
+    Validates and applies an import (see parse()) to the location's menu. Raises
+    ValidationError, with the errors of every row, without writing anything if a row is
+    invalid. Returns the number of created/updated/unchanged rows per model.
+    """
+    errors = {}
+    category_rows = validated_rows(MenuCategoryRowSerializer, data.get('categories') or [], errors, 'categories')
+    dish_rows = validated_rows(MenuDishRowSerializer, data.get('dishes') or [], errors, 'dishes')
+    if errors:
+        raise ValidationError(errors)
+
+    with transaction.atomic():
+        categories = {category.name: category for category in Category.objects.filter(restaurant=location)}
+        existing_dishes = {}
+        for dish in Dish.objects.filter(restaurant=location):
+            existing_dishes.setdefault(dish.name, []).append(dish)
+        check_dishes(dish_rows, existing_dishes, categories.keys() | {row['name'] for row in category_rows}, errors)
+        if errors:
+            raise ValidationError(errors)
+
+        now = timezone.now()
+        new_categories, changed_categories = [], []
+        for row in category_rows:
+            category = categories.get(row['name'])
+            if category is None:
+                new_categories.append(Category(restaurant=location, **row))
+            elif apply_fields(category, row, CATEGORY_FIELDS):
+                category.updated_at = now # auto_now ne s'applique pas à bulk_update (flux api/sync.py)
+                changed_categories.append(category)
+        Category.objects.bulk_create(new_categories)
+        Category.objects.bulk_update(changed_categories, CATEGORY_FIELDS + ('updated_at',))
+        categories.update((category.name, category) for category in new_categories)
+
+        new_dishes, changed_dishes = [], []
+        for row in dish_rows:
+            row = dict(row)
+            if 'category' in row:
+                row['category_id'] = categories[row.pop('category')].pk
+            matches = existing_dishes.get(row['name'])
+            if not matches:
+                new_dishes.append(Dish(restaurant=location, **row))
+            elif apply_fields(matches[0], row, DISH_FIELDS):
+                matches[0].updated_at = now # auto_now ne s'applique pas à bulk_update
+                changed_dishes.append(matches[0])
+        disabled = 0
+        if replace:
+            imported = {row['name'] for row in dish_rows}
+            for name, dishes in existing_dishes.items():
+                for dish in dishes:
+                    if name not in imported and dish.is_available:
+                        dish.is_available = False
+                        dish.updated_at = now
+                        changed_dishes.append(dish)
+                        disabled += 1
+        Dish.objects.bulk_create(new_dishes)
+        Dish.objects.bulk_update(changed_dishes, DISH_FIELDS + ('updated_at',), batch_size=500)
+
+        search.index_objects(new_dishes + changed_dishes)
+        # Disponibilité chargée par le signal post_init (api/signals.py)
+        flipped = [dish for dish in changed_dishes if dish.is_available != dish._loaded_is_available]
+        if flipped:
+            webhooks.enqueue_in_transaction(webhooks.Event.DISH_AVAILABILITY, location.pk, lambda: webhooks.dish_data(flipped))
+        response_cache.invalidate_on_commit(
+            response_cache.location_tag('category', location.pk), response_cache.location_tag('dish', location.pk)
+        )
+        if getattr(settings, 'FRONTEND_BUILD', {}).get('AUTO_BUILD'):
+            transaction.on_commit(frontend.schedule_build)
+
+    return {
+        'categories': {
+            'created': len(new_categories),
+            'updated': len(changed_categories),
+            'unchanged': len(category_rows) - len(new_categories) - len(changed_categories),
+        },
+        'dishes': {
+            'created': len(new_dishes),
+            'updated': len(changed_dishes) - disabled,
+            'unchanged': len(dish_rows) - len(new_dishes) - len(changed_dishes) + disabled,
+            'disabled': disabled,
+        },
+    }
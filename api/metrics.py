@@ -0,0 +1,185 @@
+"""
+In-process counters and histograms, exposed in the Prometheus text format on /metrics.
+
+Each process keeps its own registry. When settings.METRICS['DIR'] is set, every process also
+dumps its registry to ``<DIR>/metrics-<pid>.json`` (at most every FLUSH_SECONDS, atomically), and
+/metrics sums the files of all processes, so numbers are complete behind multi-process WSGI
+servers (gunicorn, uWSGI). Without DIR, /metrics shows the answering process only.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', "HTTP requests by endpoint, method and status.", None),
+    'http_request_duration_seconds': ('histogram', "HTTP request latency.", LATENCY_BUCKETS),
+    'db_queries_per_request': ('histogram', "Database queries run per HTTP request.", COUNT_BUCKETS),
+    'db_duration_seconds': ('histogram', "Database time spent per HTTP request.", LATENCY_BUCKETS),
+    'email_send_duration_seconds': ('histogram', "Time spent sending an email.", LATENCY_BUCKETS),
+    'email_send_failures_total': ('counter', "Emails that could not be sent.", None),
+    'cache_requests_total': ('counter', "Cache lookups by cache and result (hit or miss).", None),
+    'singleflight_calls_total': ('counter', "Single-flight calls by flight and result (leader, coalesced, shared, timeout).", None),
+    'idempotent_replays_total': ('counter', "Create requests answered from a stored Idempotency-Key response.", None),
+    'webhook_send_duration_seconds': ('histogram', "Time spent POSTing one webhook batch.", LATENCY_BUCKETS),
+    'webhook_send_failures_total': ('counter', "Webhook batches not accepted, by reason (connection or http).", None),
+    'webhook_events_delivered_total': ('counter', "Webhook events accepted by their endpoint.", None),
+}
+
+
+def metrics_setting(name, default=None):
+    return getattr(settings, 'METRICS', {}).get(name, default)
+
+
+def label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def dump(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, labels, dict(histogram, buckets=list(histogram['buckets']))]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """
+        Writes this process's registry to the shared metrics directory, if one is configured.
+        """
+        directory = metrics_setting('DIR')
+        now = time.monotonic()
+        if not directory or (not force and now - self.last_flush < metrics_setting('FLUSH_SECONDS', 1)):
+            return
+        self.last_flush = now
+        path = Path(directory) / f"metrics-{os.getpid()}.json"
+        tmp_path = path.with_suffix('.tmp')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(json.dumps(self.dump()))
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def record_cache(cache_name, hit):
+    registry.inc('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, **labels)
+
+
+def collect():
+    """
+    Returns the registry dumps of every process (this one from memory, the others from disk).
+    """
+    dumps = [registry.dump()]
+    directory = metrics_setting('DIR')
+    if directory and os.path.isdir(directory):
+        own = f"metrics-{os.getpid()}.json"
+        for entry in os.scandir(directory):
+            if entry.name.startswith('metrics-') and entry.name.endswith('.json') and entry.name != own:
+                try:
+                    with open(entry.path) as f:
+                        dumps.append(json.load(f))
+                except (OSError, ValueError):
+                    continue # Fichier en cours de remplacement
+    return dumps
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+
+def render():
+    """
+    Sums every process's metrics and renders them in the Prometheus text exposition format.
+    """
+    counters, histograms = {}, {}
+    for dump in collect():
+        for name, labels, value in dump['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in dump['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, {'buckets': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = counters if kind == 'counter' else histograms
+        keys = sorted(key for key in series if key[0] == name)
+        if not keys:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key in keys:
+            labels = key[1]
+            if kind == 'counter':
+                lines.append(f"{name}{format_labels(labels)} {series[key]}")
+                continue
+            histogram = series[key]
+            for bound, count in zip(buckets, histogram['buckets']):
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
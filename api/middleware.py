@@ -0,0 +1,68 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class QueryStats:
+    """
+    Database execute wrapper counting the queries of a request and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def endpoint_label(request, view_func):
+    """
+    Names the endpoint after the viewset action when there is one ('table-availability',
+    'reservation-create'), else after the URL name.
+    """
+    actions = getattr(view_func, 'actions', None)
+    basename = getattr(view_func, 'initkwargs', {}).get('basename')
+    if actions and basename:
+        action = actions.get(request.method.lower())
+        if action:
+            return f"{basename}-{action}"
+    return request.resolver_match.url_name or request.resolver_match.view_name
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status codes, query count and database time per endpoint (see api/metrics.py).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_endpoint = 'unmatched'
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        endpoint = request.metrics_endpoint
+        metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', duration, endpoint=endpoint)
+        metrics.observe('db_queries_per_request', stats.count, endpoint=endpoint)
+        metrics.observe('db_duration_seconds', stats.duration, endpoint=endpoint)
+        metrics.registry.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_endpoint = endpoint_label(request, view_func)
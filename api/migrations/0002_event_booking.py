@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:23
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import F
+
+
+def init_seats_remaining(apps, schema_editor):
+    Event = apps.get_model('api', 'Event')
+    Event.objects.filter(capacity__isnull=False).update(seats_remaining=F('capacity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='seats_remaining',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Seats Remaining'),
+        ),
+        migrations.RunPython(init_seats_remaining, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='EventBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Booking Reference')),
+                ('idempotency_key', models.CharField(max_length=64, verbose_name='Idempotency Key')),
+                ('customer_name', models.CharField(max_length=200, verbose_name='Customer Name')),
+                ('customer_email', models.EmailField(max_length=254, verbose_name='Customer Email')),
+                ('customer_phone', models.CharField(blank=True, max_length=20, verbose_name='Customer Phone')),
+                ('number_of_seats', models.PositiveIntegerField(verbose_name='Number of Seats')),
+                ('status', models.CharField(choices=[('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')], default='confirmed', max_length=10, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='api.event', verbose_name='Event')),
+            ],
+            options={
+                'verbose_name': 'Event Booking',
+                'verbose_name_plural': 'Event Bookings',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'idempotency_key'), name='unique_event_booking_idempotency_key')],
+            },
+        ),
+    ]
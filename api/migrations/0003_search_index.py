@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Copie figée du schéma de api/search.py à la création de l'index
+SEARCH_TABLE = 'api_search_index'
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Dish = apps.get_model('api', 'Dish')
+    Event = apps.get_model('api', 'Event')
+    schema_editor.execute(CREATE_TABLE_SQL)
+    rows = [(2 * pk, name, description or '') for pk, name, description in Dish.objects.values_list('pk', 'name', 'description')]
+    rows += [(2 * pk + 1, title, description or '') for pk, title, description in Event.objects.values_list('pk', 'title', 'description')]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)", rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_event_booking'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:38
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copies figées de api.models.normalise_text() et contact_fingerprint() : le remplissage ne
+# doit pas changer si le code du modèle évolue
+def normalise_text(text):
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', text).split())
+
+
+def contact_fingerprint(email, subject, message):
+    content = '\n'.join([email.strip().lower(), normalise_text(subject), normalise_text(message)])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    ContactMessage = apps.get_model('api', 'ContactMessage')
+    messages = list(ContactMessage.objects.only('email', 'subject', 'message'))
+    for message in messages:
+        message.fingerprint = contact_fingerprint(message.email, message.subject, message.message)
+    ContactMessage.objects.bulk_update(messages, ['fingerprint'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Fingerprint'),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='hit_count',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Times Received'),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='last_received_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Received At'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['fingerprint', 'created_at'], name='contact_fingerprint_idx'),
+        ),
+    ]
@@ -0,0 +1,223 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:48
+
+import api.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copies figées de api.models.DEFAULT_LOCATION_NAME et du schéma de api/search.py à cette version
+DEFAULT_LOCATION_NAME = "New Treichville"
+SEARCH_TABLE = 'api_search_index'
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, body, restaurant UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+
+
+def assign_default_location(apps, schema_editor):
+    Location = apps.get_model('api', 'Location')
+    location, _ = Location.objects.using(schema_editor.connection.alias).get_or_create(
+        slug=getattr(settings, 'DEFAULT_LOCATION', 'main'), defaults={'name': DEFAULT_LOCATION_NAME}
+    )
+    for model_name in ('Table', 'Category', 'Dish', 'Event', 'Reservation'):
+        model = apps.get_model('api', model_name)
+        model.objects.using(schema_editor.connection.alias).update(restaurant=location)
+
+
+def add_search_restaurant_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Dish = apps.get_model('api', 'Dish')
+    Event = apps.get_model('api', 'Event')
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    schema_editor.execute(CREATE_TABLE_SQL)
+    rows = [
+        (2 * pk, name, description or '', restaurant_id)
+        for pk, name, description, restaurant_id in Dish.objects.values_list('pk', 'name', 'description', 'restaurant_id')
+    ]
+    rows += [
+        (2 * pk + 1, title, description or '', restaurant_id)
+        for pk, title, description, restaurant_id in Event.objects.values_list('pk', 'title', 'description', 'restaurant_id')
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body, restaurant) VALUES (%s, %s, %s, %s)", rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_reservation_reminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Name')),
+                ('slug', models.SlugField(unique=True, verbose_name='Slug')),
+                ('address', models.TextField(blank=True, verbose_name='Address')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Is Active')),
+            ],
+            options={
+                'verbose_name': 'Location',
+                'verbose_name_plural': 'Locations',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_published_date_idx',
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Category Name'),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='table',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.table', verbose_name='Assigned Table'),
+        ),
+        migrations.AlterField(
+            model_name='table',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Table Name/Number'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='restaurant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='categories', to='api.location', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='restaurant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='dishes', to='api.location', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='restaurant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='events', to='api.location', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='restaurant',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.location', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='table',
+            name='restaurant',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tables', to='api.location', verbose_name='Restaurant'),
+        ),
+        migrations.RunPython(assign_default_location, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='category',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='categories', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='category',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, default=api.models.default_location_id, on_delete=django.db.models.deletion.PROTECT, related_name='categories', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='dish',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='dishes', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='dish',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, default=api.models.default_location_id, on_delete=django.db.models.deletion.PROTECT, related_name='dishes', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='event',
+                    name='restaurant',
+                    field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='events', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='event',
+                    name='restaurant',
+                    field=models.ForeignKey(default=api.models.default_location_id, on_delete=django.db.models.deletion.PROTECT, related_name='events', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='reservation',
+                    name='restaurant',
+                    field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='reservation',
+                    name='restaurant',
+                    field=models.ForeignKey(db_constraint=False, db_index=False, default=api.models.default_location_id, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='table',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='tables', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='table',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, default=api.models.default_location_id, on_delete=django.db.models.deletion.PROTECT, related_name='tables', to='api.location', verbose_name='Restaurant'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['restaurant', 'order', 'name'], name='category_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['restaurant', 'category', 'name'], name='dish_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['restaurant', 'event_date', 'event_time'], name='event_published_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['restaurant', 'reservation_date', 'status'], name='reservation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='table',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['restaurant', 'capacity'], name='table_active_capacity_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'name'), name='unique_category_name_per_site'),
+        ),
+        migrations.AddConstraint(
+            model_name='table',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'name'), name='unique_table_name_per_site'),
+        ),
+        migrations.RunPython(add_search_restaurant_column, migrations.RunPython.noop),
+    ]
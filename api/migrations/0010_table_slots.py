@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:00
+
+import django.db.models.deletion
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hold_existing_reservations(apps, schema_editor):
+    # Créneaux des réservations existantes (même règle que api/availability.covered_times) ;
+    # en cas de double réservation déjà en base, la première garde la table
+    Reservation = apps.get_model('api', 'Reservation')
+    TableSlot = apps.get_model('api', 'TableSlot')
+    alias = schema_editor.connection.alias
+    step = getattr(settings, 'RESERVATION_SLOT_MINUTES', 30)
+    reservations = Reservation.objects.using(alias).filter(
+        status__in=['pending', 'confirmed'], table__isnull=False
+    ).order_by('created_at', 'pk')
+    for reservation in reservations.iterator():
+        start = reservation.reservation_time.hour * 60 + reservation.reservation_time.minute
+        end = min(start + 120, 24 * 60)
+        slots = [
+            TableSlot(
+                restaurant_id=reservation.restaurant_id, table_id=reservation.table_id, reservation=reservation,
+                slot_date=reservation.reservation_date, slot_time=(datetime.min + timedelta(minutes=minute)).time(),
+            )
+            for minute in range(start - start % step, end, step)
+        ]
+        TableSlot.objects.using(alias).bulk_create(slots, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_catalog_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_date', models.DateField(verbose_name='Date')),
+                ('slot_time', models.TimeField(verbose_name='Time')),
+                ('reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slots', to='api.reservation', verbose_name='Reservation')),
+                ('restaurant', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.location', verbose_name='Restaurant')),
+                ('table', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.table', verbose_name='Table')),
+            ],
+            options={
+                'verbose_name': 'Table Slot',
+                'verbose_name_plural': 'Table Slots',
+                'indexes': [models.Index(condition=models.Q(('reservation__isnull', False)), fields=['restaurant', 'slot_date'], name='table_slot_held_idx')],
+                'constraints': [models.UniqueConstraint(fields=('table', 'slot_date', 'slot_time'), name='unique_table_slot')],
+            },
+        ),
+        migrations.RunPython(hold_existing_reservations, migrations.RunPython.noop),
+    ]
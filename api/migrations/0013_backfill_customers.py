@@ -0,0 +1,82 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, migrations, transaction
+
+CHUNK_SIZE = 1000
+# Copie figée de la normalisation de api/customers.py (sans phonenumbers ni réglages) : le
+# résultat du remplissage ne dépend ni des paquets installés ni de la configuration
+COUNTRY_CODE = '225'
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    phone = (phone or '').strip()
+    if not phone:
+        return ''
+    digits = re.sub(r'\D', '', phone)
+    if digits.startswith('00') and not phone.startswith('+'):
+        digits = digits[2:]
+    elif not phone.startswith('+'):
+        digits = COUNTRY_CODE + digits
+    return f'+{digits}' if 8 <= len(digits) <= 15 else ''
+
+
+def link_chunk(Customer, Model, using, rows):
+    # rows : (pk, nom, email[, téléphone]) ; la dernière ligne d'un email donne le nom et le téléphone
+    latest = {}
+    for pk, name, email, *phone in rows:
+        email = normalize_email(email)
+        if email:
+            latest[email] = (name, normalize_phone(phone[0] if phone else '') or latest.get(email, ('', ''))[1])
+    customers = {customer.email: customer for customer in Customer.objects.using(DEFAULT_DB_ALIAS).filter(email__in=latest)}
+    Customer.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [Customer(email=email, name=name, phone=phone) for email, (name, phone) in latest.items() if email not in customers]
+    )
+    changed = []
+    for customer in Customer.objects.using(DEFAULT_DB_ALIAS).filter(email__in=latest):
+        name, phone = latest[customer.email]
+        if customer.email in customers and (customer.name, customer.phone) != (name, phone or customer.phone):
+            customer.name, customer.phone = name, phone or customer.phone
+            changed.append(customer)
+        customers[customer.email] = customer
+    Customer.objects.using(DEFAULT_DB_ALIAS).bulk_update(changed, ['name', 'phone'])
+    linked = [Model(pk=row[0], customer_id=customers[normalize_email(row[2])].pk) for row in rows if normalize_email(row[2])]
+    Model.objects.using(using).bulk_update(linked, ['customer'])
+
+
+def backfill(Customer, Model, using, fields):
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            rows = list(
+                Model.objects.using(using).filter(pk__gt=last_pk, customer__isnull=True).order_by('pk').values_list('pk', *fields)[:CHUNK_SIZE]
+            )
+            if not rows:
+                return
+            link_chunk(Customer, Model, using, rows)
+        last_pk = rows[-1][0]
+
+
+def backfill_customers(apps, schema_editor):
+    # Clients dans la base 'default' (à migrer en premier), par lots validés un à un : une
+    # migration interrompue reprend sur les lignes non encore rattachées
+    alias = schema_editor.connection.alias
+    Customer = apps.get_model('api', 'Customer')
+    backfill(Customer, apps.get_model('api', 'Reservation'), alias, ('customer_name', 'customer_email', 'customer_phone'))
+    if alias == DEFAULT_DB_ALIAS:
+        backfill(Customer, apps.get_model('api', 'ContactMessage'), alias, ('name', 'email'))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_customers'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_customers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_webhooks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='recurrence',
+            field=models.CharField(blank=True, help_text='e.g. FREQ=WEEKLY;BYDAY=FR or FREQ=MONTHLY;BYDAY=1SU;UNTIL=20271231. The event date is the first occurrence.', max_length=200, verbose_name='Recurrence Rule'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_end',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Recurrence End'),
+        ),
+        migrations.CreateModel(
+            name='EventOccurrenceOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_date', models.DateField(verbose_name='Original Date')),
+                ('is_cancelled', models.BooleanField(default=False, verbose_name='Is Cancelled')),
+                ('event_date', models.DateField(blank=True, null=True, verbose_name='New Date')),
+                ('event_time', models.TimeField(blank=True, null=True, verbose_name='New Time')),
+                ('title', models.CharField(blank=True, max_length=200, verbose_name='New Title')),
+                ('description', models.TextField(blank=True, verbose_name='New Description')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_overrides', to='api.event', verbose_name='Event')),
+            ],
+            options={
+                'verbose_name': 'Event Occurrence Override',
+                'verbose_name_plural': 'Event Occurrence Overrides',
+                'ordering': ['original_date'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'original_date'), name='event_override_unique')],
+            },
+        ),
+    ]
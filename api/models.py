@@ -1,8 +1,55 @@
-from django.db import models
+import hashlib
+import re
+import secrets
+import unicodedata
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, models, router, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from . import response_cache
+
+class Location(models.Model):
+    """
+    One New Treichville restaurant. Tables, menu, events and reservations belong to a location.
+    """
+    name = models.CharField(max_length=200, verbose_name=_("Name"))
+    slug = models.SlugField(max_length=50, unique=True, verbose_name=_("Slug"))
+    address = models.TextField(blank=True, verbose_name=_("Address"))
+    is_active = models.BooleanField(default=True, verbose_name=_("Is Active"))
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = _("Location")
+        verbose_name_plural = _("Locations")
+        ordering = ['name']
+
+DEFAULT_LOCATION_NAME = "New Treichville"
+
+def default_location_id():
+    """
+    Location of objects created without one: settings.DEFAULT_LOCATION (created if missing).
+    Only its pk is read, so this default does not depend on the current columns of Location.
+    """
+    slug = getattr(settings, 'DEFAULT_LOCATION', 'main')
+    pk = Location.objects.using(DEFAULT_DB_ALIAS).filter(slug=slug).values_list('pk', flat=True).first()
+    if pk is None:
+        from .locations import clear_cache
+        pk = Location.objects.using(DEFAULT_DB_ALIAS).get_or_create(slug=slug, defaults={'name': DEFAULT_LOCATION_NAME})[0].pk
+        clear_cache()
+    return pk
+
 class Table(models.Model):
-    name = models.CharField(max_length=100, unique=True, verbose_name=_("Table Name/Number"))
+    restaurant = models.ForeignKey(Location, related_name='tables', on_delete=models.PROTECT, default=default_location_id, db_index=False, verbose_name=_("Restaurant"))
+    name = models.CharField(max_length=100, verbose_name=_("Table Name/Number"))
     capacity = models.IntegerField(verbose_name=_("Capacity"))
     location = models.CharField(max_length=100, blank=True, verbose_name=_("Location (e.g., Terrace, Indoors)"))
     is_active = models.BooleanField(default=True, verbose_name=_("Is Active"))
@@ -13,11 +60,20 @@ class Table(models.Model):
     class Meta:
         verbose_name = _("Table")
         verbose_name_plural = _("Tables")
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'name'], name='unique_table_name_per_site'),
+        ]
+        indexes = [
+            # Recherche de tables libres : index partiel sur les tables actives
+            models.Index(fields=['restaurant', 'capacity'], name='table_active_capacity_idx', condition=Q(is_active=True)),
+        ]
 
 class Category(models.Model):
-    name = models.CharField(max_length=100, unique=True, verbose_name=_("Category Name"))
+    restaurant = models.ForeignKey(Location, related_name='categories', on_delete=models.PROTECT, default=default_location_id, db_index=False, verbose_name=_("Restaurant"))
+    name = models.CharField(max_length=100, verbose_name=_("Category Name"))
     description = models.TextField(blank=True, null=True, verbose_name=_("Description"))
     order = models.IntegerField(default=0, help_text=_("Order of display for categories"), verbose_name=_("Display Order"))
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -26,8 +82,17 @@ class Category(models.Model):
         verbose_name = _("Menu Category")
         verbose_name_plural = _("Menu Categories")
         ordering = ['order', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'name'], name='unique_category_name_per_site'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'order', 'name'], name='category_order_idx'),
+            # Flux de modifications (api/sync.py)
+            models.Index(fields=['restaurant', 'updated_at', 'id'], name='category_updated_idx'),
+        ]
 
 class Dish(models.Model):
+    restaurant = models.ForeignKey(Location, related_name='dishes', on_delete=models.PROTECT, default=default_location_id, db_index=False, verbose_name=_("Restaurant"))
     name = models.CharField(max_length=200, verbose_name=_("Dish Name"))
     description = models.TextField(verbose_name=_("Description"))
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name=_("Price"))
@@ -45,26 +110,248 @@ class Dish(models.Model):
         verbose_name = _("Dish")
         verbose_name_plural = _("Dishes")
         ordering = ['category', 'name']
+        indexes = [
+            # Carte d'un restaurant (éventuellement filtrée par catégorie) : plats disponibles seulement
+            models.Index(fields=['restaurant', 'category', 'name'], name='dish_available_idx', condition=Q(is_available=True)),
+            models.Index(fields=['restaurant', 'updated_at', 'id'], name='dish_updated_idx'),
+        ]
 
 class Event(models.Model):
+    restaurant = models.ForeignKey(Location, related_name='events', on_delete=models.PROTECT, default=default_location_id, verbose_name=_("Restaurant"))
     title = models.CharField(max_length=200, verbose_name=_("Event Title"))
     description = models.TextField(verbose_name=_("Description"))
     event_date = models.DateField(verbose_name=_("Event Date"))
     event_time = models.TimeField(verbose_name=_("Event Time"))
     image = models.ImageField(upload_to='events/', blank=True, null=True, verbose_name=_("Image"))
     capacity = models.IntegerField(blank=True, null=True, verbose_name=_("Capacity"))
+    # Compteur de places restantes, modifié uniquement par des UPDATE conditionnels (voir EventBookingManager)
+    seats_remaining = models.IntegerField(blank=True, null=True, editable=False, verbose_name=_("Seats Remaining"))
     is_published = models.BooleanField(default=False, verbose_name=_("Is Published"))
     booking_required = models.BooleanField(default=False, verbose_name=_("Booking Required"))
+    # Série récurrente (sous-ensemble de RRULE, voir api/recurrence.py) ; vide pour un événement ponctuel
+    recurrence = models.CharField(
+        max_length=200, blank=True, verbose_name=_("Recurrence Rule"),
+        help_text=_("e.g. FREQ=WEEKLY;BYDAY=FR or FREQ=MONTHLY;BYDAY=1SU;UNTIL=20271231. The event date is the first occurrence."),
+    )
+    # Date de la dernière occurrence (None : série sans fin), calculée à l'enregistrement
+    recurrence_end = models.DateField(blank=True, null=True, editable=False, verbose_name=_("Recurrence End"))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
+    def clean(self):
+        from . import recurrence
+        if not self.recurrence:
+            return
+        try:
+            recurrence.parse(self.recurrence)
+        except recurrence.InvalidRule as e:
+            raise ValidationError({'recurrence': str(e)})
+        # Le compteur de places est commun à l'événement : pas de réservation par occurrence
+        if self.capacity is not None:
+            raise ValidationError({'capacity': _("Recurring events do not take bookings.")})
+
+    def save(self, *args, **kwargs):
+        from . import recurrence
+        self.recurrence = self.recurrence.strip().upper()
+        self.recurrence_end = recurrence.last_date(self.recurrence, self.event_date)
+        if self._state.adding:
+            self.seats_remaining = self.capacity
+            return super().save(*args, **kwargs)
+
+        # Ne jamais réécrire seats_remaining depuis une copie en mémoire : le compteur
+        # est ajusté en base, par delta, uniquement si la capacité change.
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'seats_remaining'
+            ]
+        previous_capacity = Event.objects.filter(pk=self.pk).values_list('capacity', flat=True).first()
+        super().save(*args, **kwargs)
+
+        if previous_capacity == self.capacity:
+            return
+        events = Event.objects.filter(pk=self.pk)
+        if self.capacity is None:
+            events.update(seats_remaining=None)
+        elif previous_capacity is None:
+            booked = self.bookings.filter(
+                status=EventBooking.BookingStatus.CONFIRMED
+            ).aggregate(total=Sum('number_of_seats'))['total'] or 0
+            events.update(seats_remaining=self.capacity - booked)
+        else:
+            events.update(seats_remaining=F('seats_remaining') + (self.capacity - previous_capacity))
+        self.refresh_from_db(fields=['seats_remaining'])
+
     class Meta:
         verbose_name = _("Event")
         verbose_name_plural = _("Events")
         ordering = ['-event_date', '-event_time']
+        indexes = [
+            # Index partiel : seules les lignes publiées sont listées par l'API
+            models.Index(fields=['restaurant', 'event_date', 'event_time'], name='event_published_date_idx', condition=Q(is_published=True)),
+            models.Index(fields=['restaurant', 'updated_at', 'id'], name='event_updated_idx'),
+        ]
+
+class EventOccurrenceOverride(models.Model):
+    """
+    Cancels or changes one occurrence of a recurring event, identified by its original date.
+    Empty fields keep the event's values.
+    """
+    event = models.ForeignKey(Event, related_name='occurrence_overrides', on_delete=models.CASCADE, verbose_name=_("Event"))
+    original_date = models.DateField(verbose_name=_("Original Date"))
+    is_cancelled = models.BooleanField(default=False, verbose_name=_("Is Cancelled"))
+    event_date = models.DateField(blank=True, null=True, verbose_name=_("New Date"))
+    event_time = models.TimeField(blank=True, null=True, verbose_name=_("New Time"))
+    title = models.CharField(max_length=200, blank=True, verbose_name=_("New Title"))
+    description = models.TextField(blank=True, verbose_name=_("New Description"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.event} ({self.original_date})"
+
+    def clean(self):
+        from . import recurrence
+        event = getattr(self, 'event', None)
+        if event is None or self.original_date is None:
+            return
+        try:
+            if not recurrence.is_occurrence(event, self.original_date):
+                raise ValidationError({'original_date': _("This event has no occurrence on that date.")})
+        except recurrence.InvalidRule:
+            pass # Règle invalide : signalée par Event.clean()
+
+    class Meta:
+        verbose_name = _("Event Occurrence Override")
+        verbose_name_plural = _("Event Occurrence Overrides")
+        ordering = ['original_date']
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'original_date'], name='event_override_unique'),
+        ]
+
+class EventSoldOut(Exception):
+    """Raised when an event does not have enough seats left for a booking."""
+
+class EventBookingManager(models.Manager):
+    def book(self, event, idempotency_key, number_of_seats, **fields):
+        """
+        Books seats for an event. Returns (booking, created).
+
+        The seat counter is decremented by a single conditional UPDATE
+        (``seats_remaining >= n``), so concurrent requests can never oversell.
+        Replaying the same idempotency key returns the original booking.
+        """
+        existing = self.filter(event=event, idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing, False
+
+        try:
+            with transaction.atomic():
+                claimed = Event.objects.filter(
+                    pk=event.pk, seats_remaining__gte=number_of_seats
+                ).update(seats_remaining=F('seats_remaining') - number_of_seats, updated_at=timezone.now())
+                if not claimed:
+                    raise EventSoldOut(event)
+                booking = self.create(
+                    event=event,
+                    idempotency_key=idempotency_key,
+                    number_of_seats=number_of_seats,
+                    **fields
+                )
+        except IntegrityError:
+            # Une requête concurrente avec la même clé a gagné : sa réservation fait foi,
+            # et notre décrément a été annulé avec la transaction.
+            return self.get(event=event, idempotency_key=idempotency_key), False
+        # seats_remaining est modifié par update(), sans signal post_save sur Event ; updated_at
+        # suit, pour le flux de modifications (api/sync.py)
+        response_cache.invalidate_on_commit(response_cache.location_tag('event', event.restaurant_id))
+        return booking, True
+
+class EventBooking(models.Model):
+    class BookingStatus(models.TextChoices):
+        CONFIRMED = 'confirmed', _('Confirmed')
+        CANCELLED = 'cancelled', _('Cancelled')
+
+    event = models.ForeignKey(Event, related_name='bookings', on_delete=models.CASCADE, verbose_name=_("Event"))
+    reference = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name=_("Booking Reference"))
+    idempotency_key = models.CharField(max_length=64, verbose_name=_("Idempotency Key"))
+    customer_name = models.CharField(max_length=200, verbose_name=_("Customer Name"))
+    customer_email = models.EmailField(verbose_name=_("Customer Email"))
+    customer_phone = models.CharField(max_length=20, blank=True, verbose_name=_("Customer Phone"))
+    number_of_seats = models.PositiveIntegerField(verbose_name=_("Number of Seats"))
+    status = models.CharField(
+        max_length=10,
+        choices=BookingStatus.choices,
+        default=BookingStatus.CONFIRMED,
+        verbose_name=_("Status")
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventBookingManager()
+
+    def __str__(self):
+        return f"{self.number_of_seats} seat(s) for {self.customer_name} at {self.event}"
+
+    def cancel(self):
+        """
+        Cancels the booking and returns its seats to the event.
+        Returns False if the booking was already cancelled.
+        """
+        with transaction.atomic():
+            cancelled = EventBooking.objects.filter(
+                pk=self.pk, status=self.BookingStatus.CONFIRMED
+            ).update(status=self.BookingStatus.CANCELLED, updated_at=timezone.now())
+            if cancelled:
+                Event.objects.filter(pk=self.event_id, seats_remaining__isnull=False).update(
+                    seats_remaining=F('seats_remaining') + self.number_of_seats, updated_at=timezone.now()
+                )
+                response_cache.invalidate_on_commit(response_cache.location_tag('event', self.event.restaurant_id))
+        self.refresh_from_db(fields=['status', 'updated_at'])
+        return bool(cancelled)
+
+    class Meta:
+        verbose_name = _("Event Booking")
+        verbose_name_plural = _("Event Bookings")
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'idempotency_key'], name='unique_event_booking_idempotency_key'),
+        ]
+
+class Customer(models.Model):
+    """
+    A guest, identified by their normalised email and shared by reservations and contact
+    messages (see api/customers.py).
+    """
+    name = models.CharField(max_length=200, verbose_name=_("Name"))
+    email = models.EmailField(unique=True, verbose_name=_("Email")) # Normalisé (minuscules)
+    phone = models.CharField(max_length=16, blank=True, db_index=True, verbose_name=_("Phone")) # Format E.164
+    is_vip = models.BooleanField(default=False, verbose_name=_("VIP"))
+    notes = models.TextField(blank=True, verbose_name=_("Notes"))
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} <{self.email}>"
+
+    class Meta:
+        verbose_name = _("Customer")
+        verbose_name_plural = _("Customers")
+        ordering = ['name']
+
+class ReservationQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        """
+        Without an explicit using(), lets the router pick the reservation's database from its
+        location (QuerySet.create would pass the queryset's database, chosen without the instance).
+        """
+        if self._db is not None:
+            return super().create(**kwargs)
+        reservation = self.model(**kwargs)
+        reservation.save(force_insert=True)
+        return reservation
 
 class Reservation(models.Model):
     class ReservationStatus(models.TextChoices):
@@ -73,7 +360,12 @@ class Reservation(models.Model):
         CANCELLED = 'cancelled', _('Cancelled')
         COMPLETED = 'completed', _('Completed')
         NO_SHOW = 'no-show', _('No-Show')
+        EXPIRED = 'expired', _('Expired')
 
+    # Sans contrainte de clé étrangère : les réservations d'un restaurant peuvent vivre dans
+    # leur propre base (LOCATION_DATABASES), alors que restaurants et tables restent dans 'default'.
+    # db_index=False ici et sur Table/Category/Dish : les index composites commencent par le restaurant.
+    restaurant = models.ForeignKey(Location, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, default=default_location_id, verbose_name=_("Restaurant"))
     customer_name = models.CharField(max_length=200, verbose_name=_("Customer Name"))
     customer_email = models.EmailField(verbose_name=_("Customer Email"))
     customer_phone = models.CharField(max_length=20, verbose_name=_("Customer Phone"))
@@ -87,17 +379,123 @@ class Reservation(models.Model):
         default=ReservationStatus.PENDING,
         verbose_name=_("Status")
     )
-    table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_("Assigned Table"))
+    table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False, verbose_name=_("Assigned Table"))
+    # Renseigné à l'enregistrement d'après l'email (api/customers.py) ; index composite ci-dessous
+    customer = models.ForeignKey(Customer, related_name='+', on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_constraint=False, db_index=False, verbose_name=_("Customer"))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Renseigné par manage.py send_reminders : un rappel n'est jamais envoyé deux fois
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Reminder Sent At"))
+
+    objects = ReservationQuerySet.as_manager()
+
+    CONTACT_FIELDS = {'customer_name', 'customer_email', 'customer_phone'}
 
     def __str__(self):
         return f"Reservation for {self.customer_name} on {self.reservation_date} at {self.reservation_time}"
 
+    def clean(self):
+        from . import inventory
+        # Contrôle préalable pour les formulaires ; la garantie reste la prise atomique de save()
+        if inventory.is_taken(self, router.db_for_write(Reservation, instance=self)):
+            raise ValidationError({'table': _("This table is already booked at that time.")})
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the reservation and, in the same transaction, claims or releases its table's
+        slots (api/inventory.py). Raises TableUnavailable, and saves nothing, if another
+        reservation holds one of them.
+        """
+        from . import customers, inventory
+        using = kwargs.get('using') or router.db_for_write(Reservation, instance=self)
+        update_fields = kwargs.get('update_fields')
+        # Fiche client (base par défaut) dans la même transaction : une réservation refusée ne la crée pas
+        with transaction.atomic(using=using), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            if update_fields is None or set(update_fields) & self.CONTACT_FIELDS:
+                self.customer = customers.customer_for(self.customer_name, self.customer_email, self.customer_phone)
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'customer'}
+            super().save(*args, **kwargs)
+            if update_fields is None or set(update_fields) & inventory.SLOT_FIELDS:
+                inventory.sync_reservation(self, using)
+
     class Meta:
         verbose_name = _("Reservation")
         verbose_name_plural = _("Reservations")
         ordering = ['-reservation_date', '-reservation_time']
+        indexes = [
+            # Disponibilités d'un restaurant pour une date
+            models.Index(fields=['restaurant', 'reservation_date', 'status'], name='reservation_date_idx'),
+            # Index partiel : ne contient que les rappels restant à envoyer
+            models.Index(
+                fields=['reservation_date', 'id'], name='reservation_reminder_due_idx',
+                condition=Q(status='confirmed', reminder_sent_at__isnull=True),
+            ),
+            # Transitions de api/lifecycle.py : lignes d'un statut jusqu'à une date
+            models.Index(fields=['status', 'reservation_date', 'reservation_time'], name='reservation_status_idx'),
+            # Historique et nombre d'absences d'un client
+            models.Index(fields=['customer', 'status'], name='reservation_customer_idx'),
+        ]
+
+class TableUnavailable(Exception):
+    """Raised when a reservation's table is already booked for one of its slots."""
+
+class TableSlot(models.Model):
+    """
+    One table for one RESERVATION_SLOT_MINUTES step of a day, held by at most one reservation
+    (see api/inventory.py). Stored with the location's reservations (LOCATION_DATABASES).
+    """
+    restaurant = models.ForeignKey(Location, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, verbose_name=_("Restaurant"))
+    table = models.ForeignKey(Table, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, verbose_name=_("Table"))
+    slot_date = models.DateField(verbose_name=_("Date"))
+    slot_time = models.TimeField(verbose_name=_("Time"))
+    reservation = models.ForeignKey(Reservation, related_name='slots', null=True, blank=True, on_delete=models.SET_NULL, verbose_name=_("Reservation"))
+
+    def __str__(self):
+        return f"{self.table_id} {self.slot_date} {self.slot_time}"
+
+    class Meta:
+        verbose_name = _("Table Slot")
+        verbose_name_plural = _("Table Slots")
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'slot_date', 'slot_time'], name='unique_table_slot'),
+        ]
+        indexes = [
+            # Disponibilités : seuls les créneaux pris sont lus
+            models.Index(fields=['restaurant', 'slot_date'], name='table_slot_held_idx', condition=Q(reservation__isnull=False)),
+        ]
+
+def normalise_text(text):
+    """
+    Lowercases, strips accents and punctuation and collapses whitespace, so trivial
+    variations of the same text compare equal.
+    """
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', text).split())
+
+def contact_fingerprint(email, subject, message):
+    content = '\n'.join([email.strip().lower(), normalise_text(subject), normalise_text(message)])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+class ContactMessageManager(models.Manager):
+    def submit(self, **fields):
+        """
+        Stores a contact message, or merges it into a recent identical one. Returns (message, created).
+
+        Identical means same fingerprint within CONTACT_DUPLICATE_WINDOW_HOURS: the lookup is a
+        single probe of the (fingerprint, created_at) index, and a duplicate only bumps the
+        original's hit_count instead of adding a row (and an admin email).
+        """
+        fingerprint = contact_fingerprint(fields['email'], fields['subject'], fields['message'])
+        now = timezone.now()
+        window = timedelta(hours=getattr(settings, 'CONTACT_DUPLICATE_WINDOW_HOURS', 24))
+        original = self.filter(fingerprint=fingerprint, created_at__gte=now - window).order_by('-created_at').first()
+        if original is None:
+            return self.create(fingerprint=fingerprint, **fields), True
+        self.filter(pk=original.pk).update(hit_count=F('hit_count') + 1, last_received_at=now)
+        original.refresh_from_db(fields=['hit_count', 'last_received_at'])
+        return original, False
 
 class ContactMessage(models.Model):
     name = models.CharField(max_length=200, verbose_name=_("Name"))
@@ -106,7 +504,22 @@ class ContactMessage(models.Model):
     message = models.TextField(verbose_name=_("Message"))
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False, verbose_name=_("Mark as Read"))
+    # Empreinte normalisée (email + sujet + message) pour regrouper les doublons
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False, verbose_name=_("Fingerprint"))
+    hit_count = models.PositiveIntegerField(default=1, editable=False, verbose_name=_("Times Received"))
+    last_received_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Last Received At"))
+    customer = models.ForeignKey(Customer, related_name='contact_messages', on_delete=models.SET_NULL, null=True, blank=True, editable=False, verbose_name=_("Customer"))
 
+    objects = ContactMessageManager()
+
+    def save(self, *args, **kwargs):
+        from . import customers
+        if not self.fingerprint:
+            self.fingerprint = contact_fingerprint(self.email, self.subject, self.message)
+        with transaction.atomic():
+            if self.customer_id is None:
+                self.customer = customers.customer_for(self.name, self.email)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Message from {self.name} - {self.subject}"
@@ -115,6 +528,126 @@ class ContactMessage(models.Model):
         verbose_name = _("Contact Message")
         verbose_name_plural = _("Contact Messages")
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'created_at'], name='contact_fingerprint_idx'),
+        ]
+
+class IdempotencyKey(models.Model):
+    """
+    First response of a create request sent with an Idempotency-Key header, replayed on retries
+    (see api/idempotency.py). A row without status_code is a request still in flight.
+    """
+    scope = models.CharField(max_length=100, verbose_name=_("Scope"))
+    key = models.CharField(max_length=255, verbose_name=_("Key"))
+    request_fingerprint = models.CharField(max_length=64, verbose_name=_("Request Fingerprint"))
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_("Status Code"))
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name=_("Response Body"))
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True, verbose_name=_("Expires At"))
+
+    def __str__(self):
+        return f"{self.scope}: {self.key}"
+
+    class Meta:
+        verbose_name = _("Idempotency Key")
+        verbose_name_plural = _("Idempotency Keys")
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_scope_key'),
+        ]
+
+class CatalogTombstone(models.Model):
+    """
+    Deleted category, dish or event, sent as a deletion by the catalog change feed
+    (api/sync.py) until purged (manage.py purge_catalog_tombstones).
+    """
+    class Kind(models.TextChoices):
+        CATEGORY = 'category', _('Category')
+        DISH = 'dish', _('Dish')
+        EVENT = 'event', _('Event')
+
+    restaurant = models.ForeignKey(Location, related_name='+', on_delete=models.CASCADE, db_index=False, verbose_name=_("Restaurant"))
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name=_("Kind"))
+    object_id = models.BigIntegerField(verbose_name=_("Object ID"))
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name=_("Deleted At"))
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+    class Meta:
+        verbose_name = _("Catalog Tombstone")
+        verbose_name_plural = _("Catalog Tombstones")
+        indexes = [
+            models.Index(fields=['restaurant', 'deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ]
+
+def webhook_secret():
+    return secrets.token_hex(32)
+
+class WebhookEndpoint(models.Model):
+    """
+    A subscriber (POS, floor plan...) receiving the chosen events as signed, batched POSTs
+    (see api/webhooks.py).
+    """
+    class EventType(models.TextChoices):
+        RESERVATION_CREATED = 'reservation.created', _('Reservation created')
+        RESERVATION_UPDATED = 'reservation.updated', _('Reservation updated')
+        RESERVATION_DELETED = 'reservation.deleted', _('Reservation deleted')
+        DISH_AVAILABILITY = 'dish.availability_changed', _('Dish availability changed')
+
+    name = models.CharField(max_length=100, verbose_name=_("Name"))
+    url = models.URLField(max_length=500, verbose_name=_("URL"))
+    # Clé HMAC des signatures (en-tête X-Webhook-Signature)
+    secret = models.CharField(max_length=64, default=webhook_secret, verbose_name=_("Secret"))
+    events = models.JSONField(default=list, blank=True, verbose_name=_("Events")) # Vide : tous les événements
+    # Vide : événements de tous les restaurants
+    restaurant = models.ForeignKey(Location, related_name='+', on_delete=models.CASCADE, null=True, blank=True, verbose_name=_("Restaurant"))
+    is_active = models.BooleanField(default=True, verbose_name=_("Active"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.url})"
+
+    def wants(self, event, restaurant_id):
+        return (not self.events or event in self.events) and self.restaurant_id in (None, restaurant_id)
+
+    class Meta:
+        verbose_name = _("Webhook Endpoint")
+        verbose_name_plural = _("Webhook Endpoints")
+
+class WebhookDelivery(models.Model):
+    """
+    One event waiting for, or done with, delivery to one endpoint: the durable outbox read by
+    manage.py deliver_webhooks.
+    """
+    class DeliveryStatus(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        DELIVERED = 'delivered', _('Delivered')
+        DEAD = 'dead', _('Dead')
+
+    endpoint = models.ForeignKey(WebhookEndpoint, related_name='deliveries', on_delete=models.CASCADE, db_index=False, verbose_name=_("Endpoint"))
+    event_id = models.UUIDField(default=uuid.uuid4, editable=False, verbose_name=_("Event ID"))
+    event = models.CharField(max_length=50, choices=WebhookEndpoint.EventType.choices, verbose_name=_("Event"))
+    payload = models.JSONField(encoder=DjangoJSONEncoder, verbose_name=_("Payload"))
+    status = models.CharField(max_length=10, choices=DeliveryStatus.choices, default=DeliveryStatus.PENDING, verbose_name=_("Status"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Attempts"))
+    # Prochain envoi ; repoussé pendant un envoi (bail du worker) et après chaque échec
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Next Attempt At"))
+    last_error = models.TextField(blank=True, verbose_name=_("Last Error"))
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Delivered At"))
+
+    def __str__(self):
+        return f"{self.event} -> {self.endpoint_id}"
+
+    class Meta:
+        verbose_name = _("Webhook Delivery")
+        verbose_name_plural = _("Webhook Deliveries")
+        ordering = ['-created_at']
+        indexes = [
+            # Index partiels : file d'envoi par destinataire, et lettres mortes
+            models.Index(fields=['endpoint', 'next_attempt_at', 'id'], name='webhook_due_idx', condition=Q(status='pending')),
+            models.Index(fields=['created_at'], name='webhook_dead_idx', condition=Q(status='dead')),
+        ]
 
 # Make sure to add 'api' to INSTALLED_APPS in settings.py
 # Also, Pillow will be needed for ImageField: pip install Pillow
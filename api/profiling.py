@@ -0,0 +1,187 @@
+"""
+Opt-in request profiling: a stack sampler plus the SQL statements of a single request,
+stored as JSON dumps in a bounded on-disk ring buffer (settings.PROFILING['DIR']).
+
+A request is profiled when it carries a valid signed ``X-Profile`` header (see
+``manage.py profiles token``) or, for staff users, with probability PROFILING['SAMPLE_RATE'].
+Other requests only pay a header lookup. Dumps are listed and exported as collapsed stacks
+(flamegraph.pl / speedscope input) with ``manage.py profiles``.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+HEADER = 'HTTP_X_PROFILE'
+SIGNING_SALT = 'api.profiling'
+TOKEN_VALUE = 'profile'
+
+
+def profiling_setting(name, default=None):
+    return getattr(settings, 'PROFILING', {}).get(name, default)
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(TOKEN_VALUE)
+
+
+def token_is_valid(token):
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=profiling_setting('TOKEN_MAX_AGE', 3600)
+        )
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval from a helper thread and counts
+    identical stacks, which is directly the collapsed-stack format.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiling-sampler', daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class SQLRecorder:
+    def __init__(self, limit):
+        self.limit = limit
+        self.statements = []
+        self.total = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.total += 1
+            self.duration += duration
+            if len(self.statements) < self.limit:
+                self.statements.append({'sql': sql, 'duration': duration, 'many': many})
+
+
+def store_dump(dump):
+    """
+    Writes a dump and drops the oldest ones beyond PROFILING['MAX_DUMPS'].
+    """
+    directory = Path(profiling_setting('DIR'))
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{dump['id']}.json"
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(dump))
+    os.replace(tmp_path, path)
+    for old in list_dumps()[profiling_setting('MAX_DUMPS', 50):]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def list_dumps():
+    """
+    Returns the dump files, newest first.
+    """
+    directory = profiling_setting('DIR')
+    if not directory or not os.path.isdir(directory):
+        return []
+    return sorted(Path(directory).glob('*.json'), reverse=True)
+
+
+def load_dump(dump_id):
+    for path in list_dumps():
+        if path.stem.startswith(dump_id):
+            return json.loads(path.read_text())
+    return None
+
+
+def collapsed_stacks(dump):
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(dump['samples'].items()))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests selected by should_profile(); must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.META.get(HEADER)
+        if token is not None:
+            return token_is_valid(token)
+        rate = profiling_setting('SAMPLE_RATE', 0)
+        # Tirer au sort d'abord : l'utilisateur (session + requête SQL) n'est chargé que pour l'échantillon
+        return rate > 0 and random.random() < rate and request.user.is_staff
+
+    def __call__(self, request):
+        if not profiling_setting('DIR') or not self.should_profile(request):
+            return self.get_response(request)
+
+        recorder = SQLRecorder(profiling_setting('MAX_SQL_STATEMENTS', 500))
+        started = time.time()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            sampler = stack.enter_context(
+                StackSampler(threading.get_ident(), profiling_setting('INTERVAL', 0.001))
+            )
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        dump_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(started))}{int(started * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:6]}"
+        store_dump({
+            'id': dump_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'started_at': started,
+            'duration': duration,
+            'interval': sampler.interval,
+            'samples': sampler.samples,
+            'sql_count': recorder.total,
+            'sql_duration': recorder.duration,
+            'sql': recorder.statements,
+        })
+        response['X-Profile-Id'] = dump_id
+        return response
@@ -0,0 +1,288 @@
+"""
+Recurring events: one Event row with a recurrence rule stands for the whole series, e.g.::
+
+    FREQ=WEEKLY;BYDAY=FR                     every Friday (live music)
+    FREQ=MONTHLY;BYDAY=1SU;UNTIL=20271231    first Sunday of the month, until the end of 2027
+    FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;COUNT=12
+
+Rules are a subset of the RFC 5545 RRULE syntax: FREQ (DAILY, WEEKLY or MONTHLY), INTERVAL,
+BYDAY (with an ordinal for MONTHLY rules: 1SU, -1FR), BYMONTHDAY (MONTHLY), COUNT and UNTIL.
+The event's date and time are those of the first occurrence; Event.recurrence_end, the date of
+the last one (None for an endless series), is computed on save so that a date window is
+matched by the query alone (in_window()).
+
+Occurrences are never stored. They are expanded in memory, only within the window asked for,
+starting directly from the first period of the window: a year of a weekly event is one row
+read. An occurrence is cancelled, moved or retitled by an EventOccurrenceOverride keyed by its
+original date. For series, a window without an end date stops RECURRING_EVENTS['HORIZON_DAYS']
+days after today (or after its start, if later); one-off events stay unbounded. A series yields
+at most MAX_OCCURRENCES occurrences per window.
+"""
+import calendar
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+DAILY = 'DAILY'
+WEEKLY = 'WEEKLY'
+MONTHLY = 'MONTHLY'
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+PARTS = ('FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'COUNT', 'UNTIL')
+BYDAY_RE = re.compile(r'^([+-]?[1-5])?(MO|TU|WE|TH|FR|SA|SU)$')
+UNTIL_RE = re.compile(r'^\d{8}(T\d{6}Z?)?$')
+MAX_INTERVAL = 99
+MAX_COUNT = 1000
+# Borne des séries sans fin : les calculs de dates restent loin de date.max
+LAST_DATE = date(9000, 12, 31)
+
+Rule = namedtuple('Rule', ['freq', 'interval', 'byday', 'bymonthday', 'count', 'until'])
+Occurrence = namedtuple('Occurrence', ['event', 'original_date', 'date', 'time', 'title', 'description'])
+
+
+class InvalidRule(ValueError):
+    pass
+
+
+def recurrence_setting(name, default=None):
+    return getattr(settings, 'RECURRING_EVENTS', {}).get(name, default)
+
+
+def bounded_int(parts, name, default, maximum):
+    if name not in parts:
+        return default
+    value = parts[name]
+    if not value.isdigit() or not 1 <= int(value) <= maximum:
+        raise InvalidRule(f"{name} must be a number from 1 to {maximum}.")
+    return int(value)
+
+
+def parse(text):
+    """
+    Returns the Rule of a recurrence rule ('FREQ=WEEKLY;BYDAY=FR', an optional 'RRULE:' prefix
+    allowed). Raises InvalidRule for anything outside the supported subset.
+    """
+    parts = {}
+    text = text.strip().upper()
+    for part in text.removeprefix('RRULE:').split(';'):
+        if not part:
+            continue
+        name, sep, value = part.partition('=')
+        if not sep or not value:
+            raise InvalidRule(f"Malformed rule part '{part}'.")
+        if name in parts:
+            raise InvalidRule(f"{name} is given twice.")
+        parts[name] = value
+    unsupported = sorted(set(parts) - set(PARTS))
+    if unsupported:
+        raise InvalidRule(f"Unsupported rule part(s): {', '.join(unsupported)}.")
+    freq = parts.get('FREQ')
+    if freq not in (DAILY, WEEKLY, MONTHLY):
+        raise InvalidRule("FREQ must be DAILY, WEEKLY or MONTHLY.")
+    interval = bounded_int(parts, 'INTERVAL', 1, MAX_INTERVAL)
+    count = bounded_int(parts, 'COUNT', None, MAX_COUNT)
+    until = None
+    if 'UNTIL' in parts:
+        if not UNTIL_RE.match(parts['UNTIL']):
+            raise InvalidRule("UNTIL must be a date (YYYYMMDD).")
+        try:
+            until = date(int(parts['UNTIL'][:4]), int(parts['UNTIL'][4:6]), int(parts['UNTIL'][6:8]))
+        except ValueError:
+            raise InvalidRule("UNTIL must be a date (YYYYMMDD).")
+        if count is not None:
+            raise InvalidRule("COUNT and UNTIL cannot be combined.")
+
+    byday = []
+    for value in parts['BYDAY'].split(',') if 'BYDAY' in parts else []:
+        match = BYDAY_RE.match(value)
+        if match is None:
+            raise InvalidRule(f"Invalid BYDAY value '{value}'.")
+        ordinal = int(match[1]) if match[1] else None
+        if ordinal is not None and freq != MONTHLY:
+            raise InvalidRule("BYDAY ordinals (1SU, -1FR) need FREQ=MONTHLY.")
+        byday.append((ordinal, WEEKDAYS.index(match[2])))
+    bymonthday = []
+    for value in parts['BYMONTHDAY'].split(',') if 'BYMONTHDAY' in parts else []:
+        if not re.match(r'^[+-]?\d{1,2}$', value) or not 1 <= abs(int(value)) <= 31:
+            raise InvalidRule(f"Invalid BYMONTHDAY value '{value}'.")
+        bymonthday.append(int(value))
+    if byday and freq == DAILY:
+        raise InvalidRule("BYDAY needs FREQ=WEEKLY or MONTHLY.")
+    if bymonthday and freq != MONTHLY:
+        raise InvalidRule("BYMONTHDAY needs FREQ=MONTHLY.")
+    if byday and bymonthday:
+        raise InvalidRule("BYDAY and BYMONTHDAY cannot be combined.")
+    return Rule(freq, interval, tuple(byday), tuple(bymonthday), count, until)
+
+
+def month_days(rule, start, year, month):
+    """
+    Returns the occurrence dates of a MONTHLY rule in one month, in order. Days the month does
+    not have (BYMONTHDAY=31, a fifth Friday) are skipped, as RFC 5545 requires.
+    """
+    length = calendar.monthrange(year, month)[1]
+    if rule.bymonthday:
+        days = {day if day > 0 else length + day + 1 for day in rule.bymonthday}
+    elif rule.byday:
+        days = set()
+        for ordinal, weekday in rule.byday:
+            matching = range((weekday - date(year, month, 1).weekday()) % 7 + 1, length + 1, 7)
+            if ordinal is None:
+                days.update(matching)
+            elif abs(ordinal) <= len(matching):
+                days.add(matching[ordinal - 1 if ordinal > 0 else ordinal])
+    else:
+        days = {start.day}
+    return [date(year, month, day) for day in sorted(days) if 1 <= day <= length]
+
+
+def iter_dates(rule, start, since, until):
+    """
+    Yields the dates of the series starting on ``start`` from ``since`` to ``until`` included,
+    in order, skipping the periods before ``since`` without enumerating them. UNTIL is applied,
+    COUNT is not (see last_date()).
+    """
+    since = max(since, start)
+    until = min(until, rule.until or LAST_DATE, LAST_DATE)
+    if rule.freq == DAILY:
+        day = start + timedelta(days=(since - start).days // rule.interval * rule.interval)
+        while day <= until:
+            if day >= since:
+                yield day
+            day += timedelta(days=rule.interval)
+    elif rule.freq == WEEKLY:
+        weekdays = sorted({weekday for _, weekday in rule.byday}) or [start.weekday()]
+        first_monday = start - timedelta(days=start.weekday())
+        period = (since - first_monday).days // 7 // rule.interval
+        while True:
+            monday = first_monday + timedelta(weeks=period * rule.interval)
+            if monday > until:
+                return
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if since <= day <= until:
+                    yield day
+            period += 1
+    else:
+        index = start.year * 12 + start.month - 1
+        index += max(0, (since.year * 12 + since.month - 1 - index) // rule.interval) * rule.interval
+        while True:
+            year, month = divmod(index, 12)
+            if date(year, month + 1, 1) > until:
+                return
+            for day in month_days(rule, start, year, month + 1):
+                if since <= day <= until:
+                    yield day
+            index += rule.interval
+
+
+def last_date(text, start):
+    """
+    Returns the date of the last occurrence of the rule ``text`` for a series starting on
+    ``start``, or None for a one-off event or an endless series.
+    """
+    if not text:
+        return None
+    rule = parse(text)
+    if rule.count is not None:
+        found = list(islice(iter_dates(rule, start, start, LAST_DATE), rule.count))
+        return found[-1] if found else start
+    if rule.until is not None:
+        return max(rule.until, start)
+    return None
+
+
+def is_occurrence(event, day):
+    """
+    Tells whether ``day`` is an original date of the event (its only date for a one-off event).
+    """
+    if not event.recurrence:
+        return day == event.event_date
+    end = last_date(event.recurrence, event.event_date)
+    if end is not None and day > end:
+        return False
+    return next(iter_dates(parse(event.recurrence), event.event_date, day, day), None) == day
+
+
+def series_until(since, until):
+    return until or max(since, timezone.localdate()) + timedelta(days=recurrence_setting('HORIZON_DAYS', 90))
+
+
+def in_window(queryset, since, until=None):
+    """
+    Filters events to those that may take place between ``since`` and ``until`` (included, None
+    for no end): one-off events on those dates, series begun by ``until`` and not ended before
+    ``since``.
+    """
+    one_off = Q(recurrence='', event_date__gte=since)
+    series = ~Q(recurrence='') & (Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=since))
+    queryset = queryset.filter(one_off | series)
+    if until is not None:
+        queryset = queryset.filter(event_date__lte=until)
+    return queryset
+
+
+def overrides_prefetch(since, until=None):
+    """
+    Prefetch of the overrides occurrences() needs for the window: one query for every event.
+    """
+    from .models import EventOccurrenceOverride
+    window = (since, series_until(since, until))
+    overrides = EventOccurrenceOverride.objects.filter(Q(original_date__range=window) | Q(event_date__range=window))
+    return Prefetch('occurrence_overrides', queryset=overrides)
+
+
+def apply_override(occurrence, override):
+    return occurrence._replace(
+        date=override.event_date or occurrence.date,
+        time=override.event_time or occurrence.time,
+        title=override.title or occurrence.title,
+        description=override.description or occurrence.description,
+    )
+
+
+def occurrences(event, since, until=None):
+    """
+    Returns the occurrences of an event (recurring or not) taking place between ``since`` and
+    ``until`` (included), overrides applied. The event's overrides are read from
+    event.occurrence_overrides (use overrides_prefetch() when listing several events).
+    """
+    first = Occurrence(event, event.event_date, event.event_date, event.event_time, event.title, event.description)
+    if not event.recurrence:
+        return [first] if since <= event.event_date and (until is None or event.event_date <= until) else []
+
+    rule = parse(event.recurrence)
+    until = series_until(since, until)
+    end = min(until, event.recurrence_end or until)
+    originals = list(islice(iter_dates(rule, event.event_date, since, end), recurrence_setting('MAX_OCCURRENCES', 500)))
+    overrides = {override.original_date: override for override in event.occurrence_overrides.all()}
+    # Occurrences déplacées dans la fenêtre depuis une date hors fenêtre
+    originals.extend(
+        original for original, override in overrides.items()
+        if not since <= original <= until and override.event_date and since <= override.event_date <= until
+        and is_occurrence(event, original)
+    )
+    found = []
+    for original in originals:
+        occurrence = first._replace(original_date=original, date=original)
+        override = overrides.get(original)
+        if override is not None:
+            if override.is_cancelled:
+                continue
+            occurrence = apply_override(occurrence, override)
+        if since <= occurrence.date <= until:
+            found.append(occurrence)
+    return found
+
+
+def expand(events, since, until=None):
+    """
+    Returns the occurrences of ``events`` between ``since`` and ``until``, by date and time.
+    """
+    found = [occurrence for event in events for occurrence in occurrences(event, since, until)]
+    found.sort(key=lambda occurrence: (occurrence.date, occurrence.time, occurrence.event.pk))
+    return found
@@ -0,0 +1,108 @@
+"""
+Reminder emails for the next day's confirmed reservations (manage.py send_reminders).
+
+Due reminders are read through the partial index reservation_reminder_due_idx, in primary
+key order and in batches. All messages go through one mail connection (one SMTP session for
+the whole run), and each batch's reservations are marked with reminder_sent_at as soon as
+it is sent, so a rerun after a crash only sends the reminders still missing. At most the
+messages sent since the last mark can be sent twice, if the process is killed outright.
+With per-location databases (LOCATION_DATABASES), each reservation database is processed in turn.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import locations, metrics
+from .models import Reservation
+
+LOCK_KEY = 'send-reminders:lock'
+LOCK_TIMEOUT = 3600
+
+
+class RemindersAlreadyRunning(Exception):
+    """Raised when another send_reminders run holds the lock."""
+
+
+def due_reminders(day, using='default'):
+    return Reservation.objects.using(using).filter(
+        reservation_date=day,
+        status=Reservation.ReservationStatus.CONFIRMED,
+        reminder_sent_at__isnull=True,
+    ).select_related('table').order_by('reservation_date', 'id')
+
+
+def relative_wording(day, today=None):
+    """
+    Returns (when, farewell) for a reminder about ``day``: send_reminders --date can target any day.
+    """
+    days = (day - (today or timezone.localdate())).days
+    if days == 0:
+        return "aujourd'hui", "À tout à l'heure"
+    if days == 1:
+        return "demain", "À demain"
+    return "", "À bientôt"
+
+
+def reminder_message(reservation, connection):
+    when, farewell = relative_wording(reservation.reservation_date)
+    context = {'reservation': reservation, 'when': when, 'farewell': farewell}
+    message = EmailMultiAlternatives(
+        subject=f"Rappel : votre réservation chez New Treichville le {reservation.reservation_date.strftime('%d/%m/%Y')}",
+        body=render_to_string('api/emails/reservation_reminder.txt', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[reservation.customer_email],
+        connection=connection,
+    )
+    message.attach_alternative(render_to_string('api/emails/reservation_reminder.html', context), 'text/html')
+    return message
+
+
+def send_reminders(day, batch_size=200):
+    """
+    Sends the reminders of ``day`` not sent yet. Returns (sent, failed).
+    A reminder that could not be sent stays unmarked and is retried by the next run.
+    """
+    if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        raise RemindersAlreadyRunning()
+    sent = failed = 0
+    try:
+        with get_connection() as connection:
+            for using in locations.reservation_databases():
+                batch_sent, batch_failed = send_database_reminders(day, batch_size, using, connection)
+                sent += batch_sent
+                failed += batch_failed
+    finally:
+        cache.delete(LOCK_KEY)
+    return sent, failed
+
+
+def send_database_reminders(day, batch_size, using, connection):
+    sent = failed = 0
+    last_id = 0
+    while True:
+        # Curseur sur l'id : les échecs, laissés non marqués, ne sont pas relus en boucle
+        batch = list(due_reminders(day, using).filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return sent, failed
+        last_id = batch[-1].id
+        delivered = []
+        try:
+            for reservation in batch:
+                message = reminder_message(reservation, connection)
+                with metrics.timer('email_send_duration_seconds', kind='reservation-reminder'):
+                    try:
+                        message.send()
+                    except Exception as e:
+                        metrics.inc('email_send_failures_total', kind='reservation-reminder')
+                        print(f"Erreur lors de l'envoi du rappel de la réservation {reservation.id}: {e}")
+                        failed += 1
+                        continue
+                delivered.append(reservation.id)
+        finally:
+            # Marquer même si le lot est interrompu : ces rappels sont partis
+            Reservation.objects.using(using).filter(id__in=delivered, reminder_sent_at__isnull=True).update(
+                reminder_sent_at=timezone.now()
+            )
+            sent += len(delivered)
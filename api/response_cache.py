@@ -0,0 +1,175 @@
+"""
+Response cache for the public catalog GET endpoints (categories, dishes, events, search).
+
+Entries are keyed by the absolute URL (query parameters sorted) and by the current version of
+every tag the view depends on, one tag per model and location ('dish:<location id>', ...).
+Saving or deleting an object bumps its tag version (api/signals.py), so only the entries of
+the views that read that model at that location stop matching; they then age out through
+RESPONSE_CACHE['TIMEOUT'].
+
+Two tiers: an optional per-process cache (RESPONSE_CACHE['LOCAL_ALIAS'], typically LocMemCache)
+in front of the shared one (RESPONSE_CACHE['ALIAS'], Redis or Memcached in production). Tag
+versions always come from the shared tier, so a local hit is never staler than a shared one.
+Concurrent misses of one entry are filled by a single computation (api/singleflight.py).
+Lookups are counted in the cache_requests_total metric (cache="responses-local"/"responses-shared");
+``manage.py cache_stats`` prints the hit ratios.
+"""
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics, singleflight
+
+TAG_KEY = 'response-cache:tag:{}'
+ENTRY_KEY = 'response-cache:entry:{}'
+LOCAL_METRIC = 'responses-local'
+SHARED_METRIC = 'responses-shared'
+
+
+def cache_setting(name, default=None):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, default)
+
+
+def is_enabled():
+    return bool(getattr(settings, 'RESPONSE_CACHE', None)) and cache_setting('ENABLED', True)
+
+
+def shared_cache():
+    return caches[cache_setting('ALIAS', 'default')]
+
+
+def local_cache():
+    alias = cache_setting('LOCAL_ALIAS')
+    return caches[alias] if alias else None
+
+
+def tag_versions(tags):
+    """
+    Returns the current version of each tag. A missing version (first use, or evicted) starts
+    at the current time, so it can never match entries stored under an older version.
+    """
+    cache = shared_cache()
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def location_tag(tag, location_id):
+    return f"{tag}:{location_id}"
+
+
+def invalidate(*tags):
+    if not is_enabled():
+        return
+    cache = shared_cache()
+    for tag in tags:
+        key = TAG_KEY.format(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate_on_commit(*tags):
+    """
+    Invalidates now and again after the commit: a request served between the two could have
+    cached the data of before the commit.
+    """
+    invalidate(*tags)
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def entry_key(request, tags):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    url = request.build_absolute_uri(request.path)
+    versions = '.'.join(str(version) for version in tag_versions(tags))
+    return ENTRY_KEY.format(hashlib.sha256(f"{url}?{query}#{versions}".encode()).hexdigest())
+
+
+def cached_response(method):
+    """
+    Serves a view method's successful responses from the cache, for the tags returned by
+    view.get_cache_tags() (view.cache_tags by default).
+    The serialized data is cached, rendering still follows the request's content negotiation.
+    """
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not is_enabled():
+            return method(self, request, *args, **kwargs)
+
+        tags = self.get_cache_tags() if hasattr(self, 'get_cache_tags') else self.cache_tags
+        key = entry_key(request, tags)
+        local = local_cache()
+        if local is not None:
+            data = local.get(key)
+            metrics.record_cache(LOCAL_METRIC, data is not None)
+            if data is not None:
+                return cache_hit(data)
+        data = shared_cache().get(key)
+        metrics.record_cache(SHARED_METRIC, data is not None)
+        if data is not None:
+            if local is not None:
+                local.set(key, data, cache_setting('LOCAL_TIMEOUT', 5))
+            return cache_hit(data)
+
+        # Requêtes identiques simultanées : un seul calcul pour remplir l'entrée
+        response = singleflight.coalesce_response(
+            'response-cache', key, lambda: method(self, request, *args, **kwargs)
+        )
+        if response.status_code == status.HTTP_200_OK:
+            shared_cache().set(key, response.data, cache_setting('TIMEOUT', 300))
+            if local is not None:
+                local.set(key, response.data, cache_setting('LOCAL_TIMEOUT', 5))
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def cache_hit(data):
+    response = Response(data)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Caches the list and retrieve actions of a read-only viewset; set cache_tags to the models
+    its responses are built from. Extra actions opt in with @cached_response.
+    """
+    cache_tags = ()
+
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+def hit_ratios():
+    """
+    Returns {tier: (hits, misses, ratio)} over every process reporting metrics.
+    """
+    totals = {}
+    for dump in metrics.collect():
+        for name, labels, value in dump['counters']:
+            labels = dict(map(tuple, labels))
+            if name == 'cache_requests_total' and labels.get('cache') in (LOCAL_METRIC, SHARED_METRIC):
+                counts = totals.setdefault(labels['cache'], {'hit': 0, 'miss': 0})
+                counts[labels['result']] += value
+    return {
+        tier: (counts['hit'], counts['miss'], counts['hit'] / (counts['hit'] + counts['miss']))
+        for tier, counts in totals.items() if counts['hit'] + counts['miss']
+    }
@@ -0,0 +1,117 @@
+"""
+Full-text search over dishes and events, backed by an SQLite FTS5 virtual table.
+
+The index is a single table shared by both models: dish rows use rowid ``2 * id`` and event
+rows ``2 * id + 1``, so a row is updated or removed by primary key and the type filter is a
+rowid test. The unindexed ``restaurant`` column restricts matches to one location. The ``unicode61 remove_diacritics 2`` tokenizer folds case and accents
+("attieke" finds "attiéké"), and the prefix indexes make as-you-type queries index lookups.
+
+Kept in sync by the post_save/post_delete handlers in api/signals.py; after bulk writes that
+bypass signals, call ``index_objects()`` (or ``manage.py rebuild_search_index``).
+"""
+import re
+
+from django.db import connection
+
+SEARCH_TABLE = 'api_search_index'
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, body, restaurant UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+
+DISH, EVENT = 'dish', 'event'
+KIND_OFFSETS = {DISH: 0, EVENT: 1}
+
+# Poids bm25 des colonnes (title, body) : un mot du titre compte bien plus qu'un mot de la description
+TITLE_WEIGHT, BODY_WEIGHT = 10.0, 1.0
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def rowid_for(kind, pk):
+    return 2 * pk + KIND_OFFSETS[kind]
+
+
+def kind_for(rowid):
+    return EVENT if rowid % 2 else DISH
+
+
+def document_for(obj):
+    """
+    Returns (kind, title, body) for a Dish or an Event.
+    """
+    if obj._meta.model_name == 'dish':
+        return DISH, obj.name, obj.description
+    return EVENT, obj.title, obj.description
+
+
+def index_objects(objects):
+    """
+    Inserts or replaces the index rows of the given dishes and events.
+    """
+    if not is_available():
+        return
+    rows = []
+    for obj in objects:
+        kind, title, body = document_for(obj)
+        rows.append((rowid_for(kind, obj.pk), title, body or '', obj.restaurant_id))
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, title, body, restaurant) VALUES (%s, %s, %s, %s)", rows)
+
+
+def remove_object(kind, pk):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid_for(kind, pk)])
+
+
+def rebuild(dishes, events):
+    """
+    Recreates the whole index from the given querysets.
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    index_objects(dishes.iterator())
+    index_objects(events.iterator())
+
+
+def match_expression(query):
+    """
+    Turns free user input into an FTS5 expression where every word must match as a prefix.
+    Quoting each token neutralises FTS5 operators and syntax.
+    """
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(query, kind=None, limit=50, restaurant_id=None):
+    """
+    Returns [(kind, pk), ...] ranked by relevance (bm25), best first, optionally for one location.
+    """
+    expression = match_expression(query)
+    if not expression or not is_available():
+        return []
+    sql = (
+        f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s"
+        + (" AND rowid %% 2 = %s" if kind else "")
+        + (" AND restaurant = %s" if restaurant_id is not None else "")
+        + f" ORDER BY bm25({SEARCH_TABLE}, %s, %s) LIMIT %s"
+    )
+    params = (
+        [expression] + ([KIND_OFFSETS[kind]] if kind else [])
+        + ([restaurant_id] if restaurant_id is not None else []) + [TITLE_WEIGHT, BODY_WEIGHT, limit]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(kind_for(rowid), rowid // 2) for (rowid,) in cursor.fetchall()]
@@ -1,5 +1,6 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Table, Category, Dish, Event, Reservation, ContactMessage
+from .models import Table, Category, Dish, Event, EventBooking, Reservation, ContactMessage, WebhookDelivery
 
 class TableSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,7 +24,46 @@ class DishSerializer(serializers.ModelSerializer):
 class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
-        fields = ['id', 'title', 'description', 'event_date', 'event_time', 'image', 'capacity', 'is_published', 'booking_required', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'event_date', 'event_time', 'image', 'capacity', 'seats_remaining', 'is_published', 'booking_required', 'recurrence', 'recurrence_end', 'created_at', 'updated_at']
+
+def occurrence_data(occurrences, context=None):
+    """
+    Serializes occurrences (api/recurrence.py) as events on their own date and time, with the
+    original date of the occurrence in occurrence_date. Each event is serialized once.
+    """
+    events = {}
+    data = []
+    for occurrence in occurrences:
+        event = occurrence.event
+        if event.pk not in events:
+            events[event.pk] = EventSerializer(event, context=context).data
+        data.append(dict(
+            events[event.pk], occurrence_date=occurrence.original_date.isoformat(),
+            event_date=occurrence.date.isoformat(), event_time=occurrence.time.isoformat(),
+            title=occurrence.title, description=occurrence.description,
+        ))
+    return data
+
+class EventBookingSerializer(serializers.ModelSerializer):
+    event = serializers.PrimaryKeyRelatedField(queryset=Event.objects.filter(is_published=True))
+    number_of_seats = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = EventBooking
+        fields = [
+            'reference', 'event', 'idempotency_key', 'customer_name', 'customer_email',
+            'customer_phone', 'number_of_seats', 'status', 'created_at'
+        ]
+        read_only_fields = ['reference', 'status', 'created_at']
+        # L'unicité (event, idempotency_key) est gérée par EventBooking.objects.book() : un rejeu renvoie la réservation existante
+        validators = []
+
+    def validate_event(self, event):
+        if event.capacity is None:
+            raise serializers.ValidationError("This event does not take bookings.")
+        if event.event_date < timezone.localdate():
+            raise serializers.ValidationError("This event has already taken place.")
+        return event
 
 class ReservationSerializer(serializers.ModelSerializer):
     # table = TableSerializer(read_only=True)
@@ -38,8 +78,62 @@ class ReservationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['status', 'created_at', 'updated_at'] # Status sera géré par la logique métier
 
+    def validate(self, attrs):
+        table = attrs['table'] if 'table' in attrs else getattr(self.instance, 'table', None)
+        if not isinstance(table, Table):
+            return attrs # Pas de table, ou identifiant vérifié par l'appelant (BulkReservationRowSerializer)
+        # Le restaurant de la réservation : celui de la requête à la création (contexte de la vue)
+        location = self.instance.restaurant if self.instance is not None else self.context.get('location')
+        if location is not None and (table.restaurant_id != location.pk or not table.is_active):
+            raise serializers.ValidationError({'table': [f"No active table {table.pk} at this location."]})
+        guests = attrs.get('number_of_guests', getattr(self.instance, 'number_of_guests', None))
+        if guests is not None and table.capacity < guests:
+            raise serializers.ValidationError({'table': [f"Table {table.name} seats {table.capacity}."]})
+        return attrs
+
+class BulkReservationRowSerializer(ReservationSerializer):
+    """
+    One party of a bulk creation (api/bulk_reservations.py): the table is checked against the
+    location's tables loaded once for the batch, not looked up per row.
+    """
+    table = serializers.IntegerField(required=False, allow_null=True)
+
+class BulkReservationSerializer(serializers.Serializer):
+    MODES = ('atomic', 'partial')
+
+    reservations = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+    mode = serializers.ChoiceField(choices=MODES, default='atomic') # partial : les lignes valides sont créées
+    assign_tables = serializers.BooleanField(default=True) # Attribuer une table libre aux lignes qui n'en ont pas
+
 class ContactMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
         fields = ['id', 'name', 'email', 'subject', 'message', 'created_at']
         read_only_fields = ['created_at']
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    endpoint_url = serializers.URLField(source='endpoint.url', read_only=True)
+
+    class Meta:
+        model = WebhookDelivery
+        fields = ['id', 'endpoint', 'endpoint_url', 'event_id', 'event', 'payload', 'status', 'attempts', 'last_error', 'created_at', 'next_attempt_at']
+        read_only_fields = fields
+
+class MenuCategoryRowSerializer(serializers.Serializer):
+    """
+    One category of a menu import (api/menu_import.py), matched by name.
+    """
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    order = serializers.IntegerField(required=False)
+
+class MenuDishRowSerializer(serializers.Serializer):
+    """
+    One dish of a menu import, matched by name; omitted fields keep their current value.
+    """
+    name = serializers.CharField(max_length=200)
+    category = serializers.CharField(max_length=100, required=False) # Nom de la catégorie
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    is_available = serializers.BooleanField(required=False)
+    is_featured = serializers.BooleanField(required=False)
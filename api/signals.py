@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, frontend, lifecycle, response_cache, search, webhooks
+from . import locations
+from .models import CatalogTombstone, Location, Table, TableSlot, Category, Dish, Event, EventOccurrenceOverride, Reservation
+from .streams import broadcaster
+
+
+@receiver(post_init, sender=Reservation)
+def remember_reservation_date(sender, instance, **kwargs):
+    # Pour prévenir aussi l'ancienne date quand une réservation est déplacée
+    instance._loaded_reservation_date = instance.reservation_date
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    dates = {instance.reservation_date, getattr(instance, '_loaded_reservation_date', None)} - {None}
+    for day in dates:
+        # Sur la base de la réservation, qui peut être celle de son restaurant (LOCATION_DATABASES)
+        transaction.on_commit(lambda day=day: broadcaster.notify(instance.restaurant_id, day), using=kwargs['using'])
+    instance._loaded_reservation_date = instance.reservation_date
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_webhook(sender, instance, created, **kwargs):
+    event = webhooks.Event.RESERVATION_CREATED if created else webhooks.Event.RESERVATION_UPDATED
+    # Dans la transaction de Reservation.save() : annulé avec elle si la table est prise
+    webhooks.enqueue_in_transaction(event, instance.restaurant_id, lambda: webhooks.reservation_data([instance]), using=kwargs['using'])
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted_webhook(sender, instance, **kwargs):
+    data = [{'id': instance.pk, 'restaurant': instance.restaurant_id}]
+    webhooks.enqueue_in_transaction(webhooks.Event.RESERVATION_DELETED, instance.restaurant_id, data, using=kwargs['using'])
+
+
+@receiver(lifecycle.reservations_transitioned)
+def reservations_transitioned(sender, reservations, using, **kwargs):
+    # Une notification par restaurant et date, pas par réservation
+    for restaurant_id, day in {(restaurant_id, day) for _, restaurant_id, day in reservations}:
+        broadcaster.notify(restaurant_id, day)
+
+
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+def table_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: broadcaster.notify(instance.restaurant_id))
+
+
+@receiver(post_delete, sender=Table)
+def delete_table_slots(sender, instance, **kwargs):
+    # Pas de clé étrangère en base : les créneaux peuvent être dans la base du restaurant
+    TableSlot.objects.using(locations.database_for(locations.by_id(instance.restaurant_id))).filter(table_id=instance.pk).delete()
+
+
+@receiver(post_init, sender=Dish)
+def remember_dish_availability(sender, instance, **kwargs):
+    instance._loaded_is_available = instance.is_available
+
+
+@receiver(post_save, sender=Dish)
+def dish_availability_webhook(sender, instance, created, **kwargs):
+    if not created and instance.is_available != instance._loaded_is_available:
+        webhooks.enqueue_in_transaction(webhooks.Event.DISH_AVAILABILITY, instance.restaurant_id, lambda: webhooks.dish_data([instance]))
+    instance._loaded_is_available = instance.is_available
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=Event)
+def index_catalog_item(sender, instance, **kwargs):
+    search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Dish)
+@receiver(post_delete, sender=Event)
+def unindex_catalog_item(sender, instance, **kwargs):
+    search.remove_object(search.document_for(instance)[0], instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=EventOccurrenceOverride)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Dish)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=EventOccurrenceOverride)
+def rebuild_frontend(sender, instance, **kwargs):
+    if getattr(settings, 'FRONTEND_BUILD', {}).get('AUTO_BUILD'):
+        transaction.on_commit(frontend.schedule_build)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Dish)
+@receiver(post_delete, sender=Event)
+def invalidate_cached_responses(sender, instance, **kwargs):
+    # Tags par restaurant : modifier la carte d'un site ne vide pas le cache des autres
+    response_cache.invalidate_on_commit(response_cache.location_tag(sender._meta.model_name, instance.restaurant_id))
+
+
+@receiver(post_save, sender=EventOccurrenceOverride)
+@receiver(post_delete, sender=EventOccurrenceOverride)
+def occurrence_overridden(sender, instance, **kwargs):
+    # Une exception modifie la série : updated_at pour le flux de modifications, puis les caches 'event'
+    Event.objects.filter(pk=instance.event_id).update(updated_at=timezone.now())
+    restaurant_id = Event.objects.filter(pk=instance.event_id).values_list('restaurant_id', flat=True).first()
+    if restaurant_id is not None:
+        response_cache.invalidate_on_commit(response_cache.location_tag('event', restaurant_id))
+
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Dish)
+@receiver(post_delete, sender=Event)
+def record_tombstone(sender, instance, **kwargs):
+    # Suppression transmise par le flux de modifications (api/sync.py)
+    CatalogTombstone.objects.create(restaurant_id=instance.restaurant_id, kind=sender._meta.model_name, object_id=instance.pk)
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def location_changed(sender, instance, **kwargs):
+    locations.clear_cache()
+    transaction.on_commit(locations.clear_cache)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    authentication.forget(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    # Désactivation, changement de droits... : les requêtes suivantes relisent l'utilisateur
+    authentication.forget_user(instance)
+    transaction.on_commit(lambda: authentication.forget_user(instance))
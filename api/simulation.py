@@ -0,0 +1,162 @@
+"""
+Monte-Carlo simulation of service nights, for table-mix and overbooking planning
+(manage.py simulate_service). Requires NumPy.
+
+Every night is simulated at once along the first axis of NumPy arrays, with the slot
+occupancy of each table held in a 64-bit mask; the only Python loop runs over the booking
+requests of a night. Tables are claimed on the slot grid of
+api/availability.py (RESERVATION_SLOT_MINUTES, RESERVATION_DURATION), which applies the same
+overlap rule as TableViewSet.availability: bookings conflict when start < other end and
+end > other start.
+
+A night has two passes:
+  * booking: requests arrive in order and take the smallest free table that fits, among the
+    real tables plus the extra tables granted by the overbooking factor; others are declined;
+  * service: each booked party shows up unless it is a no-show, and is seated on the real
+    tables in booking order; parties that cannot be seated are walked (turned away at the door).
+"""
+import math
+from collections import Counter
+
+import numpy as np
+from django.db.models import Count
+
+from . import locations
+from .availability import RESERVATION_DURATION, service_slots, slot_minutes, to_minutes
+from .models import Reservation
+
+NO_TABLE = -1
+
+# Profil utilisé quand l'historique est trop maigre
+DEFAULT_ARRIVALS = 30
+DEFAULT_PARTY_SIZES = {2: 0.5, 3: 0.15, 4: 0.25, 6: 0.1}
+DEFAULT_NO_SHOW_RATE = 0.1
+MIN_HISTORY_NIGHTS = 7
+
+
+class DemandProfile:
+    """
+    Distributions of booking requests per night, party sizes, requested slots and no-shows.
+    """
+
+    def __init__(self, nightly_arrivals, party_sizes, slot_weights, no_show_rate):
+        self.nightly_arrivals = nightly_arrivals  # Liste d'effectifs observés, ou moyenne (Poisson)
+        self.party_sizes = party_sizes            # {taille: probabilité}
+        self.slot_weights = slot_weights          # Probabilité de chaque créneau de service_slots()
+        self.no_show_rate = no_show_rate
+
+    @classmethod
+    def from_history(cls, location=None):
+        """
+        Builds the profile from a location's past Reservation rows, with defaults where history is missing.
+        """
+        slots = service_slots()
+        location = location or locations.default_location()
+        requests = locations.reservations(location).exclude(status=Reservation.ReservationStatus.CANCELLED)
+
+        counts = list(requests.values('reservation_date').annotate(n=Count('id')).values_list('n', flat=True))
+        nightly_arrivals = counts if len(counts) >= MIN_HISTORY_NIGHTS else DEFAULT_ARRIVALS
+
+        sizes = Counter(requests.values_list('number_of_guests', flat=True))
+        total = sum(sizes.values())
+        party_sizes = {size: n / total for size, n in sizes.items()} if total else DEFAULT_PARTY_SIZES
+
+        step = slot_minutes()
+        first = to_minutes(slots[0])
+        slot_counts = np.zeros(len(slots))
+        for reservation_time in requests.values_list('reservation_time', flat=True):
+            index = (to_minutes(reservation_time) - first) // step
+            slot_counts[min(max(index, 0), len(slots) - 1)] += 1
+        slot_weights = slot_counts / slot_counts.sum() if slot_counts.sum() else np.full(len(slots), 1 / len(slots))
+
+        outcomes = Counter(requests.filter(status__in=[
+            Reservation.ReservationStatus.COMPLETED, Reservation.ReservationStatus.NO_SHOW,
+        ]).values_list('status', flat=True))
+        settled = sum(outcomes.values())
+        no_show_rate = outcomes[Reservation.ReservationStatus.NO_SHOW] / settled if settled else DEFAULT_NO_SHOW_RATE
+
+        return cls(nightly_arrivals, party_sizes, slot_weights, no_show_rate)
+
+    def sample(self, rng, nights):
+        """
+        Returns (arrivals (N,), party sizes (N, K), slot indices (N, K), no-show draws (N, K)).
+        """
+        if isinstance(self.nightly_arrivals, (int, float)):
+            arrivals = rng.poisson(self.nightly_arrivals, size=nights)
+        else:
+            arrivals = rng.choice(np.asarray(self.nightly_arrivals), size=nights)
+        width = max(int(arrivals.max()), 1)
+        sizes = np.array(list(self.party_sizes))
+        probabilities = np.array(list(self.party_sizes.values()), dtype=float)
+        party = rng.choice(sizes, size=(nights, width), p=probabilities / probabilities.sum())
+        slot = rng.choice(len(self.slot_weights), size=(nights, width), p=self.slot_weights)
+        no_show = rng.random((nights, width)) < self.no_show_rate
+        return arrivals, party, slot, no_show
+
+
+def allocate(occupied, capacities, party, slot, duration, active):
+    """
+    Seats one party per night on the smallest free table that fits, for every night at once.
+
+    occupied: uint64 (N, T) slot occupancy bitmasks (bit i = slot i), updated in place;
+    capacities: (T,) sorted ascending; party, slot, active: (N,).
+    Returns the chosen table per night, NO_TABLE if none.
+    """
+    nights = occupied.shape[0]
+    window = np.left_shift(np.uint64((1 << duration) - 1), slot.astype(np.uint64))
+    busy = (occupied & window[:, None]) != 0
+    candidates = (capacities[None, :] >= party[:, None]) & ~busy & active[:, None]
+    # Les tables sont triées par capacité : le premier candidat est le plus petit qui convient
+    choice = candidates.argmax(axis=1)
+    accepted = candidates[np.arange(nights), choice]
+    rows = np.nonzero(accepted)[0]
+    occupied[rows, choice[rows]] |= window[rows]
+    return np.where(accepted, choice, NO_TABLE)
+
+
+def simulate(table_capacities, demand, nights=10000, overbooking=0.0, seed=None, samples=None):
+    """
+    Simulates ``nights`` service nights for one table configuration and overbooking factor.
+    Pass the same ``samples`` (from demand.sample) to compare configurations on identical demand.
+    Returns per-night means.
+    """
+    if len(table_capacities) == 0 or min(table_capacities) < 1:
+        raise ValueError("At least one table, each seating one guest or more, is needed.")
+    rng = np.random.default_rng(seed)
+    arrivals, party, slot, no_show = samples or demand.sample(rng, nights)
+    nights, width = party.shape
+
+    slot_count = len(demand.slot_weights)
+    duration = math.ceil(RESERVATION_DURATION.total_seconds() / 60 / slot_minutes())
+    if slot_count + duration > 64:
+        raise ValueError("The service night must fit in 64 slots; increase RESERVATION_SLOT_MINUTES.")
+    real = np.sort(np.asarray(table_capacities))
+    # Tables virtuelles accordées par le surbooking, réparties au prorata de chaque capacité
+    extra = [capacity for capacity, count in Counter(real.tolist()).items()
+             for _ in range(int(round(count * overbooking)))]
+    booking_tables = np.sort(np.concatenate([real, np.asarray(extra, dtype=real.dtype)]))
+
+    requested = np.arange(width)[None, :] < arrivals[:, None]
+    booked = np.zeros((nights, width), dtype=bool)
+    booking_grid = np.zeros((nights, len(booking_tables)), dtype=np.uint64)
+    for k in range(width):
+        booked[:, k] = allocate(booking_grid, booking_tables, party[:, k], slot[:, k], duration, requested[:, k]) != NO_TABLE
+
+    shows = booked & ~no_show
+    seated = np.zeros((nights, width), dtype=bool)
+    service_grid = np.zeros((nights, len(real)), dtype=np.uint64)
+    for k in range(width):
+        seated[:, k] = allocate(service_grid, real, party[:, k], slot[:, k], duration, shows[:, k]) != NO_TABLE
+
+    seat_slots = real.sum() * slot_count
+    return {
+        'requests': requested.sum(axis=1).mean(),
+        'booked': booked.sum(axis=1).mean(),
+        'declined': (requested & ~booked).sum(axis=1).mean(),
+        'no_shows': (booked & no_show).sum(axis=1).mean(),
+        'walked': (shows & ~seated).sum(axis=1).mean(),
+        'seated_parties': seated.sum(axis=1).mean(),
+        'seated_covers': (party * seated).sum(axis=1).mean(),
+        # Places occupées par créneau de service / places disponibles
+        'utilisation': ((party * seated).sum(axis=1) * duration / seat_slots).mean() if seat_slots else 0.0,
+    }
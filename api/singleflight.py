@@ -0,0 +1,181 @@
+"""
+Single-flight coalescing of identical expensive computations (table availability, response
+cache fills).
+
+Concurrent calls with the same key in a process wait for the first one (the leader) and share
+its result, or its exception, instead of computing it again. With SINGLE_FLIGHT['SHARED'],
+leaders of different processes also coordinate through a lock in the shared cache: the holder
+computes and publishes the result under its lock token, and the other processes' leaders poll
+for it. A follower only ever gets the result of a computation running when it arrived, never
+an older one, so this is no cache. Followers give up after WAIT_SECONDS and compute themselves.
+
+Calls are counted in the singleflight_calls_total metric by flight and result (leader,
+coalesced, shared, timeout).
+"""
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from . import metrics
+
+LOCK_KEY = 'singleflight:lock:{}'
+RESULT_KEY = 'singleflight:result:{}:{}'
+METRIC = 'singleflight_calls_total'
+MISSING = object()
+
+
+def flight_setting(name, default=None):
+    return getattr(settings, 'SINGLE_FLIGHT', {}).get(name, default)
+
+
+def is_enabled():
+    return flight_setting('ENABLED', True)
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+calls = {}
+calls_lock = threading.Lock()
+
+
+def run(name, key, compute, shared=None):
+    """
+    Returns compute(), or the result of an identical call (same ``key``) already running.
+    ``shared`` overrides SINGLE_FLIGHT['SHARED'] (coordination across processes).
+    """
+    if not is_enabled():
+        return compute()
+    with calls_lock:
+        call = calls.get(key)
+        leader = call is None
+        if leader:
+            call = calls[key] = Call()
+    if not leader:
+        if not call.done.wait(flight_setting('WAIT_SECONDS', 5)):
+            metrics.inc(METRIC, flight=name, result='timeout')
+            return compute()
+        metrics.inc(METRIC, flight=name, result='coalesced')
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        shared = flight_setting('SHARED', False) if shared is None else shared
+        call.result = run_shared(name, key, compute) if shared else compute()
+        if not shared:
+            metrics.inc(METRIC, flight=name, result='leader')
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with calls_lock:
+            del calls[key]
+        call.done.set()
+
+
+def run_shared(name, key, compute):
+    """
+    Leader of this process: computes under the shared cache lock, or waits for the result of
+    the process holding it. The result must be picklable.
+    """
+    cache = caches[flight_setting('ALIAS', 'default')]
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    lock_key = LOCK_KEY.format(digest)
+    deadline = time.monotonic() + flight_setting('WAIT_SECONDS', 5)
+    while time.monotonic() < deadline:
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, flight_setting('LOCK_TIMEOUT', 30)):
+            try:
+                result = compute()
+                # Publié avant la libération du verrou : un processus en attente le trouve toujours
+                cache.set(RESULT_KEY.format(digest, token), result, flight_setting('WAIT_SECONDS', 5))
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+            metrics.inc(METRIC, flight=name, result='leader')
+            return result
+        holder = cache.get(lock_key)
+        while holder is not None and time.monotonic() < deadline:
+            result = cache.get(RESULT_KEY.format(digest, holder), MISSING)
+            if result is not MISSING:
+                metrics.inc(METRIC, flight=name, result='shared')
+                return result
+            if cache.get(lock_key) != holder:
+                # Verrou libéré sans résultat (échec du détenteur) : nouvelle tentative
+                break
+            time.sleep(flight_setting('POLL_SECONDS', 0.02))
+    metrics.inc(METRIC, flight=name, result='timeout')
+    return compute()
+
+
+def single_flight(key, name=None, shared=None):
+    """
+    Decorator coalescing concurrent calls of a function made with the same ``key(*args, **kwargs)``.
+    """
+    def decorator(function):
+        flight_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            flight_key = f"{flight_name}:{key(*args, **kwargs)}"
+            return run(flight_name, flight_key, lambda: function(*args, **kwargs), shared)
+        return wrapper
+    return decorator
+
+
+def request_key(request):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return f"{request.build_absolute_uri(request.path)}?{query}"
+
+
+def coalesce_response(name, key, view_call, shared=None):
+    """
+    Runs a view through run(): the leader gets its own response, every follower a new
+    Response with the same data, status and headers.
+    """
+    responses = []
+
+    def compute():
+        response = view_call()
+        responses.append(response)
+        return response.status_code, response.data, dict(response.items())
+
+    status_code, data, headers = run(name, key, compute, shared)
+    if responses:
+        return responses[0]
+    response = Response(data, status=status_code)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def coalesced(method=None, *, name=None, shared=None):
+    """
+    Decorator for viewset actions: concurrent identical GET requests (same URL and query
+    parameters) share one computation. Only for responses that do not depend on the user.
+    """
+    def decorator(method):
+        flight_name = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+            return coalesce_response(
+                flight_name, f"{flight_name}:{request_key(request)}",
+                lambda: method(self, request, *args, **kwargs), shared,
+            )
+        return wrapper
+    return decorator(method) if method is not None else decorator
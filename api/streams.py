@@ -0,0 +1,189 @@
+"""
+Server-Sent Events push of table availability.
+
+One hub per location and date recomputes the slot snapshot once per change and fans it out
+to every listener of that date; each listener only filters the shared snapshot for its party size
+and sends the slots that changed. Idle listeners are just coroutines waiting on a queue.
+
+Changes are signalled in-process right away (see api/signals.py) and across processes through
+a version counter in the default cache, polled once per hub (not per listener). That second path
+needs a shared cache backend when running several ASGI workers.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .availability import count_for_party, slot_availability
+
+VERSION_KEY = 'availability-stream:version:{}:{}'
+TABLES_VERSION_KEY = 'availability-stream:version:{}:tables'
+
+
+def stream_setting(name, default):
+    return getattr(settings, 'AVAILABILITY_STREAM', {}).get(name, default)
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def read_versions(location_id, day):
+    return cache.get_many([VERSION_KEY.format(location_id, day.isoformat()), TABLES_VERSION_KEY.format(location_id)])
+
+
+class DateHub:
+    """
+    Keeps the latest slot snapshot of one location and date and pushes it to their listeners.
+    """
+
+    def __init__(self, location, day):
+        self.location = location
+        self.day = day
+        self.key = (location.pk, day)
+        self.listeners = set()
+        self.snapshot = None
+        self.changed = asyncio.Event()
+        self.ready = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def refresh(self):
+        snapshot = await sync_to_async(slot_availability)(self.day, self.location)
+        if snapshot != self.snapshot:
+            self.snapshot = snapshot
+            for queue in self.listeners:
+                if queue.full():
+                    # Un client lent ne reçoit que le dernier état
+                    queue.get_nowait()
+                queue.put_nowait(snapshot)
+
+    async def run(self):
+        debounce = stream_setting('DEBOUNCE_SECONDS', 0.2)
+        poll = stream_setting('POLL_SECONDS', 2)
+        versions = None
+        while not self.ready.is_set():
+            try:
+                versions = await sync_to_async(read_versions)(self.location.pk, self.day)
+                await self.refresh()
+                self.ready.set()
+            except Exception as e:
+                # Base verrouillée, cache indisponible... : les abonnés attendent le premier état
+                print(f"Erreur lors du calcul des disponibilités du {self.day}: {e}")
+                await asyncio.sleep(poll)
+        while True:
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=poll)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if not self.changed.is_set():
+                    # Changements faits par un autre processus
+                    current = await sync_to_async(read_versions)(self.location.pk, self.day)
+                    if current == versions:
+                        continue
+                else:
+                    # Regrouper les rafales de modifications en un seul recalcul
+                    await asyncio.sleep(debounce)
+                    self.changed.clear()
+                    current = await sync_to_async(read_versions)(self.location.pk, self.day)
+                await self.refresh()
+                versions = current
+            except Exception as e:
+                # Nouvel essai au prochain tour : versions inchangées, le recalcul sera refait
+                print(f"Erreur lors du calcul des disponibilités du {self.day}: {e}")
+
+    def close(self):
+        self.task.cancel()
+
+
+class AvailabilityBroadcaster:
+    """
+    Registry of (location, date) hubs for the running event loop.
+    """
+
+    def __init__(self):
+        self.hubs = {}
+        self.loop = None
+
+    async def subscribe(self, location, day):
+        self.loop = asyncio.get_running_loop()
+        hub = self.hubs.get((location.pk, day))
+        if hub is None:
+            hub = self.hubs[(location.pk, day)] = DateHub(location, day)
+            hub.task.add_done_callback(lambda task: self.discard(hub))
+        queue = asyncio.Queue(maxsize=1)
+        # Inscrit avant l'attente : un client parti pendant le premier calcul se désinscrit
+        hub.listeners.add(queue)
+        try:
+            await hub.ready.wait()
+        except BaseException:
+            self.unsubscribe(hub, queue)
+            raise
+        return hub, queue
+
+    def unsubscribe(self, hub, queue):
+        hub.listeners.discard(queue)
+        if not hub.listeners:
+            self.discard(hub)
+            hub.close()
+
+    def discard(self, hub):
+        if self.hubs.get(hub.key) is hub:
+            del self.hubs[hub.key]
+
+    def notify(self, location_id, day=None):
+        """
+        Marks a date of a location (or every date, for table changes) as changed. Safe to call from any thread.
+        """
+        bump_version(VERSION_KEY.format(location_id, day.isoformat()) if day else TABLES_VERSION_KEY.format(location_id))
+        if self.loop is None or self.loop.is_closed() or not self.hubs:
+            return
+        self.loop.call_soon_threadsafe(self._mark_changed, location_id, day)
+
+    def _mark_changed(self, location_id, day):
+        if day is None:
+            hubs = [hub for key, hub in self.hubs.items() if key[0] == location_id]
+        else:
+            hubs = [self.hubs[(location_id, day)]] if (location_id, day) in self.hubs else []
+        for hub in hubs:
+            hub.changed.set()
+
+
+broadcaster = AvailabilityBroadcaster()
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def availability_events(day, num_guests, location):
+    """
+    Yields the SSE stream of one listener: a full snapshot, then only the slots that changed.
+    """
+    keepalive = stream_setting('KEEPALIVE_SECONDS', 20)
+    hub, queue = await broadcaster.subscribe(location, day)
+    try:
+        sent = count_for_party(hub.snapshot, num_guests)
+        yield "retry: 5000\n" + format_event('snapshot', {
+            'date': day.isoformat(), 'guests': num_guests, 'slots': sent,
+        })
+        while True:
+            try:
+                snapshot = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            current = count_for_party(snapshot, num_guests)
+            changed = {slot: count for slot, count in current.items() if sent.get(slot) != count}
+            sent = current
+            if changed:
+                yield format_event('delta', {
+                    'date': day.isoformat(), 'guests': num_guests, 'slots': changed,
+                })
+    finally:
+        broadcaster.unsubscribe(hub, queue)
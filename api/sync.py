@@ -0,0 +1,128 @@
+"""
+Catalog change feed (GET /api/catalog/changes/?since=<cursor>), for kiosks and apps mirroring
+the menu and events locally.
+
+Changes come from the updated_at columns of Category, Dish and Event, and from
+CatalogTombstone for deletions (recorded by api/signals.py), each read through an index on
+(restaurant, updated_at, id): a sync reads the rows changed since its cursor, whatever the
+size of the catalog. A dish that became unavailable or an event that was unpublished is sent
+as a deletion, like a deleted row.
+
+The cursor is the (timestamp, source, id) of the last change sent, so a page continues exactly
+where the previous one stopped. Timestamps are taken before commit, so a transaction that
+commits late can carry a timestamp older than changes already sent: the cursor returned with
+the last page is now - CATALOG_SYNC['SETTLE_SECONDS'], and the most recent changes are sent
+again by the next sync (applying a change twice is harmless). A cursor older
+than the tombstone retention is refused (CursorExpired): the client must sync from scratch.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CatalogTombstone, Category, Dish, Event
+from .serializers import CategorySerializer, DishSerializer, EventSerializer
+
+Cursor = namedtuple('Cursor', ['micros', 'source', 'id'])
+START = Cursor(0, 0, 0)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# (type, modèle, colonne de date) ; l'indice sert d'ordre de départage dans le curseur
+SOURCES = [
+    ('category', Category, 'updated_at'),
+    ('dish', Dish, 'updated_at'),
+    ('event', Event, 'updated_at'),
+    (None, CatalogTombstone, 'deleted_at'),
+]
+SERIALIZERS = {'category': CategorySerializer, 'dish': DishSerializer, 'event': EventSerializer}
+HIDDEN = {'dish': lambda dish: not dish.is_available, 'event': lambda event: not event.is_published}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    """Raised for a cursor older than the tombstone retention: deletions may have been missed."""
+
+
+def sync_setting(name, default=None):
+    return getattr(settings, 'CATALOG_SYNC', {}).get(name, default)
+
+
+def to_micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1) # Exact, contrairement à timestamp()
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def format_cursor(cursor):
+    return '-'.join(str(part) for part in cursor)
+
+
+def parse_cursor(value):
+    try:
+        cursor = Cursor(*(int(part) for part in value.split('-')))
+    except (TypeError, ValueError):
+        raise InvalidCursor(value)
+    if cursor.micros < 0 or not 0 <= cursor.source < len(SOURCES):
+        raise InvalidCursor(value)
+    return cursor
+
+
+def after(cursor, source, field):
+    """
+    Rows of the source whose (timestamp, source, id) key comes after the cursor.
+    """
+    moment = from_micros(cursor.micros)
+    if source > cursor.source:
+        return Q(**{f'{field}__gte': moment})
+    if source == cursor.source:
+        return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'pk__gt': cursor.id})
+    return Q(**{f'{field}__gt': moment})
+
+
+def change_for(kind, obj, context):
+    if kind is None: # Pierre tombale
+        return {'type': obj.kind, 'id': obj.object_id, 'deleted': True, 'item': None}
+    if kind in HIDDEN and HIDDEN[kind](obj):
+        return {'type': kind, 'id': obj.pk, 'deleted': True, 'item': None}
+    return {'type': kind, 'id': obj.pk, 'deleted': False, 'item': SERIALIZERS[kind](obj, context=context).data}
+
+
+def changes(location, since=None, limit=None, context=None):
+    """
+    Returns {'changes': [...], 'cursor': ..., 'has_more': bool} for the location's catalog
+    changes after the ``since`` cursor (everything when None), oldest first.
+    """
+    now = timezone.now()
+    limit = limit or sync_setting('PAGE_SIZE', 500)
+    cursor = since or START
+    if since is not None and from_micros(since.micros) < now - timedelta(days=sync_setting('TOMBSTONE_DAYS', 30)):
+        raise CursorExpired(since)
+
+    rows = []
+    for source, (kind, model, field) in enumerate(SOURCES):
+        queryset = model.objects.filter(restaurant=location).filter(after(cursor, source, field)).order_by(field, 'pk')
+        rows.extend(
+            (Cursor(to_micros(getattr(obj, field)), source, obj.pk), kind, obj)
+            for obj in queryset[:limit + 1]
+        )
+    rows.sort(key=lambda row: row[0])
+    page, has_more = rows[:limit], len(rows) > limit
+
+    if has_more:
+        next_cursor = page[-1][0]
+    else:
+        # Tout est envoyé : le curseur avance jusqu'à l'instant « stable », même sans modification,
+        # pour qu'un client à jour n'atteigne jamais la limite de rétention
+        next_cursor = Cursor(to_micros(now - timedelta(seconds=sync_setting('SETTLE_SECONDS', 5))), 0, 0)
+    return {
+        'changes': [change_for(kind, obj, context or {}) for _, kind, obj in page],
+        'cursor': format_cursor(next_cursor),
+        'has_more': has_more,
+    }
@@ -311,3 +311,1830 @@ class BasicAPITests(APITestCase):
         expected_tables_21_00 = sorted([table_A.name, table_C.name, self.table.name])
         self.assertEqual(len(response.data), 3, f"Expected 3 tables, got {len(response.data)}: {response.data}")
         self.assertEqual(available_table_names, expected_tables_21_00)
+
+
+import threading
+from django.db import OperationalError, close_old_connections
+from django.test import TransactionTestCase
+from .models import EventBooking, EventSoldOut
+
+class EventBookingAPITests(APITestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            title="Concert Coupé-Décalé",
+            description="Soirée live.",
+            event_date=timezone.now().date() + timezone.timedelta(days=7),
+            event_time=timezone.now().time(),
+            capacity=10,
+            is_published=True,
+            booking_required=True
+        )
+        self.url = reverse('eventbooking-list')
+
+    def booking_data(self, key, seats=2):
+        return {
+            'event': self.event.id,
+            'idempotency_key': key,
+            'customer_name': 'Awa',
+            'customer_email': 'awa@example.com',
+            'number_of_seats': seats,
+        }
+
+    def test_booking_decrements_remaining_seats(self):
+        response = self.client.post(self.url, self.booking_data('k1', 3), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_remaining, 7)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_booking_is_idempotent(self):
+        first = self.client.post(self.url, self.booking_data('same-key', 2), format='json')
+        second = self.client.post(self.url, self.booking_data('same-key', 2), format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['reference'], second.data['reference'])
+        self.assertEqual(EventBooking.objects.count(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_remaining, 8)
+
+    def test_sold_out_returns_conflict(self):
+        self.client.post(self.url, self.booking_data('k1', 9), format='json')
+        response = self.client.post(self.url, self.booking_data('k2', 2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_remaining, 1)
+
+    def test_cancel_returns_seats_once(self):
+        response = self.client.post(self.url, self.booking_data('k1', 4), format='json')
+        cancel_url = reverse('eventbooking-cancel', kwargs={'reference': response.data['reference']})
+        self.assertEqual(self.client.post(cancel_url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(cancel_url).status_code, status.HTTP_409_CONFLICT)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_remaining, 10)
+
+    def test_event_without_capacity_is_not_bookable(self):
+        self.event.capacity = None
+        self.event.save()
+        response = self.client.post(self.url, self.booking_data('k1'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_capacity_change_adjusts_remaining_seats(self):
+        EventBooking.objects.book(self.event, 'k1', 4, customer_name='A', customer_email='a@example.com')
+        event = Event.objects.get(pk=self.event.pk)
+        event.capacity = 15
+        event.save()
+        self.assertEqual(event.seats_remaining, 11)
+
+class EventBookingConcurrencyTests(TransactionTestCase):
+    def test_concurrent_bookings_never_oversell(self):
+        event = Event.objects.create(
+            title="Soirée Zouglou",
+            description="Complet en quelques minutes.",
+            event_date=timezone.now().date() + timezone.timedelta(days=1),
+            event_time=timezone.now().time(),
+            capacity=25,
+            is_published=True,
+            booking_required=True
+        )
+        outcomes = []
+        barrier = threading.Barrier(40)
+
+        def attempt(index):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        EventBooking.objects.book(
+                            event, f"client-{index}", 1,
+                            customer_name=f"Client {index}", customer_email=f"c{index}@example.com"
+                        )
+                        outcomes.append('booked')
+                        return
+                    except EventSoldOut:
+                        outcomes.append('sold-out')
+                        return
+                    except OperationalError:
+                        # SQLite verrouille la base sous contention : le client réessaie
+                        continue
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=attempt, args=(i,)) for i in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        event.refresh_from_db()
+        self.assertEqual(outcomes.count('booked'), 25)
+        self.assertEqual(outcomes.count('sold-out'), 15)
+        self.assertEqual(event.seats_remaining, 0)
+        self.assertEqual(EventBooking.objects.filter(event=event).count(), 25)
+
+
+import asyncio
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.test import override_settings
+from . import locations
+from .availability import count_for_party, slot_availability
+from .streams import broadcaster
+
+@override_settings(RESERVATION_SERVICE_HOURS=('17:00', '21:00'), RESERVATION_SLOT_MINUTES=60)
+class AvailabilityStreamTests(TestCase):
+    def setUp(self):
+        self.small = Table.objects.create(name="Table 2", capacity=2)
+        self.large = Table.objects.create(name="Table 6", capacity=6)
+        self.day = timezone.now().date() + timezone.timedelta(days=3)
+
+    def book(self, table, hour):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(
+                table=table, customer_name="Kouassi", customer_email="k@example.com", customer_phone="1",
+                reservation_date=self.day, reservation_time=timezone.datetime(2000, 1, 1, hour).time(),
+                number_of_guests=4, status=Reservation.ReservationStatus.CONFIRMED
+            )
+
+    def test_slot_availability_applies_overlap_rules(self):
+        self.book(self.large, 19)
+        snapshot = slot_availability(self.day)
+        self.assertEqual(snapshot['17:00'], [2, 6])
+        self.assertEqual(snapshot['18:00'], [2])
+        self.assertEqual(snapshot['20:00'], [2])
+        self.assertEqual(snapshot['21:00'], [2, 6])
+        self.assertEqual(count_for_party(snapshot, 4), {'17:00': 1, '18:00': 0, '19:00': 0, '20:00': 0, '21:00': 1})
+
+    async def test_stream_sends_snapshot_then_deltas(self):
+        response = await self.async_client.get(
+            reverse('table-availability-stream'), {'date': self.day.isoformat(), 'guests': 4}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content
+        try:
+            first = (await asyncio.wait_for(events.__anext__(), timeout=5)).decode()
+            self.assertIn('event: snapshot', first)
+            self.assertIn('"19:00": 1', first)
+            self.assertEqual(len(broadcaster.hubs), 1)
+
+            await sync_to_async(self.book)(self.large, 19)
+            delta = (await asyncio.wait_for(events.__anext__(), timeout=5)).decode()
+            self.assertIn('event: delta', delta)
+            self.assertIn('"18:00": 0', delta)
+            self.assertNotIn('"17:00"', delta)
+        finally:
+            # Déconnexion du client : le serveur ASGI annule la tâche qui attend le prochain événement
+            pending = asyncio.ensure_future(events.__anext__())
+            await asyncio.sleep(0.05)
+            pending.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await pending
+        self.assertEqual(broadcaster.hubs, {})
+
+    @override_settings(AVAILABILITY_STREAM={'POLL_SECONDS': 0.05, 'DEBOUNCE_SECONDS': 0})
+    async def test_hub_survives_database_errors(self):
+        location = await sync_to_async(locations.default_location)()
+        calls = []
+
+        def flaky(day, location):
+            calls.append(day)
+            if len(calls) in (1, 3):
+                raise OperationalError("database is locked")
+            return slot_availability(day, location)
+
+        with mock.patch('api.streams.slot_availability', flaky):
+            hub, queue = await asyncio.wait_for(broadcaster.subscribe(location, self.day), timeout=5)
+            try:
+                self.assertEqual(count_for_party(hub.snapshot, 4)['19:00'], 1)
+                await sync_to_async(self.book)(self.large, 19)
+                # Le premier recalcul échoue, le suivant passe
+                while count_for_party(hub.snapshot, 4)['19:00'] != 0:
+                    await asyncio.wait_for(queue.get(), timeout=5)
+                self.assertFalse(hub.task.done())
+            finally:
+                broadcaster.unsubscribe(hub, queue)
+        self.assertEqual(broadcaster.hubs, {})
+
+    async def test_stopped_hub_is_dropped(self):
+        location = await sync_to_async(locations.default_location)()
+        hub, queue = await asyncio.wait_for(broadcaster.subscribe(location, self.day), timeout=5)
+        try:
+            hub.task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await hub.task
+            await asyncio.sleep(0)
+            self.assertEqual(broadcaster.hubs, {})
+            other, other_queue = await asyncio.wait_for(broadcaster.subscribe(location, self.day), timeout=5)
+            self.assertIsNot(other, hub)
+            broadcaster.unsubscribe(other, other_queue)
+        finally:
+            broadcaster.unsubscribe(hub, queue)
+        self.assertEqual(broadcaster.hubs, {})
+
+    async def test_listener_leaving_before_first_snapshot_unsubscribes(self):
+        location = await sync_to_async(locations.default_location)()
+        with mock.patch('api.streams.slot_availability', side_effect=OperationalError("database is locked")):
+            pending = asyncio.ensure_future(broadcaster.subscribe(location, self.day))
+            await asyncio.sleep(0.05)
+            self.assertEqual(len(broadcaster.hubs), 1)
+            hub = broadcaster.hubs[(location.pk, self.day)]
+            pending.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await pending
+        self.assertEqual(broadcaster.hubs, {})
+        self.assertEqual(hub.listeners, set())
+        await asyncio.sleep(0)
+        self.assertTrue(hub.task.done())
+
+    async def test_stream_requires_date(self):
+        response = await self.async_client.get(reverse('table-availability-stream'))
+        self.assertEqual(response.status_code, 400)
+
+
+from . import search
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Plats", order=1)
+        self.attieke = Dish.objects.create(
+            name="Attiéké poisson", description="Semoule de manioc et poisson braisé.", price="8.00", category=self.category
+        )
+        self.alloco = Dish.objects.create(
+            name="Alloco", description="Bananes plantain frites, servies avec attiéké en option.", price="4.00", category=self.category
+        )
+        self.event = Event.objects.create(
+            title="Nuit de l'alloco", description="Dégustation.", event_date=timezone.now().date(),
+            event_time=timezone.now().time(), is_published=True
+        )
+
+    def test_search_is_accent_insensitive_and_ranks_titles_first(self):
+        response = self.client.get(reverse('search'), {'q': 'attieke'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['item']['id'] for r in response.data], [self.attieke.id, self.alloco.id])
+
+    def test_search_matches_prefixes_across_types(self):
+        response = self.client.get(reverse('search'), {'q': 'allo'})
+        self.assertEqual({(r['type'], r['item']['id']) for r in response.data}, {('dish', self.alloco.id), ('event', self.event.id)})
+        response = self.client.get(reverse('search'), {'q': 'allo', 'type': 'event'})
+        self.assertEqual([r['type'] for r in response.data], ['event'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.alloco.is_available = False
+        self.alloco.save()
+        response = self.client.get(reverse('search'), {'q': 'alloco', 'type': 'dish'})
+        self.assertEqual(response.data, [])
+
+        self.attieke.name = "Garba"
+        self.attieke.save()
+        self.assertEqual(search.search('garba'), [('dish', self.attieke.id)])
+        self.attieke.delete()
+        self.assertEqual(search.search('garba'), [])
+
+    def test_search_operators_in_input_are_neutralised(self):
+        self.assertEqual(search.match_expression('"alloco" OR -* NEAR('), '"alloco"* "OR"* "NEAR"*')
+        response = self.client.get(reverse('search'), {'q': '***'})
+        self.assertEqual(response.data, [])
+
+    def test_admin_search_uses_index(self):
+        admin_user = User.objects.create_superuser(username='admin', email='admin@example.com', password='password123')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:api_dish_changelist'), {'q': 'manioc'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.attieke])
+
+
+import json
+import re
+import tempfile
+from . import metrics
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='ops', password='password123', is_staff=True)
+
+    def test_requests_are_recorded_per_viewset_action(self):
+        self.client.get(f"{reverse('table-availability')}?date=2024-01-01&time=19:00&guests=2")
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('http_requests_total{endpoint="table-availability",method="GET",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="table-availability",le="+Inf"}', body)
+        self.assertIn('db_queries_per_request_count{endpoint="table-availability"}', body)
+
+    def test_reservation_create_records_email_timings(self):
+        table = Table.objects.create(name="T1", capacity=2)
+        self.client.post(reverse('reservation-list'), {
+            'customer_name': 'A', 'customer_email': 'a@example.com', 'customer_phone': '1',
+            'reservation_date': '2030-01-01', 'reservation_time': '19:00', 'number_of_guests': 2, 'table': table.id,
+        }, format='json')
+        body = metrics.render()
+        self.assertIn('http_requests_total{endpoint="reservation-create",method="POST",status="201"}', body)
+        self.assertIn('email_send_duration_seconds_count{kind="reservation-customer"}', body)
+
+    def test_metrics_endpoint_is_protected(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        with self.settings(METRICS={'TOKEN': 's3cret'}):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['Content-Type'].startswith('text/plain'))
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_of_other_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS={'DIR': directory}):
+            metrics.inc('email_send_failures_total', kind='aggregation-test')
+            with open(f"{directory}/metrics-999999.json", 'w') as f:
+                json.dump({'counters': [['email_send_failures_total', [['kind', 'aggregation-test']], 41]], 'histograms': []}, f)
+            self.assertIn('email_send_failures_total{kind="aggregation-test"} 42', metrics.render())
+
+
+from io import StringIO
+from django.core.management import CommandError, call_command
+from . import profiling
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings_override = self.settings(PROFILING={'DIR': self.directory.name, 'MAX_DUMPS': 3, 'INTERVAL': 0.0005})
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.url = f"{reverse('table-availability')}?date=2024-01-01&time=19:00&guests=2"
+        Table.objects.create(name="T1", capacity=2)
+
+    def test_requests_without_trigger_are_not_profiled(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Profile-Id', response)
+        response = self.client.get(self.url, HTTP_X_PROFILE='forged:token')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.list_dumps(), [])
+
+    def test_signed_header_stores_profile_with_sql(self):
+        response = self.client.get(self.url, HTTP_X_PROFILE=profiling.make_token())
+        dump = profiling.load_dump(response['X-Profile-Id'])
+        self.assertEqual(dump['path'], self.url)
+        self.assertEqual(dump['status'], 200)
+        self.assertGreater(dump['sql_count'], 0)
+        self.assertIn('api_table', dump['sql'][0]['sql'])
+
+        output = StringIO()
+        call_command('profiles', 'list', stdout=output)
+        self.assertIn(response['X-Profile-Id'], output.getvalue())
+        output = StringIO()
+        call_command('profiles', 'export', response['X-Profile-Id'], stdout=output)
+        for line in output.getvalue().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(count.isdigit())
+
+    def test_ring_buffer_keeps_newest_dumps(self):
+        ids = [self.client.get(self.url, HTTP_X_PROFILE=profiling.make_token())['X-Profile-Id'] for _ in range(5)]
+        self.assertEqual([path.stem for path in profiling.list_dumps()], ids[:1:-1])
+
+    def test_staff_sampling(self):
+        staff = User.objects.create_user(username='ops', password='password123', is_staff=True)
+        self.client.force_login(staff)
+        with self.settings(PROFILING={'DIR': self.directory.name, 'SAMPLE_RATE': 1.0}):
+            self.assertIn('X-Profile-Id', self.client.get(self.url))
+
+
+import gzip
+import shutil
+import subprocess
+import unittest
+from pathlib import Path
+from . import assets, frontend
+
+class FrontendBuildTests(TestCase):
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        category = Category.objects.create(name="Grillades", order=1)
+        Dish.objects.create(name="Poulet braisé", description="Au feu de bois.", price="12.00", category=category, is_featured=True)
+        Dish.objects.create(name="Plat retiré", description="Plus servi.", price="5.00", category=category, is_available=False)
+
+    def test_pages_embed_catalog_and_hashed_assets(self):
+        call_command('build_frontend', output=self.output.name, stdout=StringIO())
+        menu = (Path(self.output.name) / 'menu.html').read_text()
+        self.assertIn('Poulet braisé', menu)
+        self.assertNotIn('Plat retiré', menu)
+        self.assertIn('<script id="catalogData" type="application/json">', menu)
+        self.assertNotIn('catalog:start', menu)
+        self.assertNotIn('"static/js/main.js"', menu)
+        hashed_js = re.search(r'src="(static/js/main\.[0-9a-f]{12}\.js)"', menu).group(1)
+        self.assertTrue((Path(self.output.name) / hashed_js).exists())
+        self.assertIn('Poulet braisé', (Path(self.output.name) / 'index.html').read_text())
+
+    def test_rebuild_only_rewrites_changed_pages(self):
+        first = frontend.build(output_dir=self.output.name)
+        self.assertIn('contact.html', first)
+        self.assertEqual(frontend.build(output_dir=self.output.name), [])
+
+        Event.objects.create(
+            title="Brunch", description="Dimanche.", event_date=timezone.localdate() + timezone.timedelta(days=2),
+            event_time=timezone.now().time(), is_published=True
+        )
+        self.assertEqual(sorted(frontend.build(output_dir=self.output.name)), ['events.html', 'index.html'])
+
+    def test_assets_are_minified_and_precompressed(self):
+        frontend.build(output_dir=self.output.name)
+        menu = (Path(self.output.name) / 'menu.html').read_text()
+        hashed_js = re.search(r'src="(static/js/main\.[0-9a-f]{12}\.js)"', menu).group(1)
+        script = (Path(self.output.name) / hashed_js).read_bytes()
+        self.assertNotIn(b'// Catalog data layer', script)
+        self.assertLess(len(script), (Path(frontend.build_setting('SOURCE_DIR')) / 'static/js/main.js').stat().st_size)
+        self.assertEqual(gzip.decompress((Path(self.output.name) / f"{hashed_js}.gz").read_bytes()), script)
+
+    def test_built_assets_are_served_immutable(self):
+        with override_settings(FRONTEND_BUILD={'OUTPUT_DIR': self.output.name}):
+            frontend.build()
+            hashed_js = re.search(r'src="static/(js/main\.[0-9a-f]{12}\.js)"', (Path(self.output.name) / 'menu.html').read_text()).group(1)
+            response = self.client.get(f'/static/{hashed_js}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/javascript')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertNotIn('Content-Encoding', self.client.get(f'/static/{hashed_js}'))
+            self.assertEqual(self.client.get('/static/../menu.html').status_code, 404)
+            # collectstatic trouve les assets construits
+            self.assertTrue(frontend.BuildFinder().find(hashed_js).endswith(hashed_js))
+
+    def test_minifiers_keep_strings_and_regexes(self):
+        self.assertEqual(assets.minify_css('a  >  b { content : "x  ;  y" ; } /* c */'), 'a>b{content : "x  ;  y"}')
+        self.assertEqual(
+            assets.minify_js("var a = b / c; // d\n  var r = /x\\/[/]y/g;\n  let t = `a  ${ {k: 1}.k }  b`;"),
+            "var a=b/c;\nvar r=/x\\/[/]y/g;\nlet t=`a  ${ {k: 1}.k }  b`;"
+        )
+        # Après un mot-clé, '/' ouvre une expression régulière ; après un identifiant, une division
+        self.assertEqual(assets.minify_js('return /a  b/.test(x)'), 'return/a  b/.test(x)')
+        self.assertEqual(assets.minify_js('if (typeof /a  b/ === t) x = y.in / 2 / z'), 'if(typeof/a  b/===t)x=y.in/2/z')
+        # Après la condition d'un if, ')' précède une expression régulière ; après un ++ postfixe, une division
+        self.assertEqual(assets.minify_js('if (f(a)) /x  y/.test(s)'), 'if(f(a))/x  y/.test(s)')
+        self.assertEqual(assets.minify_js('n = a++ / 2 / 3 + f(b) / 4 / c[0] / 5'), 'n=a++/2/3+f(b)/4/c[0]/5')
+
+    @unittest.skipIf(shutil.which('node') is None, "Node.js is not installed")
+    def test_minified_main_js_is_valid(self):
+        source = Path(frontend.build_setting('SOURCE_DIR')) / 'static/js/main.js'
+        with tempfile.TemporaryDirectory() as directory:
+            minified = Path(directory) / 'main.js'
+            minified.write_text(assets.minify_js(source.read_text()))
+            result = subprocess.run(['node', '--check', str(minified)], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class ConditionalRequestTests(APITestCase):
+    def test_catalog_revalidation_returns_not_modified(self):
+        category = Category.objects.create(name="Desserts", order=4)
+        response = self.client.get(reverse('category-list'))
+        self.assertIn('ETag', response)
+        response = self.client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        category.name = "Douceurs"
+        category.save()
+        response = self.client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+import unittest
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+@override_settings(RESERVATION_SERVICE_HOURS=('18:00', '22:00'), RESERVATION_SLOT_MINUTES=60)
+class ServiceSimulationTests(TestCase):
+    def test_allocation_follows_availability_overlap_rules(self):
+        from .simulation import DemandProfile, simulate
+        demand = DemandProfile(3, {2: 1.0}, np.full(5, 0.2), 0.0)
+        # Une seule table : 18h et 20h s'enchaînent (2h), 19h chevauche les deux
+        samples = (np.array([3]), np.array([[2, 2, 2]]), np.array([[0, 2, 1]]), np.zeros((1, 3), dtype=bool))
+        result = simulate([2], demand, samples=samples)
+        self.assertEqual(result['booked'], 2)
+        self.assertEqual(result['declined'], 1)
+        self.assertEqual(result['seated_covers'], 4)
+
+    def test_overbooking_trades_declines_for_walks(self):
+        from .simulation import DemandProfile, simulate
+        demand = DemandProfile(2, {4: 1.0}, np.array([1.0, 0, 0, 0, 0]), 0.0)
+        samples = (np.array([2]), np.array([[4, 4]]), np.array([[0, 0]]), np.array([[False, False]]))
+        strict = simulate([4], demand, samples=samples)
+        overbooked = simulate([4], demand, overbooking=1.0, samples=samples)
+        self.assertEqual((strict['declined'], strict['walked']), (1, 0))
+        self.assertEqual((overbooked['declined'], overbooked['walked']), (0, 1))
+
+    def test_command_reports_each_configuration(self):
+        output = StringIO()
+        call_command('simulate_service', nights=200, tables=['2:4,4:4'], overbook=[0, 0.2], seed=3, stdout=output)
+        lines = [line for line in output.getvalue().splitlines() if line.startswith('2:4,4:4')]
+        self.assertEqual(len(lines), 2)
+
+    def test_configuration_without_tables_is_rejected(self):
+        for tables in ('2:0', '0:4', '2:-1'):
+            with self.assertRaises(CommandError):
+                call_command('simulate_service', nights=10, tables=[tables], stdout=StringIO())
+        from .simulation import DemandProfile, simulate
+        with self.assertRaises(ValueError):
+            simulate([], DemandProfile(2, {2: 1.0}, np.array([1.0, 0, 0, 0, 0]), 0.0), nights=10)
+
+
+from .models import IdempotencyKey
+
+@override_settings(IDEMPOTENCY={'WAIT_SECONDS': 0.2, 'POLL_SECONDS': 0.05})
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('reservation-list')
+        self.data = {
+            'customer_name': 'Mobile', 'customer_email': 'mobile@example.com', 'customer_phone': '0102030405',
+            'reservation_date': '2030-05-01', 'reservation_time': '20:00', 'number_of_guests': 2,
+        }
+
+    def test_retry_replays_first_response_without_side_effects(self):
+        first = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        second = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        response = self.client.post(self.url, dict(self.data, number_of_guests=4), format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_request_in_flight_gets_conflict(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+        response = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_expired_key_is_processed_again(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        response = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_invalid_request_releases_key(self):
+        url = reverse('contactmessage-list')
+        response = self.client.post(url, {'name': 'X'}, format='json', HTTP_IDEMPOTENCY_KEY='contact-1')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        data = {'name': 'X', 'email': 'x@example.com', 'subject': 'S', 'message': 'M'}
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='contact-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+from datetime import timedelta
+from .models import contact_fingerprint
+
+class ContactDuplicateTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('contactmessage-list')
+        self.data = {'name': 'Awa', 'email': 'awa@example.com', 'subject': 'Privatisation', 'message': 'Bonjour, la salle est-elle libre samedi ?'}
+
+    def test_fingerprint_ignores_case_accents_and_spacing(self):
+        self.assertEqual(
+            contact_fingerprint('Awa@Example.com ', 'Privatisation!', 'Bonjour,  la salle est-elle   libre samedi ?'),
+            contact_fingerprint('awa@example.com', 'privatisation', 'bonjour la salle est elle libre samedi'),
+        )
+        self.assertEqual(contact_fingerprint('a@b.c', 'Réservé', 'x'), contact_fingerprint('a@b.c', 'reserve', 'x'))
+        self.assertNotEqual(contact_fingerprint('a@b.c', 'S', 'x'), contact_fingerprint('other@b.c', 'S', 'x'))
+
+    def test_duplicate_is_merged_into_original(self):
+        first = self.client.post(self.url, self.data, format='json')
+        second = self.client.post(self.url, dict(self.data, message=self.data['message'].upper()), format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data['id'], first.data['id'])
+        message = ContactMessage.objects.get()
+        self.assertEqual(message.hit_count, 2)
+        self.assertIsNotNone(message.last_received_at)
+        self.assertEqual(len(mail.outbox), 1) # L'admin n'est notifié qu'une fois
+
+    def test_old_duplicate_creates_new_message(self):
+        self.client.post(self.url, self.data, format='json')
+        ContactMessage.objects.update(created_at=timezone.now() - timedelta(hours=25))
+        self.client.post(self.url, self.data, format='json')
+        self.assertEqual(ContactMessage.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_duplicate_lookup_uses_fingerprint_index(self):
+        message = ContactMessage.objects.create(**self.data)
+        plan = str(ContactMessage.objects.filter(
+            fingerprint=message.fingerprint, created_at__gte=timezone.now() - timedelta(hours=1)
+        ).order_by('-created_at').explain())
+        self.assertIn('contact_fingerprint_idx', plan)
+
+
+from django.core.cache import caches
+from . import response_cache
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+        self.category = Category.objects.create(name="Grillades")
+        self.dish = Dish.objects.create(name="Poulet braisé", description="Braisé", price="4500.00", category=self.category)
+
+    def test_second_request_is_served_from_cache(self):
+        url = reverse('dish-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+
+    def test_query_parameter_order_does_not_matter(self):
+        url = reverse('dish-list')
+        self.client.get(url, {'category_id': self.category.pk, 'format': 'json'})
+        response = self.client.get(f"{url}?format=json&category_id={self.category.pk}")
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url, {'category_id': 0})['X-Cache'], 'MISS')
+
+    def test_save_evicts_only_affected_tag(self):
+        dishes_url, categories_url = reverse('dish-list'), reverse('category-list')
+        self.client.get(dishes_url)
+        self.client.get(categories_url)
+        self.dish.name = "Poulet DG"
+        self.dish.save()
+        response = self.client.get(dishes_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['name'], "Poulet DG")
+        self.assertEqual(self.client.get(categories_url)['X-Cache'], 'HIT')
+
+    def test_booking_refreshes_cached_seats(self):
+        event = Event.objects.create(
+            title="Concert", description="Live", event_date=timezone.localdate() + timedelta(days=3),
+            event_time="20:00", capacity=10, is_published=True
+        )
+        url = reverse('event-detail', args=[event.pk])
+        self.assertEqual(self.client.get(url).json()['seats_remaining'], 10)
+        EventBooking.objects.book(event, 'key-1', 3, customer_name="A", customer_email="a@example.com")
+        self.assertEqual(self.client.get(url).json()['seats_remaining'], 7)
+
+    def test_shared_tier_refills_local_tier(self):
+        url = reverse('dish-featured')
+        self.client.get(url)
+        caches['local'].clear()
+        self.client.get(url)
+        self.client.get(url)
+        ratios = response_cache.hit_ratios()
+        self.assertGreaterEqual(ratios['responses-shared'][0], 1)
+        self.assertGreaterEqual(ratios['responses-local'][0], 1)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_disabled_cache_is_bypassed(self):
+        self.client.get(reverse('dish-list'))
+        self.assertFalse(self.client.get(reverse('dish-list')).has_header('X-Cache'))
+
+
+class EventWindowAndCalendarTests(APITestCase):
+    def setUp(self):
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+        today = timezone.localdate()
+        self.past = Event.objects.create(title="Soirée passée", description="Fini", event_date=today - timedelta(days=10), event_time="20:00", is_published=True)
+        self.soon = Event.objects.create(title="Concert; live, acoustique", description="Ligne 1\nLigne 2", event_date=today + timedelta(days=2), event_time="20:00", is_published=True)
+        self.later = Event.objects.create(title="Gala", description="Plus tard", event_date=today + timedelta(days=60), event_time="19:00", is_published=True)
+
+    def titles(self, response):
+        return [event['title'] for event in response.json()]
+
+    def test_list_defaults_to_upcoming_events(self):
+        response = self.client.get(reverse('event-list'))
+        self.assertEqual(self.titles(response), [self.soon.title, self.later.title])
+        # Le détail d'un événement passé reste accessible
+        self.assertEqual(self.client.get(reverse('event-detail', args=[self.past.pk])).status_code, status.HTTP_200_OK)
+
+    def test_list_window(self):
+        today = timezone.localdate()
+        response = self.client.get(reverse('event-list'), {
+            'from': (today - timedelta(days=30)).isoformat(), 'to': (today + timedelta(days=30)).isoformat(),
+        })
+        self.assertEqual(self.titles(response), [self.past.title, self.soon.title])
+        self.assertEqual(self.client.get(reverse('event-list'), {'from': 'demain'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_window_query_uses_index(self):
+        plan = str(Event.objects.filter(is_published=True, event_date__gte=timezone.localdate()).order_by('event_date', 'event_time').explain())
+        self.assertIn('event_published_date_idx', plan)
+
+    def test_calendar_feed(self):
+        response = self.client.get(reverse('events-ics'))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Concert\; live\\, acoustique\r\n', body)
+        self.assertIn('DESCRIPTION:Ligne 1\\nLigne 2\r\n', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_calendar_feed_is_cached_until_event_change(self):
+        first = self.client.get(reverse('events-ics'))
+        body = b''.join(first.streaming_content)
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('events-ics'))
+        self.assertEqual(second.content, body)
+        not_modified = self.client.get(reverse('events-ics'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.later.title = "Grand gala"
+        self.later.save()
+        third = self.client.get(reverse('events-ics'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, status.HTTP_200_OK)
+        self.assertIn(b'SUMMARY:Grand gala', b''.join(third.streaming_content))
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_cached_calendar_feed_is_per_host(self):
+        first = self.client.get(reverse('events-ics'), HTTP_HOST='a.example.com')
+        self.assertIn(b'@a.example.com', b''.join(first.streaming_content))
+        second = self.client.get(reverse('events-ics'), HTTP_HOST='b.example.com')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        body = b''.join(second.streaming_content)
+        self.assertIn(b'UID:event-', body)
+        self.assertNotIn(b'a.example.com', body)
+
+    def test_long_lines_are_folded_on_character_boundaries(self):
+        from .ical import fold
+        folded = fold('DESCRIPTION:' + 'é' * 100)
+        lines = folded.rstrip('\r\n').split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)), 'DESCRIPTION:' + 'é' * 100)
+
+
+from unittest import mock
+from django.core.mail import EmailMultiAlternatives
+from . import reminders
+
+class ReservationReminderTests(TestCase):
+    def setUp(self):
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+        self.table = Table.objects.create(name="T-rappel", capacity=4)
+        for index in range(5):
+            Reservation.objects.create(
+                customer_name=f"Client {index}", customer_email=f"client{index}@example.com", customer_phone="0102030405",
+                reservation_date=self.tomorrow, reservation_time="20:00", number_of_guests=2,
+                status=Reservation.ReservationStatus.CONFIRMED, table=self.table if index == 0 else None,
+            )
+        Reservation.objects.create(
+            customer_name="En attente", customer_email="pending@example.com", customer_phone="0102030405",
+            reservation_date=self.tomorrow, reservation_time="20:00", number_of_guests=2,
+        )
+        Reservation.objects.create(
+            customer_name="Après-demain", customer_email="later@example.com", customer_phone="0102030405",
+            reservation_date=self.tomorrow + timedelta(days=1), reservation_time="20:00", number_of_guests=2,
+            status=Reservation.ReservationStatus.CONFIRMED,
+        )
+
+    def test_sends_tomorrows_confirmed_reminders_once(self):
+        out = StringIO()
+        call_command('send_reminders', '--batch-size', '2', stdout=out)
+        self.assertIn("5 reminder(s) sent", out.getvalue())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f"client{index}@example.com" for index in range(5)])
+        message = next(message for message in mail.outbox if message.to == ["client0@example.com"])
+        self.assertIn("Table : T-rappel", message.body)
+        self.assertEqual(message.alternatives[0][1], 'text/html')
+        self.assertFalse(reminders.due_reminders(self.tomorrow).exists())
+
+        call_command('send_reminders', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_run_resumes_after_interruption(self):
+        original_send = EmailMultiAlternatives.send
+        calls = []
+
+        def send_then_crash(message, *args, **kwargs):
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            calls.append(message)
+            return original_send(message, *args, **kwargs)
+
+        with mock.patch.object(EmailMultiAlternatives, 'send', send_then_crash):
+            with self.assertRaises(KeyboardInterrupt):
+                reminders.send_reminders(self.tomorrow, batch_size=10)
+        self.assertEqual(Reservation.objects.filter(reminder_sent_at__isnull=False).count(), 3)
+
+        self.assertEqual(reminders.send_reminders(self.tomorrow), (2, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 5)
+
+    def test_failed_reminder_is_left_for_next_run(self):
+        original_send = EmailMultiAlternatives.send
+
+        def flaky_send(message, *args, **kwargs):
+            if message.to == ["client1@example.com"]:
+                raise OSError("SMTP refused")
+            return original_send(message, *args, **kwargs)
+
+        with mock.patch.object(EmailMultiAlternatives, 'send', flaky_send):
+            self.assertEqual(reminders.send_reminders(self.tomorrow), (4, 1))
+        self.assertEqual(list(reminders.due_reminders(self.tomorrow).values_list('customer_email', flat=True)), ["client1@example.com"])
+
+    def test_wording_follows_the_reservation_date(self):
+        reminders.send_reminders(self.tomorrow)
+        self.assertIn("New Treichville demain, le", mail.outbox[0].body)
+        self.assertIn("À demain,", mail.outbox[0].body)
+        later = self.tomorrow + timedelta(days=1)
+        self.assertEqual(reminders.send_reminders(later), (1, 0))
+        body = mail.outbox[-1].body
+        self.assertNotIn("demain", body.replace("Après-demain", ""))
+        self.assertIn("À bientôt,", body)
+        self.assertEqual(reminders.relative_wording(timezone.localdate()), ("aujourd'hui", "À tout à l'heure"))
+
+    def test_due_reminders_use_partial_index(self):
+        plan = str(reminders.due_reminders(self.tomorrow).explain())
+        self.assertIn('reservation_reminder_due_idx', plan)
+
+
+from django.db import router
+from . import locations
+from .models import Location
+
+class LocationTests(APITestCase):
+    def setUp(self):
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+        self.main = locations.default_location()
+        self.cocody = Location.objects.create(name="New Treichville Cocody", slug='cocody')
+        for location, dish_name in ((self.main, "Garba"), (self.cocody, "Kedjenou")):
+            category = Category.objects.create(name="Plats", restaurant=location)
+            Dish.objects.create(name=dish_name, description="Plat", price="3000.00", category=category, restaurant=location)
+            Table.objects.create(name="T1", capacity=4, restaurant=location)
+
+    def dish_names(self, response):
+        return [dish['name'] for dish in response.json()]
+
+    def test_endpoints_are_scoped_to_location(self):
+        self.assertEqual(self.dish_names(self.client.get(reverse('dish-list'))), ["Garba"])
+        self.assertEqual(self.dish_names(self.client.get(reverse('dish-list'), {'location': 'cocody'})), ["Kedjenou"])
+        self.assertEqual(self.client.get(reverse('dish-list'), {'location': 'abidjan'}).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('search'), {'q': 'kedj', 'location': 'cocody'})
+        self.assertEqual([hit['item']['name'] for hit in response.json()], ["Kedjenou"])
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'kedj'}).json(), [])
+
+    def test_availability_and_reservations_per_location(self):
+        url = reverse('table-availability')
+        params = {'date': '2030-06-01', 'time': '20:00', 'guests': 2, 'location': 'cocody'}
+        self.assertEqual(len(self.client.get(url, params).json()), 1)
+
+        data = {
+            'customer_name': 'Koffi', 'customer_email': 'koffi@example.com', 'customer_phone': '0102030405',
+            'reservation_date': '2030-06-01', 'reservation_time': '20:00', 'number_of_guests': 2,
+            'table': Table.objects.get(restaurant=self.cocody).pk,
+        }
+        response = self.client.post(f"{reverse('reservation-list')}?location=cocody", data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.get().restaurant, self.cocody)
+        self.assertEqual(self.client.get(url, params).json(), [])
+        # Même nom de table, autre restaurant : toujours libre
+        self.assertEqual(len(self.client.get(url, dict(params, location='main')).json()), 1)
+
+    def test_reservation_table_must_belong_to_location(self):
+        cocody_table = Table.objects.get(restaurant=self.cocody)
+        data = {
+            'customer_name': 'Koffi', 'customer_email': 'koffi@example.com', 'customer_phone': '0102030405',
+            'reservation_date': '2030-06-01', 'reservation_time': '20:00', 'number_of_guests': 2,
+            'table': cocody_table.pk,
+        }
+        response = self.client.post(f"{reverse('reservation-list')}?location=main", data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('table', response.json())
+        self.assertFalse(Reservation.objects.exists())
+        self.assertFalse(TableSlot.objects.filter(table=cocody_table, reservation__isnull=False).exists())
+
+        response = self.client.post(f"{reverse('reservation-list')}?location=cocody", dict(data, number_of_guests=cocody_table.capacity + 1), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(f"{reverse('reservation-list')}?location=cocody", data, format='json').status_code, status.HTTP_201_CREATED)
+
+    def test_idempotency_key_reused_at_another_location_is_rejected(self):
+        data = {
+            'customer_name': 'Koffi', 'customer_email': 'koffi@example.com', 'customer_phone': '0102030405',
+            'reservation_date': '2030-06-01', 'reservation_time': '20:00', 'number_of_guests': 2,
+        }
+        url = reverse('reservation-list')
+        first = self.client.post(f"{url}?location=cocody", data, format='json', HTTP_IDEMPOTENCY_KEY='loc-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(f"{url}?location=main", data, format='json', HTTP_IDEMPOTENCY_KEY='loc-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(Reservation.objects.filter(restaurant=self.main).exists())
+
+    def test_cache_invalidation_is_per_location(self):
+        url = reverse('dish-list')
+        self.client.get(url)
+        self.client.get(url, {'location': 'cocody'})
+        Dish.objects.filter(restaurant=self.cocody).get().save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url, {'location': 'cocody'})['X-Cache'], 'MISS')
+
+    def test_location_resolution_costs_no_query(self):
+        locations.by_slug('cocody')
+        with self.assertNumQueries(0):
+            self.assertEqual(locations.by_slug('cocody'), self.cocody)
+
+    def test_hot_queries_lead_on_location_indexes(self):
+        from .availability import active_tables
+        self.assertIn('table_active_capacity_idx', str(active_tables(self.cocody).filter(capacity__gte=2).explain()))
+        category = Category.objects.get(restaurant=self.cocody)
+        self.assertIn('dish_available_idx', str(Dish.objects.filter(restaurant=self.cocody, is_available=True, category=category).explain()))
+        self.assertIn('reservation_date_idx', str(locations.reservations(self.cocody).filter(
+            reservation_date='2030-06-01', status__in=['confirmed', 'pending']).explain()))
+
+    @override_settings(LOCATION_DATABASES={'cocody': 'cocody'})
+    def test_reservations_are_routed_to_location_database(self):
+        reservation = Reservation(restaurant=self.cocody, customer_name="A", reservation_date='2030-06-01', reservation_time='20:00', number_of_guests=2)
+        self.assertEqual(router.db_for_write(Reservation, instance=reservation), 'cocody')
+        self.assertEqual(router.db_for_write(Reservation, instance=Reservation(restaurant=self.main)), 'default')
+        self.assertEqual(router.db_for_read(Table, instance=reservation), 'default')
+        self.assertEqual(locations.reservations(self.cocody).db, 'cocody')
+        self.assertEqual(locations.reservation_databases(), ['cocody', 'default'])
+
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import CachedTokenAuthentication
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.admin_user = User.objects.create_superuser(username='pos', email='pos@example.com', password='password123')
+        self.token = Token.objects.create(user=self.admin_user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_known_token_is_resolved_without_queries(self):
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual((user, token), (self.admin_user, self.token))
+        self.assertTrue(user.is_superuser)
+        self.assertEqual(self.client.get(reverse('reservation-list')).status_code, status.HTTP_200_OK)
+
+    def test_cache_holds_no_password_hash(self):
+        from .authentication import cache_key
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        entry = caches['default'].get(cache_key(self.token.key))
+        self.assertNotIn(self.admin_user.password, repr(entry))
+        self.assertNotIn(self.token.key, repr(entry))
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(user.email, 'pos@example.com') # Champ non mis en cache : chargé à la demande
+
+    def test_deleted_token_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('reservation-list')).status_code, status.HTTP_200_OK)
+        key = self.token.key
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            CachedTokenAuthentication().authenticate_credentials(key)
+        self.assertEqual(self.client.get(reverse('reservation-list')).status_code, status.HTTP_403_FORBIDDEN) # 403 : SessionAuthentication est la première classe
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('reservation-list')).status_code, status.HTTP_200_OK)
+        self.admin_user.is_active = False
+        self.admin_user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(self.client.get(reverse('reservation-list')).status_code, status.HTTP_403_FORBIDDEN) # 403 : SessionAuthentication est la première classe
+
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+class MenuImportTests(APITestCase):
+    def setUp(self):
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+        self.admin_user = User.objects.create_superuser(username='chef', email='chef@example.com', password='password123')
+        self.client.force_authenticate(user=self.admin_user)
+        self.location = locations.default_location()
+        self.category = Category.objects.create(name="Grillades", order=1)
+        self.dish = Dish.objects.create(name="Poulet braisé", description="Braisé", price="4500.00", category=self.category)
+
+    def test_json_import_upserts_by_name(self):
+        self.client.get(reverse('dish-list'))
+        data = {
+            'categories': [{'name': "Grillades", 'order': 2}, {'name': "Boissons", 'order': 5}],
+            'dishes': [
+                {'name': "Poulet braisé", 'price': "5000.00"},
+                {'name': "Bissap", 'category': "Boissons", 'price': "1000.00", 'description': "Hibiscus"},
+            ],
+        }
+        response = self.client.post(reverse('menu-import'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['categories'], {'created': 1, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(response.data['dishes'], {'created': 1, 'updated': 1, 'unchanged': 0, 'disabled': 0})
+        self.dish.refresh_from_db()
+        self.assertEqual(str(self.dish.price), "5000.00")
+        self.assertEqual(Dish.objects.get(name="Bissap").category.name, "Boissons")
+        # Une seule invalidation à la fin : la liste en cache est renouvelée
+        response = self.client.get(reverse('dish-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+        self.assertEqual([hit['item']['name'] for hit in self.client.get(reverse('search'), {'q': 'bissap'}).json()], ["Bissap"])
+
+    def test_invalid_row_rejects_whole_file(self):
+        data = {'dishes': [
+            {'name': "Poulet braisé", 'price': "5000.00"},
+            {'name': "Alloco", 'category': "Accompagnements"},
+        ]}
+        response = self.client.post(reverse('menu-import'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('category', response.json()['dishes']['1'])
+        self.dish.refresh_from_db()
+        self.assertEqual(str(self.dish.price), "4500.00")
+
+    def test_csv_replace_runs_in_constant_queries(self):
+        Dish.objects.create(name="Ancien plat", description="Retiré", price="1000.00", category=self.category)
+        lines = ["name,category,price,category_order"] + [f"Plat {i},Saison,{1000 + i}.00,4" for i in range(150)]
+        upload = SimpleUploadedFile('carte.csv', "\n".join(lines).encode(), content_type='text/csv')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f"{reverse('menu-import')}?replace=1", {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(queries), 30)
+        self.assertEqual(response.data['dishes']['created'], 150)
+        self.assertEqual(response.data['dishes']['disabled'], 2)
+        self.assertEqual(Category.objects.get(name="Saison").order, 4)
+        self.assertFalse(Dish.objects.get(name="Ancien plat").is_available)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(reverse('menu-import'), {'dishes': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_import_view(self):
+        self.client.force_login(self.admin_user)
+        upload = SimpleUploadedFile('carte.json', b'{"dishes": [{"name": "Poulet brais\\u00e9", "price": "4800.00"}]}')
+        response = self.client.post(reverse('admin:api_dish_import'), {'location': self.location.pk, 'file': upload})
+        self.assertRedirects(response, reverse('admin:api_dish_changelist'))
+        self.dish.refresh_from_db()
+        self.assertEqual(str(self.dish.price), "4800.00")
+
+
+from . import sync
+from .models import CatalogTombstone
+
+@override_settings(CATALOG_SYNC={'PAGE_SIZE': 500, 'SETTLE_SECONDS': 0, 'TOMBSTONE_DAYS': 30})
+class CatalogChangesTests(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Grillades", order=1)
+        self.dish = Dish.objects.create(name="Poulet braisé", description="Braisé", price="4500.00", category=self.category)
+        self.event = Event.objects.create(
+            title="Concert", description="Live", event_date=timezone.localdate() + timedelta(days=3),
+            event_time="20:00", is_published=True
+        )
+
+    def sync(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get(reverse('catalog-changes'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_full_then_incremental_sync(self):
+        full = self.sync()
+        self.assertEqual([(c['type'], c['id']) for c in full['changes']], [
+            ('category', self.category.pk), ('dish', self.dish.pk), ('event', self.event.pk),
+        ])
+        self.assertFalse(full['has_more'])
+        self.assertEqual(self.sync(full['cursor'])['changes'], [])
+
+        self.dish.price = "5000.00"
+        self.dish.save()
+        delta = self.sync(full['cursor'])
+        self.assertEqual(len(delta['changes']), 1)
+        self.assertEqual(delta['changes'][0]['item']['price'], "5000.00")
+
+    def test_deletions_and_hidden_items_are_tombstones(self):
+        cursor = self.sync()['cursor']
+        self.event.is_published = False
+        self.event.save()
+        dish_pk = self.dish.pk
+        self.dish.delete()
+        changes = self.sync(cursor)['changes']
+        self.assertIn({'type': 'event', 'id': self.event.pk, 'deleted': True, 'item': None}, changes)
+        self.assertIn({'type': 'dish', 'id': dish_pk, 'deleted': True, 'item': None}, changes)
+
+    def test_pages_continue_at_cursor(self):
+        for i in range(4):
+            Dish.objects.create(name=f"Plat {i}", description="Plat", price="1000.00", category=self.category)
+        seen, cursor, has_more = [], None, True
+        while has_more:
+            page = self.sync(cursor, limit=2)
+            seen += [(c['type'], c['id']) for c in page['changes']]
+            cursor, has_more = page['cursor'], page['has_more']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_booking_resends_event_seats(self):
+        self.event.capacity = 10
+        self.event.save()
+        cursor = self.sync()['cursor']
+        EventBooking.objects.book(self.event, 'key-1', 3, customer_name="A", customer_email="a@example.com")
+        changes = self.sync(cursor)['changes']
+        self.assertEqual([c['item']['seats_remaining'] for c in changes], [7])
+
+    def test_menu_import_changes_are_in_the_feed(self):
+        cursor = self.sync()['cursor']
+        menu_import.import_menu(self.category.restaurant, {
+            'categories': [{'name': "Grillades", 'order': 5}],
+            'dishes': [{'name': "Poulet braisé", 'price': "5000.00", 'category': "Grillades"}],
+        })
+        changes = self.sync(cursor)['changes']
+        self.assertEqual([(c['type'], c['id']) for c in changes], [('category', self.category.pk), ('dish', self.dish.pk)])
+        self.assertEqual(changes[0]['item']['order'], 5)
+
+    def test_invalid_and_expired_cursors(self):
+        self.assertEqual(self.client.get(reverse('catalog-changes'), {'since': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        old = sync.format_cursor(sync.Cursor(sync.to_micros(timezone.now() - timedelta(days=31)), 0, 0))
+        self.assertEqual(self.client.get(reverse('catalog-changes'), {'since': old}).status_code, status.HTTP_410_GONE)
+
+    def test_sync_reads_changed_rows_through_index(self):
+        plan = str(Dish.objects.filter(restaurant=self.dish.restaurant, updated_at__gt=timezone.now()).order_by('updated_at', 'pk').explain())
+        self.assertIn('dish_updated_idx', plan)
+
+    def test_purge_keeps_recent_tombstones(self):
+        restaurant = self.dish.restaurant
+        CatalogTombstone.objects.create(restaurant=restaurant, kind='dish', object_id=1, deleted_at=timezone.now() - timedelta(days=40))
+        dish_pk = self.dish.pk
+        self.dish.delete()
+        call_command('purge_catalog_tombstones', stdout=StringIO())
+        self.assertEqual(list(CatalogTombstone.objects.values_list('object_id', flat=True)), [dish_pk])
+
+
+from datetime import date, datetime, time
+from django.core.exceptions import ValidationError as DjangoValidationError
+from . import inventory
+from .availability import available_tables as available_tables_for
+from .models import TableSlot, TableUnavailable
+
+class TableSlotTests(APITestCase):
+    def setUp(self):
+        self.table = Table.objects.create(name="T1", capacity=4)
+        self.data = {
+            'customer_name': 'Awa', 'customer_email': 'awa@example.com', 'customer_phone': '0102030405',
+            'reservation_date': '2030-06-01', 'reservation_time': '20:00', 'number_of_guests': 2, 'table': self.table.pk,
+        }
+
+    def reserve(self, **fields):
+        return Reservation.objects.create(**{**self.data, 'table': self.table, **fields})
+
+    def test_overlapping_booking_is_refused(self):
+        self.assertEqual(self.client.post(reverse('reservation-list'), self.data, format='json').status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('reservation-list'), dict(self.data, reservation_time='21:30'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Reservation.objects.count(), 1)
+        # Fin de la première réservation : la table est libre
+        response = self.client.post(reverse('reservation-list'), dict(self.data, reservation_time='22:00'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_status_change_move_and_delete_release_slots(self):
+        first = self.reserve()
+        with self.assertRaises(TableUnavailable):
+            self.reserve(reservation_time='19:00')
+        first.status = Reservation.ReservationStatus.CANCELLED
+        first.save()
+        second = self.reserve(reservation_time='19:00')
+        self.assertEqual(TableSlot.objects.filter(reservation=second).count(), 4)
+
+        second.reservation_time = '12:00'
+        second.save()
+        self.reserve()
+        second.delete()
+        self.assertEqual(set(TableSlot.objects.filter(reservation__isnull=False).values_list('slot_time', flat=True)),
+                         {datetime.strptime(t, '%H:%M').time() for t in ('20:00', '20:30', '21:00', '21:30')})
+
+    def test_admin_form_validation_reports_conflict(self):
+        self.reserve()
+        with self.assertRaises(DjangoValidationError):
+            Reservation(**{**self.data, 'table': self.table, 'reservation_time': '20:30'}).full_clean()
+
+    def test_generated_slots_are_claimed_by_update(self):
+        call_command('generate_table_slots', days=1, start='2030-06-01', stdout=StringIO())
+        self.assertEqual(TableSlot.objects.filter(table=self.table).count(), len(inventory.day_times()))
+        with CaptureQueriesContext(connection) as queries:
+            self.reserve()
+        self.assertFalse([q for q in queries if 'INSERT INTO "api_tableslot"' in q['sql']])
+        self.assertEqual(available_tables_for(date(2030, 6, 1), time(21, 0), 2).count(), 0)
+        plan = str(TableSlot.objects.filter(restaurant=self.table.restaurant, slot_date='2030-06-01', reservation__isnull=False).explain())
+        self.assertIn('table_slot_held_idx', plan)
+
+
+class TableSlotConcurrencyTests(TransactionTestCase):
+    def test_concurrent_bookings_of_a_table_never_overlap(self):
+        locations.clear_cache() # Restaurant par défaut d'un test précédent, supprimé par le flush
+        table = Table.objects.create(name="T1", capacity=4)
+        outcomes = []
+        barrier = threading.Barrier(10)
+
+        def attempt(index):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        Reservation.objects.create(
+                            customer_name=f"Client {index}", customer_email=f"c{index}@example.com", customer_phone='01',
+                            reservation_date=date(2030, 6, 1), reservation_time=time(20, index % 2 * 30), number_of_guests=2, table=table,
+                        )
+                        outcomes.append('booked')
+                        return
+                    except TableUnavailable:
+                        outcomes.append('taken')
+                        return
+                    except OperationalError:
+                        continue # SQLite verrouillée : le client réessaie
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=attempt, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(outcomes.count('booked'), 1)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+from . import lifecycle
+
+
+class ReservationLifecycleTests(TestCase):
+    def setUp(self):
+        self.tables = [Table.objects.create(name=f"T{index}", capacity=4) for index in range(1, 4)]
+        self.now = timezone.make_aware(datetime(2030, 6, 1, 23, 0))
+        self.data = {
+            'customer_name': 'Awa', 'customer_email': 'awa@example.com', 'customer_phone': '0102030405',
+            'reservation_date': date(2030, 6, 1), 'reservation_time': time(20, 0), 'number_of_guests': 2,
+        }
+
+    def reserve(self, **fields):
+        return Reservation.objects.create(**{**self.data, **fields})
+
+    def test_transitions_are_applied_in_bulk_and_release_tables(self):
+        Status = Reservation.ReservationStatus
+        no_show = self.reserve(table=self.tables[0])
+        expired = self.reserve(table=self.tables[1], reservation_date=date(2030, 6, 3))
+        Reservation.objects.filter(pk=expired.pk).update(created_at=self.now - timedelta(days=2))
+        recent = self.reserve(reservation_date=date(2030, 6, 3))
+        Reservation.objects.filter(pk=recent.pk).update(created_at=self.now - timedelta(hours=1))
+        completed = self.reserve(table=self.tables[1], status=Status.CONFIRMED)
+        seated = self.reserve(table=self.tables[2], status=Status.CONFIRMED, reservation_time=time(21, 30))
+
+        sent = []
+        lifecycle.reservations_transitioned.connect(lambda **kwargs: sent.append(kwargs), weak=False, dispatch_uid='test')
+        self.addCleanup(lifecycle.reservations_transitioned.disconnect, dispatch_uid='test')
+        with mock.patch.object(broadcaster, 'notify') as notify, self.captureOnCommitCallbacks(execute=True):
+            counts = lifecycle.advance(now=self.now)
+
+        self.assertEqual(counts, {'no-show': 1, 'expire': 1, 'complete': 1})
+        statuses = dict(Reservation.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[no_show.pk], Status.NO_SHOW)
+        self.assertEqual(statuses[expired.pk], Status.EXPIRED)
+        self.assertEqual(statuses[recent.pk], Status.PENDING)
+        self.assertEqual(statuses[completed.pk], Status.COMPLETED)
+        self.assertEqual(statuses[seated.pk], Status.CONFIRMED)
+        self.assertEqual(set(TableSlot.objects.filter(reservation__isnull=False).values_list('reservation_id', flat=True)), {seated.pk})
+        # Un signal par transition, une notification par restaurant et date
+        self.assertEqual([(kwargs['transition'], len(kwargs['reservations'])) for kwargs in sent],
+                         [('no-show', 1), ('expire', 1), ('complete', 1)])
+        self.assertEqual(notify.call_count, 3)
+        self.assertEqual(lifecycle.advance(now=self.now), {'no-show': 0, 'expire': 0, 'complete': 0})
+
+    def test_transition_keeps_a_status_changed_meanwhile(self):
+        reservation = self.reserve(table=self.tables[0])
+        due = lifecycle.TRANSITIONS[0]
+        queryset = Reservation.objects.all()
+        original_filter = type(queryset).filter
+
+        def confirm_before_update(qs, *args, **kwargs):
+            # Un hôte confirme la réservation entre la lecture du lot et la mise à jour
+            if kwargs.get('id__in') and kwargs.get('status') == due.source:
+                Reservation.objects.filter(pk=reservation.pk).update(status=Reservation.ReservationStatus.CONFIRMED)
+            return original_filter(qs, *args, **kwargs)
+
+        with mock.patch.object(type(queryset), 'filter', confirm_before_update):
+            changed = lifecycle.apply_transition(due, queryset, self.now, 100)
+        self.assertEqual(changed, [])
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, Reservation.ReservationStatus.CONFIRMED)
+        self.assertTrue(TableSlot.objects.filter(reservation=reservation).exists())
+
+    def test_command_and_admin_action(self):
+        selected = self.reserve(table=self.tables[0], reservation_date=date(2020, 1, 1))
+        other = self.reserve(table=self.tables[1], reservation_date=date(2020, 1, 1))
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:api_reservation_changelist'), {'action': 'advance_reservations', '_selected_action': [selected.pk]})
+        self.assertEqual(Reservation.objects.get(pk=selected.pk).status, Reservation.ReservationStatus.NO_SHOW)
+        self.assertEqual(Reservation.objects.get(pk=other.pk).status, Reservation.ReservationStatus.PENDING)
+
+        out = StringIO()
+        call_command('advance_reservations', stdout=out)
+        self.assertIn("1 reservation(s) updated.", out.getvalue())
+        self.assertEqual(Reservation.objects.get(pk=other.pk).status, Reservation.ReservationStatus.NO_SHOW)
+        plan = str(Reservation.objects.filter(status='pending').filter(lifecycle.no_show_due(timezone.now())).explain())
+        self.assertIn('reservation_status_idx', plan)
+
+
+import importlib
+from django.db.models import Count
+from . import customers
+from .models import Customer
+
+
+class CustomerTests(APITestCase):
+    def setUp(self):
+        self.data = {
+            'customer_name': 'Awa', 'customer_email': ' Awa@Example.com', 'customer_phone': '07 07 12 34 56',
+            'reservation_date': '2030-06-01', 'reservation_time': '20:00', 'number_of_guests': 2,
+        }
+
+    def test_normalisation(self):
+        self.assertEqual(customers.normalize_email(' Awa@Example.COM '), 'awa@example.com')
+        self.assertEqual(customers.normalize_phone('07 07 12 34 56'), '+2250707123456')
+        self.assertEqual(customers.normalize_phone('+33 6 12 34 56 78'), '+33612345678')
+        self.assertEqual(customers.normalize_phone('00225 0707123456'), '+2250707123456')
+        self.assertEqual(customers.normalize_phone('12'), '')
+
+    def test_reservations_and_messages_share_one_customer(self):
+        self.assertEqual(self.client.post(reverse('reservation-list'), self.data, format='json').status_code, status.HTTP_201_CREATED)
+        self.client.post(reverse('reservation-list'), dict(self.data, customer_email='awa@example.com', customer_name='Awa K.'), format='json')
+        ContactMessage.objects.submit(name='Awa', email='AWA@example.com', subject='Allergies', message='Sans arachide')
+        customer = Customer.objects.get()
+        self.assertEqual((customer.email, customer.phone, customer.name), ('awa@example.com', '+2250707123456', 'Awa'))
+        self.assertEqual(Reservation.objects.filter(customer=customer).count(), 2)
+        self.assertEqual(ContactMessage.objects.get().customer, customer)
+
+        Reservation.objects.filter(customer=customer).update(status=Reservation.ReservationStatus.NO_SHOW)
+        self.assertEqual(customers.reservation_counts(customer), {'no-show': 2})
+        plan = str(Reservation.objects.filter(customer=customer).values('status').annotate(count=Count('id')).order_by().explain())
+        self.assertIn('reservation_customer_idx', plan)
+
+    def test_public_forms_do_not_overwrite_customer_details(self):
+        table = Table.objects.create(name="T-client", capacity=4)
+        self.client.post(reverse('reservation-list'), dict(self.data, table=table.pk), format='json')
+        Customer.objects.update(notes="Allergie arachide")
+        other = dict(self.data, customer_name='Intrus', customer_phone='0505050505', customer_email='AWA@example.com')
+        self.assertEqual(self.client.post(reverse('reservation-list'), other, format='json').status_code, status.HTTP_201_CREATED)
+        ContactMessage.objects.submit(name='Intrus', email='awa@example.com', subject='Test', message='Bonjour')
+        customer = Customer.objects.get()
+        self.assertEqual((customer.name, customer.phone, customer.notes), ('Awa', '+2250707123456', "Allergie arachide"))
+
+        # Un champ vide est complété
+        Customer.objects.update(phone='')
+        Reservation.objects.create(**dict(other, reservation_date=date(2030, 6, 2), reservation_time=time(20, 0)))
+        self.assertEqual(Customer.objects.get().phone, '+2250505050505')
+
+        # Réservation refusée (table prise) : pas de fiche client créée
+        taken = dict(self.data, customer_email='nouveau@example.com', table=table.pk)
+        self.assertEqual(self.client.post(reverse('reservation-list'), taken, format='json').status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Customer.objects.filter(email='nouveau@example.com').exists())
+
+    def test_admin_search_by_phone_is_an_exact_customer_lookup(self):
+        Reservation.objects.create(**dict(self.data, reservation_date=date(2030, 6, 1), reservation_time=time(20, 0)))
+        Reservation.objects.create(**dict(self.data, customer_email='kofi@example.com', customer_phone='0505050505',
+                                          reservation_date=date(2030, 6, 1), reservation_time=time(20, 0)))
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:api_reservation_changelist'), {'q': '+225 07 07 12 34 56'})
+        self.assertEqual([reservation.customer_email for reservation in response.context['cl'].result_list], [' Awa@Example.com'])
+        response = self.client.get(reverse('admin:api_customer_change', args=[Customer.objects.get(email='awa@example.com').pk]))
+        self.assertContains(response, 'Pending : 1')
+
+        # Recherches partielles : toujours par search_fields
+        response = self.client.get(reverse('admin:api_reservation_changelist'), {'q': 'awa@'})
+        self.assertEqual([reservation.customer_email for reservation in response.context['cl'].result_list], [' Awa@Example.com'])
+        response = self.client.get(reverse('admin:api_reservation_changelist'), {'q': '@example.com'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        ContactMessage.objects.submit(name='Kofi', email='kofi@example.com', subject='Question', message='Écrire à contact@treichville.ci')
+        response = self.client.get(reverse('admin:api_contactmessage_changelist'), {'q': 'contact@treichville.ci'})
+        self.assertEqual([message.name for message in response.context['cl'].result_list], ['Kofi'])
+
+    def test_backfill_deduplicates_existing_rows(self):
+        first = Reservation.objects.create(**dict(self.data, reservation_date=date(2030, 6, 1), reservation_time=time(20, 0)))
+        second = Reservation.objects.create(**dict(self.data, customer_email='AWA@example.com', reservation_date=date(2030, 6, 2), reservation_time=time(20, 0)))
+        Reservation.objects.update(customer=None)
+        Customer.objects.all().delete()
+        migration = importlib.import_module('api.migrations.0013_backfill_customers')
+        with mock.patch.object(migration, 'CHUNK_SIZE', 1):
+            migration.backfill(Customer, Reservation, 'default', ('customer_name', 'customer_email', 'customer_phone'))
+        customer = Customer.objects.get()
+        self.assertEqual(set(Reservation.objects.values_list('customer_id', flat=True)), {customer.pk})
+        self.assertEqual({first.pk, second.pk}, set(Reservation.objects.filter(customer=customer).values_list('pk', flat=True)))
+
+
+import hashlib
+from time import sleep
+from django.http import Http404
+from rest_framework.response import Response
+from . import singleflight
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        metrics.registry.counters.clear()
+        caches['default'].clear()
+
+    def counted(self, result):
+        return metrics.registry.counters.get((singleflight.METRIC, (('flight', 'test'), ('result', result))), 0)
+
+    def run_concurrently(self, count, call):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(call())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_identical_calls_share_one_computation(self):
+        started, release = threading.Event(), threading.Event()
+        computed = []
+
+        def compute():
+            computed.append(1)
+            started.set()
+            release.wait(5)
+            return {'tables': [1, 2]}
+
+        leader, results = self.run_concurrently(1, lambda: singleflight.run('test', 'key', compute))
+        started.wait(5)
+        followers, _ = self.run_concurrently(4, lambda: results.append(singleflight.run('test', 'key', compute)))
+        sleep(0.1) # Les suiveurs attendent le meneur
+        release.set()
+        for thread in leader + followers:
+            thread.join()
+        self.assertEqual(len(computed), 1)
+        self.assertEqual([result for result in results if result is not None], [{'tables': [1, 2]}] * 5)
+        self.assertEqual((self.counted('leader'), self.counted('coalesced')), (1, 4))
+        # Appel suivant : nouveau calcul, pas un résultat mis en cache
+        singleflight.run('test', 'key', compute)
+        self.assertEqual(len(computed), 2)
+
+    def test_followers_get_the_leader_exception(self):
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            raise Http404("gone")
+
+        errors = []
+
+        def call():
+            try:
+                singleflight.run('test', 'key', compute)
+            except Http404 as e:
+                errors.append(e)
+
+        leader, _ = self.run_concurrently(1, call)
+        started.wait(5)
+        follower, _ = self.run_concurrently(1, call)
+        sleep(0.1)
+        release.set()
+        for thread in leader + follower:
+            thread.join()
+        self.assertEqual(len(errors), 2)
+
+    @override_settings(SINGLE_FLIGHT={'SHARED': True, 'WAIT_SECONDS': 2, 'POLL_SECONDS': 0.01})
+    def test_shared_mode_waits_for_another_process(self):
+        cache = caches['default']
+        digest = hashlib.sha256(b'key').hexdigest()
+        cache.set(singleflight.LOCK_KEY.format(digest), 'other-process')
+
+        def publish():
+            sleep(0.1)
+            cache.set(singleflight.RESULT_KEY.format(digest, 'other-process'), 'from elsewhere')
+
+        threading.Thread(target=publish).start()
+        self.assertEqual(singleflight.run('test', 'key', lambda: 'computed here'), 'from elsewhere')
+        self.assertEqual(self.counted('shared'), 1)
+        # Verrou libre : ce processus calcule et publie pour les autres
+        cache.delete(singleflight.LOCK_KEY.format(digest))
+        self.assertEqual(singleflight.run('test', 'key', lambda: 'computed here'), 'computed here')
+        self.assertIsNone(cache.get(singleflight.LOCK_KEY.format(digest)))
+
+    def test_coalesced_followers_get_their_own_response(self):
+        started, release = threading.Event(), threading.Event()
+
+        def view():
+            started.set()
+            release.wait(5)
+            response = Response({'ok': True}, status=status.HTTP_202_ACCEPTED)
+            response['X-Test'] = 'yes'
+            return response
+
+        leader, results = self.run_concurrently(1, lambda: singleflight.coalesce_response('test', 'key', view))
+        started.wait(5)
+        follower, _ = self.run_concurrently(1, lambda: results.append(singleflight.coalesce_response('test', 'key', view)))
+        sleep(0.1)
+        release.set()
+        for thread in leader + follower:
+            thread.join()
+        results = [result for result in results if result is not None]
+        self.assertEqual(len(results), 2)
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual({(r.status_code, r['X-Test'], r.data['ok']) for r in results}, {(202, 'yes', True)})
+
+    def test_availability_action_is_coalesced(self):
+        Table.objects.create(name="T1", capacity=4)
+        url = reverse('table-availability')
+        response = self.client.get(url, {'date': '2030-06-01', 'time': '20:00', 'guests': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(metrics.registry.counters.get((singleflight.METRIC, (('flight', 'availability'), ('result', 'leader')))), 1)
+
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.db import transaction
+from . import menu_import, webhooks
+from .models import WebhookDelivery, WebhookEndpoint
+
+
+class StandInReceiver:
+    """
+    Local HTTP/1.1 server standing in for a webhook subscriber: records every request and
+    answers with the next queued status (200 once the queue is empty).
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                receiver.requests.append({'headers': dict(self.headers), 'body': body, 'client': self.client_address})
+                status_code = receiver.statuses.pop(0) if receiver.statuses else 200
+                self.send_response(status_code)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hooks"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(WEBHOOKS={'BATCH_SIZE': 2, 'MAX_ATTEMPTS': 2, 'BACKOFF_SECONDS': 30})
+class WebhookTests(TestCase):
+    def setUp(self):
+        self.receiver = StandInReceiver()
+        self.addCleanup(self.receiver.close)
+        self.pool = webhooks.ConnectionPool(timeout=5)
+        self.addCleanup(self.pool.close)
+        self.endpoint = WebhookEndpoint.objects.create(name="POS", url=self.receiver.url)
+        self.table = Table.objects.create(name="T1", capacity=4)
+        self.data = {
+            'customer_name': 'Awa', 'customer_email': 'awa@example.com', 'customer_phone': '0102030405',
+            'reservation_date': date(2030, 6, 1), 'number_of_guests': 2,
+        }
+
+    def reserve(self, hour):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(**self.data, reservation_time=time(hour, 0))
+
+    def test_events_are_queued_with_the_change_and_delivered_in_signed_batches(self):
+        reservations = [self.reserve(hour) for hour in (12, 14, 16)]
+        category = Category.objects.create(name="Plats")
+        dish = Dish.objects.create(name="Attiéké", price="5.00", category=category)
+        with self.captureOnCommitCallbacks(execute=True):
+            dish.is_available = False
+            dish.save()
+            dish.name = "Attiéké poisson" # Sans changement de disponibilité : pas d'événement
+            dish.save()
+        self.assertEqual(WebhookDelivery.objects.filter(status='pending').count(), 4)
+
+        counts = webhooks.deliver_due(self.pool)
+        self.assertEqual(counts, {'delivered': 4, 'failed': 0, 'dead': 0})
+        self.assertEqual(len(self.receiver.requests), 2) # Lots de 2
+        self.assertEqual(len({request['client'] for request in self.receiver.requests}), 1) # Une seule connexion
+        events = []
+        for request in self.receiver.requests:
+            self.assertTrue(webhooks.verify(self.endpoint.secret, request['headers'][webhooks.SIGNATURE_HEADER], request['body']))
+            events.extend(json.loads(request['body'])['events'])
+        self.assertEqual([event['type'] for event in events], ['reservation.created'] * 3 + ['dish.availability_changed'])
+        self.assertEqual([event['data']['id'] for event in events], [r.pk for r in reservations] + [dish.pk])
+        self.assertFalse(events[3]['data']['is_available'])
+        self.assertFalse(webhooks.verify('wrong secret', self.receiver.requests[0]['headers'][webhooks.SIGNATURE_HEADER], self.receiver.requests[0]['body']))
+
+    def test_outbox_rows_share_the_change_transaction(self):
+        # Écrites avant le commit, sans callback on_commit
+        Reservation.objects.create(**self.data, reservation_time=time(12, 0), table=self.table)
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+        with self.assertRaises(TableUnavailable):
+            Reservation.objects.create(**self.data, reservation_time=time(12, 0), table=self.table)
+        self.assertEqual(WebhookDelivery.objects.count(), 1) # Annulée avec la réservation refusée
+
+    def test_failures_back_off_then_become_dead_letters(self):
+        metrics.registry.counters.clear()
+        metrics.registry.histograms.clear()
+        self.reserve(12)
+        self.receiver.statuses = [500, 503]
+        now = timezone.now()
+        self.assertEqual(webhooks.deliver_due(self.pool, now), {'delivered': 0, 'failed': 1, 'dead': 0})
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.attempts, 1)
+        self.assertIn('HTTP 500', delivery.last_error)
+        self.assertGreater(delivery.next_attempt_at, now + timedelta(seconds=20))
+        self.assertEqual(webhooks.deliver_due(self.pool, now), {'delivered': 0, 'failed': 0, 'dead': 0}) # Pas encore dû
+        self.assertEqual(webhooks.deliver_due(self.pool, now + timedelta(minutes=5)), {'delivered': 0, 'failed': 0, 'dead': 1})
+        self.assertEqual(metrics.registry.counters[('webhook_send_failures_total', (('reason', 'http'),))], 2)
+        self.assertEqual(metrics.registry.histograms[('webhook_send_duration_seconds', ())]['count'], 2)
+
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('webhook-dead-letter-list'))
+        self.assertEqual([row['id'] for row in response.json()], [delivery.pk])
+        self.client.post(reverse('webhook-dead-letter-retry', args=[delivery.pk]))
+        self.assertEqual(webhooks.deliver_due(self.pool), {'delivered': 1, 'failed': 0, 'dead': 0})
+        self.assertEqual(len(self.receiver.requests), 3)
+
+    def test_filters_and_rollback(self):
+        self.endpoint.events = ['dish.availability_changed']
+        self.endpoint.save()
+        self.reserve(12)
+        with self.assertRaises(TableUnavailable), self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Reservation.objects.create(**self.data, reservation_time=time(20, 0), table=self.table)
+                Reservation.objects.create(**self.data, reservation_time=time(20, 0), table=self.table)
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    def test_lifecycle_transitions_are_sent_as_updates(self):
+        self.reserve(12)
+        with self.captureOnCommitCallbacks(execute=True):
+            lifecycle.advance(now=timezone.make_aware(datetime(2030, 6, 2)))
+        self.assertEqual(list(WebhookDelivery.objects.order_by('id').values_list('event', 'payload__status')),
+                         [('reservation.created', 'pending'), ('reservation.updated', 'no-show')])
+
+    def test_menu_import_sends_availability_flips(self):
+        category = Category.objects.create(name="Plats")
+        Dish.objects.create(name="Garba", price="3.00", category=category)
+        Dish.objects.create(name="Alloco", price="2.00", category=category)
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_import.import_menu(locations.default_location(), {'dishes': [{'name': 'Garba', 'price': '3.50'}]}, replace=True)
+        self.assertEqual(list(WebhookDelivery.objects.values_list('event', 'payload__name')), [('dish.availability_changed', 'Alloco')])
+
+
+from . import bulk_reservations
+
+
+class BulkReservationTests(APITestCase):
+    def setUp(self):
+        self.tables = {capacity: Table.objects.create(name=f"T{capacity}", capacity=capacity) for capacity in (2, 4, 6)}
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_authenticate(admin)
+        self.url = reverse('reservation-bulk')
+
+    def party(self, index, guests, **fields):
+        return {
+            'customer_name': f'Invité {index}', 'customer_email': f'guest{index}@example.com', 'customer_phone': '0707070707',
+            'reservation_date': '2030-06-01', 'reservation_time': '20:00', 'number_of_guests': guests, **fields,
+        }
+
+    def post(self, parties, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'reservations': parties, **options}, format='json')
+
+    def test_batch_is_allocated_created_and_confirmed_at_once(self):
+        response = self.post([self.party(1, 2), self.party(2, 5), self.party(3, 3)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        tables = {row['customer_name']: row['table'] for row in response.json()['created'].values()}
+        self.assertEqual(tables, {'Invité 1': self.tables[2].pk, 'Invité 2': self.tables[6].pk, 'Invité 3': self.tables[4].pk})
+        self.assertEqual(TableSlot.objects.filter(reservation__isnull=False).count(), 12)
+        self.assertEqual(Customer.objects.count(), 3)
+        self.assertEqual(Reservation.objects.filter(customer__isnull=True).count(), 0)
+        self.assertEqual(len(mail.outbox), 4) # Trois confirmations et un récapitulatif
+        self.assertIn("3 nouvelle(s) réservation(s)", mail.outbox[-1].subject)
+
+    def test_atomic_batch_is_rejected_as_a_whole(self):
+        parties = [self.party(1, 2), self.party(2, 2, customer_email='invalid'), self.party(3, 2), self.party(4, 2), self.party(5, 2)]
+        response = self.post(parties)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()['reservations']
+        self.assertEqual(sorted(errors), ['1', '4']) # Email invalide ; plus de table libre pour la 5e
+        self.assertFalse(Reservation.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_partial_batch_creates_the_valid_rows(self):
+        self.assertEqual(self.post([self.party(0, 2, table=self.tables[6].pk)]).status_code, status.HTTP_201_CREATED)
+        response = self.post([self.party(1, 2, table=self.tables[6].pk), self.party(2, 8), self.party(3, 4)], mode='partial')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = response.json()
+        self.assertEqual(list(body['created']), ['2'])
+        self.assertEqual(sorted(body['errors']), ['0', '1'])
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_table_taken_meanwhile(self):
+        Reservation.objects.create(**dict(self.party(0, 2), table=self.tables[2]))
+        with mock.patch.object(bulk_reservations, 'held_times_by_table', side_effect=lambda *args: {}):
+            response = self.post([self.party(1, 2), self.party(2, 2)])
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(Reservation.objects.count(), 1)
+            response = self.post([self.party(1, 2), self.party(2, 2)], mode='partial')
+        self.assertEqual(response.json()['errors'], {'0': {'table': ["This table was booked meanwhile."]}})
+        self.assertEqual(Reservation.objects.count(), 2)
+        self.assertEqual(TableSlot.objects.filter(reservation__isnull=False).count(), 8)
+
+    def test_failures_after_commit_do_not_fail_the_request(self):
+        with mock.patch.object(bulk_reservations.broadcaster, 'notify', side_effect=RuntimeError("stream down")):
+            self.assertEqual(self.post([self.party(1, 2)]).status_code, status.HTTP_201_CREATED)
+        with mock.patch.object(bulk_reservations, 'get_connection', side_effect=OSError("SMTP down")):
+            self.assertEqual(self.post([self.party(2, 2)]).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(self.url, {'reservations': [self.party(1, 2)]}, format='json').status_code, status.HTTP_403_FORBIDDEN)
+
+
+from . import recurrence
+from .models import EventOccurrenceOverride
+
+class RecurringEventTests(APITestCase):
+    def setUp(self):
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+        # Le 1er janvier 2027 est un vendredi
+        self.music = Event.objects.create(title="Live music", description="Chaque vendredi", event_date=date(2027, 1, 1), event_time="21:00", is_published=True, recurrence='FREQ=WEEKLY;BYDAY=FR')
+        self.brunch = Event.objects.create(title="Brunch", description="Premier dimanche du mois", event_date=date(2027, 1, 3), event_time="11:00", is_published=True, recurrence='freq=monthly;byday=1SU;until=20270630')
+        self.gala = Event.objects.create(title="Gala", description="Ponctuel", event_date=date(2027, 3, 20), event_time="19:00", is_published=True)
+
+    def dates(self, text, start, since, until):
+        return list(recurrence.iter_dates(recurrence.parse(text), start, since, until))
+
+    def listing(self, date_from, date_to):
+        return self.client.get(reverse('event-list'), {'from': date_from, 'to': date_to}).json()
+
+    def test_rules(self):
+        self.assertEqual(self.dates('FREQ=MONTHLY;BYDAY=-1FR', date(2027, 1, 1), date(2027, 1, 1), date(2027, 3, 31)), [date(2027, 1, 29), date(2027, 2, 26), date(2027, 3, 26)])
+        # Les mois sans 31 sont sautés
+        self.assertEqual(self.dates('FREQ=MONTHLY;BYMONTHDAY=31', date(2027, 1, 31), date(2027, 1, 1), date(2027, 5, 31)), [date(2027, 1, 31), date(2027, 3, 31), date(2027, 5, 31)])
+        # Une fenêtre lointaine commence directement à sa première période, sans décalage
+        rule = 'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH'
+        every = self.dates(rule, date(2027, 1, 5), date(2027, 1, 1), date(2030, 12, 31))
+        self.assertEqual(self.dates(rule, date(2027, 1, 5), date(2030, 6, 1), date(2030, 6, 30)), [day for day in every if date(2030, 6, 1) <= day <= date(2030, 6, 30)])
+        self.assertEqual(every[:3], [date(2027, 1, 5), date(2027, 1, 7), date(2027, 1, 19)])
+
+        self.assertEqual(recurrence.last_date('FREQ=DAILY;INTERVAL=3;COUNT=4', date(2027, 1, 1)), date(2027, 1, 10))
+        self.assertEqual(self.brunch.recurrence_end, date(2027, 6, 30))
+        self.assertIsNone(self.music.recurrence_end)
+        for text in ('FREQ=YEARLY', 'FREQ=WEEKLY;BYDAY=1FR', 'FREQ=WEEKLY;COUNT=3;UNTIL=20270101', 'FREQ=DAILY;BYSETPOS=1', 'FREQ=MONTHLY;BYMONTHDAY=32'):
+            with self.assertRaises(recurrence.InvalidRule):
+                recurrence.parse(text)
+
+    def test_year_of_weekly_event_is_one_row(self):
+        with self.assertNumQueries(2): # Les événements de la fenêtre, puis leurs exceptions
+            events = self.listing('2027-01-01', '2027-12-31')
+        self.assertEqual(Event.objects.count(), 3)
+        self.assertEqual(sum(1 for event in events if event['title'] == "Live music"), 53)
+        self.assertEqual([event['event_date'] for event in events if event['title'] == "Brunch"], ['2027-01-03', '2027-02-07', '2027-03-07', '2027-04-04', '2027-05-02', '2027-06-06'])
+        self.assertEqual(events[0], {**events[0], 'id': self.music.pk, 'event_date': '2027-01-01', 'event_time': '21:00:00', 'occurrence_date': '2027-01-01', 'recurrence': 'FREQ=WEEKLY;BYDAY=FR'})
+        self.assertEqual([event['event_date'] for event in events], sorted(event['event_date'] for event in events))
+        # Série terminée avant la fenêtre : pas même lue
+        self.assertEqual([event['title'] for event in self.listing('2027-07-01', '2027-07-10')], ["Live music", "Live music"])
+
+    def test_overrides(self):
+        self.assertEqual(len(self.listing('2027-01-01', '2027-01-31')), 6)
+        EventOccurrenceOverride.objects.create(event=self.music, original_date=date(2027, 1, 8), is_cancelled=True)
+        EventOccurrenceOverride.objects.create(event=self.music, original_date=date(2027, 1, 15), event_date=date(2027, 1, 16), title="Live music (samedi)")
+        # Déplacée depuis février dans la fenêtre
+        EventOccurrenceOverride.objects.create(event=self.music, original_date=date(2027, 2, 5), event_date=date(2027, 1, 30), event_time=time(22, 0))
+
+        events = self.listing('2027-01-01', '2027-01-31')
+        music = [(event['event_date'], event['event_time'], event['title'], event['occurrence_date']) for event in events if event['id'] == self.music.pk]
+        self.assertEqual(music, [
+            ('2027-01-01', '21:00:00', "Live music", '2027-01-01'),
+            ('2027-01-16', '21:00:00', "Live music (samedi)", '2027-01-15'),
+            ('2027-01-22', '21:00:00', "Live music", '2027-01-22'),
+            ('2027-01-29', '21:00:00', "Live music", '2027-01-29'),
+            ('2027-01-30', '22:00:00', "Live music", '2027-02-05'),
+        ])
+        self.assertNotIn('2027-02-05', [event['event_date'] for event in self.listing('2027-02-01', '2027-02-28') if event['id'] == self.music.pk])
+
+    def test_validation(self):
+        with self.assertRaises(DjangoValidationError):
+            Event(title="x", description="x", event_date=date(2027, 1, 1), event_time="20:00", recurrence='FREQ=HOURLY').full_clean()
+        with self.assertRaises(DjangoValidationError):
+            Event(title="x", description="x", event_date=date(2027, 1, 1), event_time="20:00", recurrence='FREQ=WEEKLY', capacity=40).full_clean()
+        with self.assertRaises(DjangoValidationError):
+            EventOccurrenceOverride(event=self.music, original_date=date(2027, 1, 9), is_cancelled=True).full_clean()
+        EventOccurrenceOverride(event=self.music, original_date=date(2027, 1, 8), is_cancelled=True).full_clean()
+
+    def test_calendar_feed_expands_series(self):
+        today = timezone.localdate()
+        Event.objects.all().delete()
+        weekly = Event.objects.create(title="Karaoké", description="Hebdo", event_date=today - timedelta(days=7), event_time="20:00", is_published=True, recurrence='FREQ=WEEKLY')
+        body = b''.join(self.client.get(reverse('events-ics')).streaming_content).decode()
+        # De J-7 à l'horizon de 90 jours
+        self.assertEqual(body.count('BEGIN:VEVENT'), 14)
+        self.assertIn(f'UID:event-{weekly.pk}-{today - timedelta(days=7):%Y%m%d}@', body)
+
+        EventOccurrenceOverride.objects.create(event=weekly, original_date=today, is_cancelled=True)
+        body = b''.join(self.client.get(reverse('events-ics')).streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 13)
@@ -5,8 +5,15 @@ from .views import (
     CategoryViewSet,
     DishViewSet,
     EventViewSet,
+    EventBookingViewSet,
     ReservationViewSet,
-    ContactMessageViewSet
+    ContactMessageViewSet,
+    WebhookDeadLetterViewSet,
+    SearchView,
+    MenuImportView,
+    CatalogChangesView,
+    events_ics,
+    availability_stream,
 )
 
 # Create a router and register our viewsets with it.
@@ -15,10 +22,17 @@ router.register(r'tables', TableViewSet, basename='table')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'dishes', DishViewSet, basename='dish')
 router.register(r'events', EventViewSet, basename='event')
+router.register(r'event-bookings', EventBookingViewSet, basename='eventbooking')
 router.register(r'reservations', ReservationViewSet, basename='reservation')
 router.register(r'contact-messages', ContactMessageViewSet, basename='contactmessage')
+router.register(r'webhooks/dead-letters', WebhookDeadLetterViewSet, basename='webhook-dead-letter')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
+    path('tables/availability/stream/', availability_stream, name='table-availability-stream'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('menu/import/', MenuImportView.as_view(), name='menu-import'),
+    path('catalog/changes/', CatalogChangesView.as_view(), name='catalog-changes'),
+    path('events.ics', events_ics, name='events-ics'),
     path('', include(router.urls)),
 ]
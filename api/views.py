@@ -1,28 +1,64 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAdminUser # AllowAny pour tests, à ajuster pour prod
 from django.core.mail import send_mail
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
 from django.conf import settings
 from django.template.loader import render_to_string # Pour des emails HTML plus tard
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
+from asgiref.sync import sync_to_async
 
-from .models import Table, Category, Dish, Event, Reservation, ContactMessage
+from . import assets, bulk_reservations, frontend, ical, locations, menu_import, metrics, recurrence, search, sync, webhooks
+from .availability import available_tables as available_tables_for
+from .idempotency import IdempotentCreateMixin
+from .locations import LocationScopedMixin
+from .response_cache import CachedResponseMixin, cached_response
+from .singleflight import coalesced
+from .models import Table, Category, Dish, Event, EventBooking, EventSoldOut, Reservation, ContactMessage, TableUnavailable, WebhookDelivery
+from .streams import availability_events
 from .serializers import (
     TableSerializer, CategorySerializer, DishSerializer, EventSerializer,
-    ReservationSerializer, ContactMessageSerializer
+    EventBookingSerializer, ReservationSerializer, ContactMessageSerializer, WebhookDeliverySerializer,
+    BulkReservationSerializer, occurrence_data,
 )
 
-class TableViewSet(viewsets.ModelViewSet):
+class TableTaken(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This table is already booked at that time."
+    default_code = 'table_unavailable'
+
+def send_timed_mail(kind, *args, **kwargs):
+    """
+    send_mail() that records its duration and failures in the email_send_* metrics.
+    """
+    with metrics.timer('email_send_duration_seconds', kind=kind):
+        try:
+            return send_mail(*args, **kwargs)
+        except Exception:
+            metrics.inc('email_send_failures_total', kind=kind)
+            raise
+
+class TableViewSet(LocationScopedMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows tables to be viewed or edited.
+    Every endpoint of the API takes an optional ?location=<slug> (default: settings.DEFAULT_LOCATION).
     """
     queryset = Table.objects.filter(is_active=True)
     serializer_class = TableSerializer
     permission_classes = [IsAdminUser] # Seuls les admins peuvent gérer les tables
 
+    def perform_create(self, serializer):
+        serializer.save(restaurant=self.location)
+
     @action(detail=False, methods=['get'], url_path='availability', permission_classes=[AllowAny]) # Disponibilité est publique
+    @coalesced # Rafales de demandes identiques à l'ouverture des réservations
     def availability(self, request):
         # Params attendus: date (YYYY-MM-DD), time (HH:MM), number_of_guests
         date_str = request.query_params.get('date')
@@ -45,96 +81,252 @@ class TableViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Définir la durée d'une réservation (par exemple, 2 heures)
-        reservation_duration = timedelta(hours=2)
-
-        # Combiner date et heure pour obtenir un datetime object pour le début de la réservation souhaitée
-        requested_datetime_start = timezone.make_aware(datetime.combine(reservation_date, reservation_time))
-        requested_datetime_end = requested_datetime_start + reservation_duration
-
-        # 1. Trouver les tables qui ont la capacité requise et sont actives
-        potential_tables = Table.objects.filter(is_active=True, capacity__gte=num_guests)
-
-        # 2. Exclure les tables qui ont des réservations confirmées qui chevauchent le créneau demandé
-        # Une réservation chevauche si :
-        # (res_start < req_end) ET (res_end > req_start)
-        # Nous ne considérons que les réservations 'confirmed' ou 'pending' comme bloquantes
-        # (on pourrait être plus strict et ne prendre que 'confirmed')
-        conflicting_statuses = [Reservation.ReservationStatus.CONFIRMED, Reservation.ReservationStatus.PENDING]
-
-        unavailable_table_ids = set()
-        for table in potential_tables:
-            # Récupérer les réservations pour cette table à cette date
-            reservations_for_table_on_date = Reservation.objects.filter(
-                table=table,
-                reservation_date=reservation_date,
-                status__in=conflicting_statuses
-            )
-
-            for res in reservations_for_table_on_date:
-                existing_res_start = timezone.make_aware(datetime.combine(res.reservation_date, res.reservation_time))
-                existing_res_end = existing_res_start + reservation_duration # Supposons la même durée pour toutes
-
-                # Vérifier le chevauchement
-                if (existing_res_start < requested_datetime_end and
-                    existing_res_end > requested_datetime_start):
-                    unavailable_table_ids.add(table.id)
-                    break # Cette table n'est pas dispo, passer à la suivante
-
-        available_tables = potential_tables.exclude(id__in=unavailable_table_ids)
+        # Tables actives de capacité suffisante, sans réservation bloquante qui chevauche le créneau
+        # (voir api/availability.py pour les règles de chevauchement)
+        available_tables = available_tables_for(reservation_date, reservation_time, num_guests, self.location)
 
         serializer = self.get_serializer(available_tables, many=True)
         return Response(serializer.data)
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly car géré par admin principalement
+class CategoryViewSet(LocationScopedMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet): # ReadOnly car géré par admin principalement
     """
     API endpoint that allows menu categories to be viewed.
     """
+    cache_tags = ('category',)
     queryset = Category.objects.all().order_by('order')
     serializer_class = CategorySerializer
     permission_classes = [AllowAny] # Publicly readable
 
-class DishViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly pour les clients, écriture via admin
+class DishViewSet(LocationScopedMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet): # ReadOnly pour les clients, écriture via admin
     """
     API endpoint that allows dishes to be viewed.
     """
+    cache_tags = ('dish',)
     queryset = Dish.objects.filter(is_available=True)
     serializer_class = DishSerializer
     permission_classes = [AllowAny] # Publicly readable
 
     def get_queryset(self):
-        queryset = Dish.objects.filter(is_available=True)
+        queryset = super().get_queryset()
         category_id = self.request.query_params.get('category_id')
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         return queryset
 
     @action(detail=False, methods=['get'], url_path='featured')
+    @cached_response
     def featured(self, request):
         """
         Returns a list of featured dishes.
         """
-        featured_dishes = Dish.objects.filter(is_available=True, is_featured=True)
+        featured_dishes = self.get_queryset().filter(is_featured=True)
         serializer = self.get_serializer(featured_dishes, many=True)
         return Response(serializer.data)
 
-class EventViewSet(viewsets.ReadOnlyModelViewSet): # ReadOnly pour les clients
+class EventViewSet(LocationScopedMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet): # ReadOnly pour les clients
     """
     API endpoint that allows events to be viewed.
     """
+    cache_tags = ('event',)
     queryset = Event.objects.filter(is_published=True).order_by('event_date', 'event_time')
     serializer_class = EventSerializer
     permission_classes = [AllowAny] # Publicly readable
 
-class ReservationViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset # Un événement passé reste consultable par son id
+        # Fenêtre de dates (index event_published_date_idx pour les événements ponctuels) ; par défaut, à venir
+        date_from, date_to = self.window()
+        return recurrence.in_window(queryset, date_from, date_to).prefetch_related(recurrence.overrides_prefetch(date_from, date_to))
+
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        """
+        Occurrences of the published events between ?from (default: today) and ?to, by date:
+        recurring events are expanded within the window (api/recurrence.py).
+        """
+        date_from, date_to = self.window()
+        occurrences = recurrence.expand(self.filter_queryset(self.get_queryset()), date_from, date_to)
+        return Response(occurrence_data(occurrences, self.get_serializer_context()))
+
+    def window(self):
+        try:
+            return self.parse_date_param('from') or timezone.localdate(), self.parse_date_param('to')
+        except ValueError as e:
+            raise ValidationError({"error": f"Invalid parameter format: {e}"})
+
+    def parse_date_param(self, name):
+        value = self.request.query_params.get(name)
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+class SearchView(LocationScopedMixin, APIView):
+    """
+    Full-text search over available dishes and published events, best matches first.
+    Params: q (words, matched as prefixes, accents ignored), type ('dish' or 'event', optional).
+    """
+    permission_classes = [AllowAny] # Publicly readable
+    cache_tags = ('dish', 'event')
+
+    @cached_response
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kind = request.query_params.get('type') or None
+        if kind not in (None, search.DISH, search.EVENT):
+            return Response(
+                {"error": "Type must be 'dish' or 'event'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        hits = search.search(query, kind=kind, restaurant_id=self.location.pk)
+        dish_ids = [pk for hit_kind, pk in hits if hit_kind == search.DISH]
+        event_ids = [pk for hit_kind, pk in hits if hit_kind == search.EVENT]
+        objects = {
+            (search.DISH, dish.pk): DishSerializer(dish, context={'request': request}).data
+            for dish in Dish.objects.filter(pk__in=dish_ids, is_available=True)
+        }
+        objects.update({
+            (search.EVENT, event.pk): EventSerializer(event, context={'request': request}).data
+            for event in Event.objects.filter(pk__in=event_ids, is_published=True)
+        })
+        results = [
+            {'type': hit_kind, 'item': objects[(hit_kind, pk)]}
+            for hit_kind, pk in hits if (hit_kind, pk) in objects
+        ]
+        return Response(results)
+
+class CatalogChangesView(LocationScopedMixin, APIView):
+    """
+    Changes to the location's categories, dishes and events since a cursor (see api/sync.py).
+    Params: since (cursor returned by the previous call; omit for a full sync), limit.
+    Repeat with the returned cursor while has_more is true; 410 means a full sync is needed.
+    """
+    permission_classes = [AllowAny] # Publicly readable
+
+    def get(self, request):
+        page_size = sync.sync_setting('PAGE_SIZE', 500)
+        try:
+            since = request.query_params.get('since')
+            since = sync.parse_cursor(since) if since else None
+            limit = min(int(request.query_params.get('limit') or page_size), page_size)
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            return Response({"error": "Invalid cursor or limit."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(sync.changes(self.location, since, limit, context={'request': request}))
+        except sync.CursorExpired:
+            return Response({"error": "Cursor expired, sync again without 'since'."}, status=status.HTTP_410_GONE)
+
+class MenuImportView(LocationScopedMixin, APIView):
+    """
+    Admin-only bulk import of the location's categories and dishes (see api/menu_import.py).
+    Body: a JSON document, or a CSV/JSON upload in the 'file' field of a multipart form.
+    Params: replace=1 makes the dishes absent from the file unavailable.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            data = menu_import.parse(upload.read(), menu_import.format_for(upload.name, upload.content_type))
+        elif isinstance(request.data, dict):
+            data = request.data
+        else:
+            raise ValidationError({'file': ["Expected a JSON object or a file upload."]})
+        replace = request.query_params.get('replace') in ('1', 'true')
+        return Response(menu_import.import_menu(self.location, data, replace=replace))
+
+class EventBookingViewSet(mixins.CreateModelMixin,
+                          mixins.RetrieveModelMixin,
+                          mixins.ListModelMixin,
+                          viewsets.GenericViewSet):
+    """
+    API endpoint for booking seats at an event.
+    Clients can create (POST), look up and cancel a booking by its reference. Admins can list.
+    """
+    queryset = EventBooking.objects.select_related('event').all()
+    serializer_class = EventBookingSerializer
+    lookup_field = 'reference'
+
+    def get_permissions(self):
+        if self.action == 'list':
+            self.permission_classes = [IsAdminUser]
+        else:
+            # La référence (UUID) sert de secret pour consulter/annuler sa réservation
+            self.permission_classes = [AllowAny]
+        return super().get_permissions()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            booking, created = EventBooking.objects.book(**serializer.validated_data)
+        except EventSoldOut:
+            return Response(
+                {"error": "Not enough seats left for this event."},
+                status=status.HTTP_409_CONFLICT
+            )
+        if created:
+            self.send_confirmation(booking)
+        return Response(
+            self.get_serializer(booking).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['post'], url_path='cancel')
+    def cancel(self, request, reference=None):
+        """
+        Cancels a booking and returns its seats to the event.
+        """
+        booking = self.get_object()
+        if not booking.cancel():
+            return Response(
+                {"error": "This booking is already cancelled."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(booking).data)
+
+    def send_confirmation(self, booking):
+        event = booking.event
+        subject = f"Votre réservation pour {event.title} chez New Treichville"
+        message = (
+            f"Bonjour {booking.customer_name},\n\n"
+            f"Votre réservation de {booking.number_of_seats} place(s) pour « {event.title} » "
+            f"le {event.event_date.strftime('%d/%m/%Y')} à {event.event_time.strftime('%H:%M')} est confirmée.\n\n"
+            f"Référence: {booking.reference}\n\n"
+            f"Cordialement,\nL'équipe New Treichville"
+        )
+        try:
+            send_timed_mail(
+                'event-booking-confirmation',
+                subject,
+                message,
+                settings.DEFAULT_FROM_EMAIL,
+                [booking.customer_email],
+                fail_silently=False,
+            )
+        except Exception as e:
+            print(f"Erreur lors de l'envoi de l'email de confirmation d'événement: {e}")
+
+class ReservationViewSet(LocationScopedMixin, IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     API endpoint for creating and managing reservations.
-    Clients can create (POST). Admins can manage.
+    Clients can create (POST), with an optional Idempotency-Key header for safe retries. Admins can manage.
     """
     queryset = Reservation.objects.all().order_by('-reservation_date', '-reservation_time')
     serializer_class = ReservationSerializer
 
+    def get_queryset(self):
+        # Base du restaurant (LOCATION_DATABASES)
+        return locations.reservations(self.location).order_by('-reservation_date', '-reservation_time')
+
+    def get_serializer_context(self):
+        # La table demandée doit appartenir au restaurant de la requête (ReservationSerializer.validate)
+        return {**super().get_serializer_context(), 'location': self.location}
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
@@ -147,29 +339,18 @@ class ReservationViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
     def perform_create(self, serializer):
-        # Logique supplémentaire lors de la création d'une réservation
-        # Par exemple, vérifier la disponibilité, assigner une table, envoyer email de confirmation
-        # Pour l'instant, on sauve juste la réservation.
-        # Le statut par défaut est 'pending'
-        reservation = serializer.save() # Sauvegarder d'abord pour avoir l'objet reservation
+        # Le statut par défaut est 'pending' ; la table demandée est prise atomiquement avec
+        # la sauvegarde (api/inventory.py), ou rien n'est enregistré
+        try:
+            reservation = serializer.save(restaurant=self.location)
+        except TableUnavailable:
+            raise TableTaken()
 
         # Envoyer un email de confirmation au client
-        subject_customer = f"Confirmation de votre réservation chez New Treichville (ID: {reservation.id})"
-        message_customer = (
-            f"Bonjour {reservation.customer_name},\n\n"
-            f"Votre demande de réservation pour le {reservation.reservation_date.strftime('%d/%m/%Y')} "
-            f"à {reservation.reservation_time.strftime('%H:%M')} pour {reservation.number_of_guests} personne(s) "
-            f"a bien été reçue et est en attente de confirmation.\n\n"
-            f"Détails de la demande :\n"
-            f"Nom: {reservation.customer_name}\n"
-            f"Email: {reservation.customer_email}\n"
-            f"Téléphone: {reservation.customer_phone}\n"
-            f"Demandes spéciales: {reservation.special_requests or 'Aucune'}\n\n"
-            f"Nous vous contacterons bientôt pour confirmer définitivement votre table.\n\n"
-            f"Cordialement,\nL'équipe New Treichville"
-        )
+        subject_customer, message_customer = bulk_reservations.confirmation_email(reservation)
         try:
-            send_mail(
+            send_timed_mail(
+                'reservation-customer',
                 subject_customer,
                 message_customer,
                 settings.DEFAULT_FROM_EMAIL,
@@ -193,7 +374,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
             f"Veuillez la vérifier dans l'interface d'administration."
         )
         try:
-            send_mail(
+            send_timed_mail(
+                'reservation-admin',
                 subject_admin,
                 message_admin,
                 settings.DEFAULT_FROM_EMAIL,
@@ -205,11 +387,39 @@ class ReservationViewSet(viewsets.ModelViewSet):
 
         # TODO: Ajouter la logique d'assignation de table si applicable
 
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except TableUnavailable:
+            raise TableTaken()
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Creates a group booking: {"reservations": [...], "mode": "atomic"|"partial", "assign_tables": true}
+        (see api/bulk_reservations.py). 201 with the created rows and the errors by row index.
+        """
+        serializer = BulkReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            created, errors = bulk_reservations.create_reservations(
+                self.location, data['reservations'], mode=data['mode'], assign_tables=data['assign_tables']
+            )
+        except TableUnavailable:
+            raise TableTaken()
+        body = {
+            'created': {index: ReservationSerializer(reservation).data for index, reservation in created.items()},
+            'errors': errors,
+        }
+        return Response(body, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
 
-class ContactMessageViewSet(viewsets.ModelViewSet):
+class ContactMessageViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     API endpoint for submitting contact messages.
-    Clients can create (POST). Admins can view.
+    Clients can create (POST), with an optional Idempotency-Key header for safe retries. Admins can view.
+    A recent identical submission is merged into the original (hit_count) instead of stored again.
     """
     queryset = ContactMessage.objects.all().order_by('-created_at')
     serializer_class = ContactMessageSerializer
@@ -223,7 +433,10 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
     def perform_create(self, serializer):
-        contact_message = serializer.save()
+        contact_message, created = ContactMessage.objects.submit(**serializer.validated_data)
+        serializer.instance = contact_message
+        if not created:
+            return # Doublon récent : déjà notifié, seul son compteur augmente
 
         # Envoyer une notification email à l'admin
         subject_admin = f"Nouveau message de contact de {contact_message.name} (Sujet: {contact_message.subject})"
@@ -235,7 +448,8 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
             f"Veuillez le vérifier dans l'interface d'administration ou répondre directement."
         )
         try:
-            send_mail(
+            send_timed_mail(
+                'contact-admin',
                 subject_admin,
                 message_admin,
                 settings.DEFAULT_FROM_EMAIL, # Ou contact_message.email si vous voulez pouvoir répondre directement
@@ -244,3 +458,95 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
             )
         except Exception as e:
             print(f"Erreur lors de l'envoi de l'email de notification de contact: {e}")
+
+
+class WebhookDeadLetterViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Webhook deliveries given up after WEBHOOKS['MAX_ATTEMPTS'] (see api/webhooks.py).
+    POST .../<id>/retry/ sends one again from the worker's next pass.
+    """
+    queryset = WebhookDelivery.objects.filter(status=WebhookDelivery.DeliveryStatus.DEAD).select_related('endpoint').order_by('-created_at')
+    serializer_class = WebhookDeliverySerializer
+    permission_classes = [IsAdminUser]
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        webhooks.requeue(WebhookDelivery.objects.filter(pk=self.get_object().pk))
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+def events_ics(request):
+    """
+    iCalendar feed of the published events (recent and upcoming), for calendar subscriptions.
+    Cached until the next Event change; conditional requests get 304 from ConditionalGetMiddleware.
+    """
+    try:
+        location = locations.from_request(request)
+    except locations.UnknownLocation:
+        return JsonResponse({"error": "Unknown location."}, status=404)
+    domain = request.get_host().split(':')[0]
+    version = ical.feed_version(location, domain)
+    content = ical.cached_feed(version) if version is not None else None
+    if content is not None:
+        response = HttpResponse(content, content_type=ical.CONTENT_TYPE)
+    else:
+        response = StreamingHttpResponse(ical.caching_chunks(location, domain, version), content_type=ical.CONTENT_TYPE)
+    if version is not None:
+        response['ETag'] = f'"{version}"'
+    response['Cache-Control'] = 'public, max-age=3600'
+    response['Content-Disposition'] = 'inline; filename="events.ics"'
+    return response
+
+
+def frontend_asset(request, path):
+    """
+    Serves a built frontend asset (manage.py build_frontend) with its precompressed variant when
+    the client accepts it. Content-hashed names are immutable: returning visitors never refetch them.
+    """
+    found = assets.find_asset(frontend.static_dir(), path, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        raise Http404(path)
+    file_path, encoding = found
+    response = FileResponse(open(file_path, 'rb'), content_type=assets.content_type(path))
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = assets.cache_control(path)
+    response['Last-Modified'] = http_date(file_path.stat().st_mtime)
+    return response
+
+
+async def availability_stream(request):
+    """
+    Server-Sent Events stream of slot availability for a date (and optionally a party size).
+    Sends a 'snapshot' event, then 'delta' events with the slots whose free table count changed.
+    Needs the ASGI entry point: under WSGI each listener would hold a worker thread.
+    """
+    date_str = request.GET.get('date')
+    if not date_str:
+        return JsonResponse({"error": "Date is a required parameter."}, status=400)
+    try:
+        day = datetime.strptime(date_str, "%Y-%m-%d").date()
+        num_guests = int(request.GET.get('guests', 1))
+    except ValueError as e:
+        return JsonResponse({"error": f"Invalid parameter format: {e}"}, status=400)
+    try:
+        location = await sync_to_async(locations.from_request)(request)
+    except locations.UnknownLocation:
+        return JsonResponse({"error": "Unknown location."}, status=404)
+
+    response = StreamingHttpResponse(availability_events(day, num_guests, location), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Pas de mise en tampon par nginx
+    return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires a staff session or 'Authorization: Bearer <METRICS['TOKEN']>'.
+    """
+    token = metrics.metrics_setting('TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    if not (request.user.is_staff or (token and constant_time_compare(authorization, f"Bearer {token}"))):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
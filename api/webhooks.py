@@ -0,0 +1,266 @@
+"""
+Outbound webhooks: reservation changes and dish availability flips, POSTed to the subscribed
+endpoints (WebhookEndpoint) by ``manage.py deliver_webhooks``.
+
+Events are written to a durable outbox (WebhookDelivery, one row per event and endpoint) in the
+transaction of the change itself (api/signals.py; bulk writes call enqueue() themselves), so a
+committed change always has its events; reservations stored in a location's own database
+(LOCATION_DATABASES) are added once their transaction commits. The worker
+sends each endpoint its due events in batches of WEBHOOKS['BATCH_SIZE'], as one JSON body::
+
+    {"events": [{"id": <uuid>, "type": "reservation.created", "created_at": ..., "data": {...}}, ...]}
+
+signed with the endpoint's secret: ``X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of
+"<t>.<body>">``. Connections are kept alive between batches and passes (one per host). A
+batch answered with anything but 2xx is retried with exponential backoff (BACKOFF_SECONDS
+doubled per attempt, up to MAX_BACKOFF_SECONDS, with jitter) and moved to the dead letters
+after MAX_ATTEMPTS; dead letters are listed, and can be requeued, in the admin and at
+/api/webhooks/dead-letters/.
+
+Delivery is at least once: a receiver should ignore event ids it has already processed.
+Workers claim rows with a lease (next_attempt_at pushed LEASE_SECONDS ahead by a conditional
+UPDATE), so several can run, and the rows of a worker killed mid-batch are sent again.
+"""
+import hashlib
+import hmac
+import http.client
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import Reservation, WebhookDelivery, WebhookEndpoint
+
+Event = WebhookEndpoint.EventType
+Status = WebhookDelivery.DeliveryStatus
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+USER_AGENT = 'NewTreichville-Webhooks/1.0'
+MAX_ERROR_LENGTH = 1000
+
+
+def webhook_setting(name, default=None):
+    return getattr(settings, 'WEBHOOKS', {}).get(name, default)
+
+
+def enqueue(event, restaurant_id, items):
+    """
+    Adds the event to the outbox of every active endpoint subscribed to it, once per item of
+    ``items`` (payload dicts, or a callable returning them, only called when someone listens).
+    Returns the number of deliveries created.
+    """
+    endpoints = [endpoint for endpoint in WebhookEndpoint.objects.filter(is_active=True) if endpoint.wants(event, restaurant_id)]
+    if not endpoints:
+        return 0
+    items = items() if callable(items) else items
+    deliveries = []
+    for data in items:
+        event_id = uuid.uuid4() # Même identifiant pour tous les destinataires
+        deliveries.extend(WebhookDelivery(endpoint=endpoint, event=event, event_id=event_id, payload=data) for endpoint in endpoints)
+    WebhookDelivery.objects.using(DEFAULT_DB_ALIAS).bulk_create(deliveries)
+    return len(deliveries)
+
+
+def enqueue_in_transaction(event, restaurant_id, items, using=DEFAULT_DB_ALIAS):
+    """
+    enqueue() along with a change written on ``using``: in the same transaction on the default
+    database, where the outbox lives (a rolled back change sends nothing, a committed one never
+    loses its event), or once the transaction commits on a location's own database.
+    """
+    if using == DEFAULT_DB_ALIAS:
+        enqueue(event, restaurant_id, items)
+    else:
+        transaction.on_commit(lambda: enqueue(event, restaurant_id, items), using=using)
+
+
+def reservation_data(reservations):
+    from .serializers import ReservationSerializer
+    return [dict(ReservationSerializer(reservation).data, restaurant=reservation.restaurant_id) for reservation in reservations]
+
+
+def dish_data(dishes):
+    return [
+        {'id': dish.pk, 'name': dish.name, 'is_available': dish.is_available, 'restaurant': dish.restaurant_id}
+        for dish in dishes
+    ]
+
+
+def enqueue_reservations(event, reservation_ids, using):
+    """
+    Outbox entries of reservations changed in bulk (no post_save), grouped by location; called
+    in the transaction of the change (see enqueue_in_transaction()).
+    """
+    by_location = {}
+    for reservation in Reservation.objects.using(using).filter(id__in=reservation_ids):
+        by_location.setdefault(reservation.restaurant_id, []).append(reservation)
+    for restaurant_id, reservations in by_location.items():
+        enqueue_in_transaction(event, restaurant_id, lambda reservations=reservations: reservation_data(reservations), using)
+
+
+def sign(secret, timestamp, body):
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify(secret, header, body, tolerance=300):
+    """
+    Checks a signature header, as a receiver would (also used by the tests).
+    """
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+
+def backoff(attempts):
+    delay = min(webhook_setting('BACKOFF_SECONDS', 30) * 2 ** (attempts - 1), webhook_setting('MAX_BACKOFF_SECONDS', 3600))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2)) # Gigue : les échecs simultanés ne repartent pas ensemble
+
+
+class ConnectionPool:
+    """
+    Keeps one HTTP/1.1 connection per scheme, host and port open across requests.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or webhook_setting('TIMEOUT', 10)
+        self.connections = {}
+
+    def connect(self, scheme, netloc):
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout)
+
+    def post(self, url, body, headers):
+        """
+        Returns (status, response body). A kept-alive connection closed by the server in the
+        meantime is reopened once.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        reused = key in self.connections
+        connection = self.connections.pop(key, None) or self.connect(*key)
+        try:
+            connection.request('POST', path, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            if not reused:
+                raise
+            return self.post(url, body, headers) # Sur une nouvelle connexion
+        except Exception:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self.connections[key] = connection
+        return response.status, content
+
+    def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections.clear()
+
+
+def due(endpoint, now):
+    return WebhookDelivery.objects.filter(endpoint=endpoint, status=Status.PENDING, next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+
+
+def claim(endpoint, now, limit):
+    """
+    Leases up to ``limit`` due deliveries of the endpoint to this worker.
+    """
+    ids = list(due(endpoint, now).values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    lease = now + timedelta(seconds=webhook_setting('LEASE_SECONDS', 60))
+    WebhookDelivery.objects.filter(id__in=ids, status=Status.PENDING, next_attempt_at__lte=now).update(next_attempt_at=lease)
+    # Relecture : les lignes prises entre-temps par un autre worker portent un autre bail
+    return list(WebhookDelivery.objects.filter(id__in=ids, status=Status.PENDING, next_attempt_at=lease).order_by('id'))
+
+
+def envelope(delivery):
+    return {'id': str(delivery.event_id), 'type': delivery.event, 'created_at': delivery.created_at, 'data': delivery.payload}
+
+
+def send_batch(endpoint, deliveries, pool):
+    """
+    POSTs the deliveries to the endpoint. Returns None on success, else the error message.
+    """
+    body = json.dumps({'events': [envelope(delivery) for delivery in deliveries]}, cls=DjangoJSONEncoder).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': USER_AGENT,
+        SIGNATURE_HEADER: sign(endpoint.secret, int(time.time()), body),
+    }
+    with metrics.timer('webhook_send_duration_seconds'):
+        try:
+            status, content = pool.post(endpoint.url, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            metrics.inc('webhook_send_failures_total', reason='connection')
+            return f"{type(e).__name__}: {e}"
+    if 200 <= status < 300:
+        metrics.inc('webhook_events_delivered_total', len(deliveries))
+        return None
+    metrics.inc('webhook_send_failures_total', reason='http')
+    return f"HTTP {status}: {content[:200].decode(errors='replace')}"
+
+
+def record_failure(deliveries, error, now):
+    for delivery in deliveries:
+        delivery.attempts += 1
+        delivery.last_error = error[:MAX_ERROR_LENGTH]
+        if delivery.attempts >= webhook_setting('MAX_ATTEMPTS', 8):
+            delivery.status = Status.DEAD
+        else:
+            delivery.next_attempt_at = now + backoff(delivery.attempts)
+    WebhookDelivery.objects.bulk_update(deliveries, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def deliver_due(pool, now=None):
+    """
+    Sends the due deliveries of every active endpoint, batch after batch, stopping at an
+    endpoint's first failure. Returns {'delivered': n, 'failed': n, 'dead': n}.
+    """
+    now = now or timezone.now()
+    counts = {'delivered': 0, 'failed': 0, 'dead': 0}
+    endpoint_ids = WebhookDelivery.objects.filter(status=Status.PENDING, next_attempt_at__lte=now).values_list('endpoint', flat=True).distinct()
+    for endpoint in WebhookEndpoint.objects.filter(pk__in=list(endpoint_ids), is_active=True):
+        while True:
+            deliveries = claim(endpoint, now, webhook_setting('BATCH_SIZE', 50))
+            if not deliveries:
+                break
+            error = send_batch(endpoint, deliveries, pool)
+            if error is None:
+                WebhookDelivery.objects.filter(id__in=[delivery.pk for delivery in deliveries]).update(
+                    status=Status.DELIVERED, delivered_at=timezone.now(), attempts=F('attempts') + 1, last_error=''
+                )
+                counts['delivered'] += len(deliveries)
+                continue
+            record_failure(deliveries, error, now)
+            dead = sum(1 for delivery in deliveries if delivery.status == Status.DEAD)
+            counts['dead'] += dead
+            counts['failed'] += len(deliveries) - dead
+            break # Destinataire en échec : ses autres événements attendent le prochain passage
+    return counts
+
+
+def requeue(queryset):
+    """
+    Sends dead (or failed) deliveries again from the next pass. Returns the number requeued.
+    """
+    return queryset.exclude(status=Status.DELIVERED).update(status=Status.PENDING, attempts=0, next_attempt_at=timezone.now(), last_error='')
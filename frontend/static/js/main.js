@@ -1,3 +1,165 @@
+const API_BASE = '/api';
+
+// Catalog data layer: stale-while-revalidate cache in localStorage.
+// Cached data is rendered immediately; it is revalidated in the background with a
+// conditional request (If-None-Match) once older than CATALOG_FRESH_MS.
+// Bump CATALOG_CACHE_VERSION whenever the shape of the API responses changes.
+const CATALOG_CACHE_VERSION = 1;
+const CATALOG_FRESH_MS = 60 * 1000;
+const CATALOG_ENDPOINTS = {
+    categories: `${API_BASE}/categories/`,
+    dishes: `${API_BASE}/dishes/`,
+    featured_dishes: `${API_BASE}/dishes/featured/`,
+    events: `${API_BASE}/events/`,
+};
+
+const CatalogCache = {
+    key(url) {
+        return `nt-cache:${url}`;
+    },
+    read(url) {
+        try {
+            const entry = JSON.parse(localStorage.getItem(this.key(url)));
+            return entry && entry.version === CATALOG_CACHE_VERSION ? entry : null;
+        } catch (error) {
+            return null;
+        }
+    },
+    write(url, etag, data, storedAt = Date.now()) {
+        try {
+            localStorage.setItem(this.key(url), JSON.stringify({
+                version: CATALOG_CACHE_VERSION, etag: etag, storedAt: storedAt, data: data,
+            }));
+        } catch (error) {
+            // Quota dépassé ou stockage désactivé : on continue sans cache
+        }
+    },
+};
+
+// Calls onData with the cached value right away (if any), then again only if the server has newer data.
+function loadCatalog(name, onData, seed) {
+    const url = CATALOG_ENDPOINTS[name];
+    let cached = CatalogCache.read(url);
+    if (!cached && seed !== undefined) {
+        // Données intégrées à la page par manage.py build_frontend, qui peut dater de plusieurs jours :
+        // enregistrées comme périmées pour être revalidées tout de suite
+        CatalogCache.write(url, null, seed, 0);
+        cached = CatalogCache.read(url) || { data: seed, storedAt: 0 };
+    }
+    if (cached) {
+        onData(cached.data);
+        if (Date.now() - cached.storedAt < CATALOG_FRESH_MS) {
+            return;
+        }
+    }
+    const headers = cached && cached.etag ? { 'If-None-Match': cached.etag } : {};
+    fetch(url, { headers: headers, cache: 'no-store' })
+        .then(function(response) {
+            if (response.status === 304) {
+                CatalogCache.write(url, cached.etag, cached.data);
+                return;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json().then(function(data) {
+                CatalogCache.write(url, response.headers.get('ETag'), data);
+                if (!cached || JSON.stringify(cached.data) !== JSON.stringify(data)) {
+                    onData(data);
+                }
+            });
+        })
+        .catch(function(error) {
+            console.warn(`Could not refresh ${url}:`, error);
+        });
+}
+
+function createElement(tag, className, text) {
+    const element = document.createElement(tag);
+    if (className) {
+        element.className = className;
+    }
+    if (text !== undefined && text !== null) {
+        element.textContent = text;
+    }
+    return element;
+}
+
+const CatalogRenderers = {
+    index: {
+        datasets: ['featured_dishes', 'events'],
+        render(container, data) {
+            if (data.featured_dishes.length) {
+                const section = createElement('section', 'my-10');
+                section.appendChild(createElement('h2', 'text-3xl font-bold text-center mb-6', 'Nos Plats Vedettes'));
+                const grid = createElement('div', 'grid md:grid-cols-3 gap-6');
+                data.featured_dishes.forEach(function(dish) {
+                    const article = createElement('article', 'bg-white rounded shadow-md p-6');
+                    article.appendChild(createElement('h3', 'text-xl font-bold', dish.name));
+                    article.appendChild(createElement('p', 'text-gray-600 my-2', dish.description));
+                    article.appendChild(createElement('p', 'text-green-700 font-bold', dish.price));
+                    grid.appendChild(article);
+                });
+                section.appendChild(grid);
+                container.appendChild(section);
+            }
+            if (data.events.length) {
+                const section = createElement('section', 'my-10');
+                section.appendChild(createElement('h2', 'text-3xl font-bold text-center mb-6', 'Prochains Événements'));
+                const list = createElement('ul', 'max-w-2xl mx-auto');
+                data.events.slice(0, 3).forEach(function(event) {
+                    list.appendChild(createElement('li', 'bg-white rounded shadow-md p-4 mb-4',
+                        `${event.title} — ${event.event_date} à ${event.event_time.slice(0, 5)}`));
+                });
+                section.appendChild(list);
+                container.appendChild(section);
+            }
+        },
+    },
+    menu: {
+        datasets: ['categories', 'dishes'],
+        render(container, data) {
+            if (!data.categories.length) {
+                container.appendChild(createElement('p', 'text-center text-lg', 'Le menu sera bientôt disponible.'));
+            }
+            data.categories.forEach(function(category) {
+                const section = createElement('section', 'my-8');
+                section.appendChild(createElement('h2', 'text-3xl font-bold mb-2', category.name));
+                if (category.description) {
+                    section.appendChild(createElement('p', 'text-gray-600 mb-4', category.description));
+                }
+                const grid = createElement('div', 'grid md:grid-cols-2 gap-4');
+                data.dishes.filter(function(dish) { return dish.category === category.id; }).forEach(function(dish) {
+                    const article = createElement('article', 'bg-white rounded shadow-md p-4 flex justify-between');
+                    const text = createElement('div');
+                    text.appendChild(createElement('h3', 'text-xl font-bold', dish.name));
+                    text.appendChild(createElement('p', 'text-gray-600', dish.description));
+                    article.appendChild(text);
+                    article.appendChild(createElement('p', 'text-green-700 font-bold ml-4', dish.price));
+                    grid.appendChild(article);
+                });
+                section.appendChild(grid);
+                container.appendChild(section);
+            });
+        },
+    },
+    events: {
+        datasets: ['events'],
+        render(container, data) {
+            if (!data.events.length) {
+                container.appendChild(createElement('p', 'text-center text-lg', 'Aucun événement à venir pour le moment.'));
+            }
+            data.events.forEach(function(event) {
+                const article = createElement('article', 'max-w-2xl mx-auto bg-white rounded shadow-md p-6 mb-6');
+                article.appendChild(createElement('h2', 'text-2xl font-bold', event.title));
+                article.appendChild(createElement('p', 'text-gray-500 mb-2', `${event.event_date} à ${event.event_time.slice(0, 5)}`));
+                article.appendChild(createElement('p', '', event.description));
+                container.appendChild(article);
+            });
+        },
+    },
+};
+
 document.addEventListener('DOMContentLoaded', function() {
     // Update current year in footer
     const yearSpan = document.getElementById('currentYear');
@@ -30,6 +192,79 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Catalog pages (index, menu, events): render from cache, revalidate in the background
+    const catalogContainer = document.getElementById('catalog');
+    const renderer = catalogContainer && CatalogRenderers[catalogContainer.dataset.page];
+    if (renderer) {
+        const embedded = document.getElementById('catalogData');
+        const seed = embedded ? JSON.parse(embedded.textContent) : {};
+        const data = {};
+        let rendered = null;
+        renderer.datasets.forEach(function(name) {
+            loadCatalog(name, function(value) {
+                data[name] = value;
+                if (!renderer.datasets.every(function(dataset) { return dataset in data; })) {
+                    return;
+                }
+                const snapshot = JSON.stringify(data);
+                if (snapshot === rendered || (rendered === null && embedded && snapshot === JSON.stringify(seed))) {
+                    rendered = snapshot; // Le HTML pré-rendu est déjà à jour
+                    return;
+                }
+                rendered = snapshot;
+                catalogContainer.replaceChildren();
+                renderer.render(catalogContainer, data);
+            }, seed[name]);
+        });
+    }
+
+    // Live slot availability (Server-Sent Events, pushed by the server on every change)
+    const slotsDiv = document.getElementById('availabilitySlots');
+    if (slotsDiv) {
+        const dateInput = document.getElementById('date');
+        const guestsInput = document.getElementById('guests');
+        const timeInput = document.getElementById('time');
+        let source = null;
+        let slots = {};
+
+        const renderSlots = function() {
+            slotsDiv.innerHTML = '';
+            Object.keys(slots).sort().forEach(function(slot) {
+                const button = document.createElement('button');
+                button.type = 'button';
+                button.textContent = slot;
+                button.disabled = slots[slot] === 0;
+                button.className = slots[slot] === 0
+                    ? 'px-3 py-1 rounded bg-gray-200 text-gray-400 line-through'
+                    : 'px-3 py-1 rounded bg-green-100 text-green-800 hover:bg-green-200';
+                button.addEventListener('click', function() { timeInput.value = slot; });
+                slotsDiv.appendChild(button);
+            });
+        };
+
+        const watchAvailability = function() {
+            if (source) {
+                source.close();
+            }
+            if (!dateInput.value) {
+                return;
+            }
+            const guests = parseInt(guestsInput.value, 10) || 1;
+            source = new EventSource(`${API_BASE}/tables/availability/stream/?date=${dateInput.value}&guests=${guests}`);
+            source.addEventListener('snapshot', function(event) {
+                slots = JSON.parse(event.data).slots;
+                renderSlots();
+            });
+            source.addEventListener('delta', function(event) {
+                Object.assign(slots, JSON.parse(event.data).slots);
+                renderSlots();
+            });
+        };
+
+        dateInput.addEventListener('change', watchAvailability);
+        guestsInput.addEventListener('change', watchAvailability);
+    }
+
     // Placeholder for contact form submission
     const contactForm = document.getElementById('contactForm');
     if (contactForm) {
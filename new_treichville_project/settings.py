@@ -45,11 +45,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.MetricsMiddleware", # En premier : mesure toute la requête
     "django.middleware.security.SecurityMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware", # ETag + 304 pour les revalidations de main.js
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.profiling.ProfilingMiddleware", # Inactif sauf en-tête X-Profile signé ou échantillonnage staff
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -84,6 +87,16 @@ DATABASES = {
     }
 }
 
+# Restaurants (api/locations.py): slug used when a request has no ?location= parameter
+DEFAULT_LOCATION = 'main'
+
+# Optional per-location reservation databases: {location slug: database alias}. Each alias must be
+# declared in DATABASES and migrated (manage.py migrate --database <alias>), e.g.
+#   DATABASES['cocody'] = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db-cocody.sqlite3"}
+#   LOCATION_DATABASES = {'cocody': 'cocody'}
+LOCATION_DATABASES = {}
+DATABASE_ROUTERS = ['api.locations.LocationRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,6 +133,12 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"
+STATICFILES_FINDERS = [
+    "django.contrib.staticfiles.finders.FileSystemFinder",
+    "django.contrib.staticfiles.finders.AppDirectoriesFinder",
+    "api.frontend.BuildFinder", # Assets minifiés et hashés de build_frontend (avec leurs .gz/.br)
+]
 
 # Media files (uploads)
 MEDIA_URL = "/media/"
@@ -136,11 +155,133 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@newtreichville.com' # Example
 ADMIN_EMAIL = 'admin@newtreichville.com' # Example for notifications
 
+# Reservations: service hours (first and last seating) and slot granularity
+RESERVATION_SERVICE_HOURS = ('12:00', '22:00')
+RESERVATION_SLOT_MINUTES = 30
+
+# Time-based reservation status transitions (manage.py advance_reservations, api/lifecycle.py)
+RESERVATION_LIFECYCLE = {
+    'PENDING_HOLD_HOURS': 24,     # Une réservation non confirmée après ce délai expire et libère sa table
+    'NO_SHOW_GRACE_MINUTES': 30,  # Réservation non confirmée passée depuis ce délai : absence
+}
+
+# Guests shared by reservations and contact messages (api/customers.py)
+CUSTOMERS = {
+    'DEFAULT_COUNTRY_CODE': '225', # Indicatif des numéros saisis sans indicatif
+    'STRIP_TRUNK_PREFIX': False,   # Le 0 initial fait partie des numéros ivoiriens
+}
+
+# Recurring events, expanded within the requested date window (api/recurrence.py)
+RECURRING_EVENTS = {
+    'HORIZON_DAYS': 90,     # Fenêtre développée pour les séries quand la requête n'a pas de date de fin
+    'MAX_OCCURRENCES': 500, # Par série et par requête
+}
+
+# Contact messages identical to one received within this window are merged into it
+CONTACT_DUPLICATE_WINDOW_HOURS = 24
+
+# Server-Sent Events availability stream (api/streams.py), served through asgi.py
+AVAILABILITY_STREAM = {
+    'DEBOUNCE_SECONDS': 0.2, # Regroupe les rafales de modifications
+    'POLL_SECONDS': 2,       # Détection des modifications faites par d'autres processus
+    'KEEPALIVE_SECONDS': 20,
+}
+
+# Prometheus metrics on /metrics (api/metrics.py)
+METRICS = {
+    'TOKEN': None, # Jeton du scraper Prometheus ('Authorization: Bearer <TOKEN>'); sinon session staff requise
+    'DIR': None,   # Dossier partagé par les workers pour agréger les métriques de tous les processus
+    'FLUSH_SECONDS': 1,
+}
+
+# On-demand request profiling (api/profiling.py, manage.py profiles)
+PROFILING = {
+    'DIR': BASE_DIR / 'profiles', # Tampon circulaire des profils; None pour désactiver
+    'MAX_DUMPS': 50,
+    'SAMPLE_RATE': 0.0,           # Part des requêtes staff profilées automatiquement
+    'INTERVAL': 0.001,            # Période d'échantillonnage de la pile (secondes)
+    'TOKEN_MAX_AGE': 3600,        # Validité d'un jeton X-Profile (secondes)
+    'MAX_SQL_STATEMENTS': 500,
+}
+
+# Pre-rendered public pages (manage.py build_frontend, api/frontend.py)
+FRONTEND_BUILD = {
+    'SOURCE_DIR': BASE_DIR / 'frontend',
+    'OUTPUT_DIR': BASE_DIR / 'frontend' / 'dist', # Racine à servir par le serveur web
+    'AUTO_BUILD': False,     # Regénérer après chaque modification du catalogue
+    'AUTO_BUILD_DELAY': 2,   # Secondes de regroupement des modifications
+    'ASSET_URL': None,       # Préfixe des assets dans les pages (ex. STATIC_URL après collectstatic); sinon relatif
+}
+
+# Caches: 'default' is shared by all processes in production (Redis or Memcached),
+# 'local' is a small per-process tier in front of it for the response cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'local',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Cached responses of the public catalog GET endpoints (api/response_cache.py)
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'default',      # Cache partagé, porte aussi les versions des tags
+    'LOCAL_ALIAS': 'local',  # Niveau local au processus; None pour le désactiver
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 5,
+}
+
+# Coalescing of identical concurrent computations (api/singleflight.py)
+SINGLE_FLIGHT = {
+    'ENABLED': True,
+    'SHARED': False,     # Coordonner aussi les processus, par un verrou dans le cache partagé
+    'ALIAS': 'default',
+    'WAIT_SECONDS': 5,   # Au-delà, un appel en attente calcule lui-même
+    'LOCK_TIMEOUT': 30,  # Verrou d'un processus arrêté en plein calcul
+    'POLL_SECONDS': 0.02,
+}
+
+# Catalog change feed for offline clients (api/sync.py)
+CATALOG_SYNC = {
+    'PAGE_SIZE': 500,
+    'SETTLE_SECONDS': 5,  # Marge pour les transactions validées après leur horodatage
+    'TOMBSTONE_DAYS': 30, # Rétention des suppressions (purge_catalog_tombstones) ; au-delà, resynchronisation complète
+}
+
+# Idempotency-Key header on reservation and contact POSTs (api/idempotency.py)
+IDEMPOTENCY = {
+    'TTL_SECONDS': 24 * 3600,   # Durée de conservation des réponses rejouables
+    'LOCK_TIMEOUT_SECONDS': 60, # Au-delà, une requête en cours est considérée abandonnée
+    'WAIT_SECONDS': 5,          # Attente d'un doublon concurrent avant de répondre 409
+}
+
+# Outbound webhooks (api/webhooks.py, delivered by manage.py deliver_webhooks)
+WEBHOOKS = {
+    'BATCH_SIZE': 50,             # Événements par requête vers un destinataire
+    'TIMEOUT': 10,
+    'MAX_ATTEMPTS': 8,            # Ensuite : lettre morte (admin, /api/webhooks/dead-letters/)
+    'BACKOFF_SECONDS': 30,        # Délai après le premier échec, doublé à chaque tentative
+    'MAX_BACKOFF_SECONDS': 3600,
+    'LEASE_SECONDS': 60,          # Au-delà, un lot d'un worker arrêté est repris
+    'POLL_SECONDS': 2,
+}
+
+# Token authentication cache (api/authentication.py)
+TOKEN_AUTH_CACHE = {
+    'ALIAS': 'default', # Cache partagé : une invalidation vaut pour tous les processus
+    'TIMEOUT': 300,     # Délai maximal de prise en compte d'une modification faite sans signal
+}
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication', # For browsable API and admin
-        'rest_framework.authentication.TokenAuthentication',   # For programmatic clients
+        'api.authentication.CachedTokenAuthentication',        # For programmatic clients (cached Token lookup)
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated', # Default: all access for authenticated users only
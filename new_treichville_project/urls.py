@@ -16,13 +16,17 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include # Make sure include is imported
+from django.urls import path, re_path, include # Make sure include is imported
 from django.conf import settings # Add this import
 from django.conf.urls.static import static # Add this import
+from api.views import frontend_asset, metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),
+    path("metrics", metrics_view, name="metrics"),
+    # Assets du frontend construit (build_frontend) : variantes .br/.gz, cache immuable
+    re_path(r"^static/(?P<path>.+)$", frontend_asset, name="frontend-asset"),
 ]
 
 # Serve media files during development